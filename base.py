@@ -1,7 +1,10 @@
 """"""
-from copy import copy
+import hashlib
+import json
+import logging
+from copy import copy, deepcopy
 from enum import Enum
-from typing import Any, Type, Callable
+from typing import Any, Type, Callable, TypeVar, Iterator, Mapping
 
 
 class ParamKind(Enum):
@@ -16,22 +19,45 @@ class ParamKind(Enum):
     LIST = 8
 
 
+def _noop(_):
+    pass
+
+
+_logger = logging.getLogger("WinEnchantKitLogger")
+
+
 class ConfigParam:
+    update_handler: Callable[[Any], Any] = staticmethod(_noop)  # 由配置界面按需设置
+
     def __init__(self, kind: ParamKind, default: Any, type_: Type[Any], desc: str, help_string: str = ""):
         self.kind = kind
         self.desc = desc
         self.default = default
         self.type = type_
         self.help_string = help_string
-        self.update_handler = lambda _: None
+        self.hot = False  # 修改后无需重启插件即可生效
+        self._coercer: "Coercer | None" = None
+
+    def set_hot(self: "_P", hot: bool = True) -> "_P":
+        self.hot = hot
+        return self
+
+    def coercer(self) -> "Coercer":
+        """编译后的校验转换函数, 首次使用时编译 (之后修改参数的属性不会生效)"""
+        if self._coercer is None:
+            self._coercer = compile_param(self)
+        return self._coercer
 
     def parse_value(self, value: Any) -> Any | None:
         try:
-            return self.type(value)
-        except ValueError:
+            return self.coercer()(value, self.desc)
+        except ConfigValueError:
             return None
 
 
+_P = TypeVar("_P", bound=ConfigParam)
+
+
 class TipParam(ConfigParam):
     def __init__(self, desc: str):
         super().__init__(ParamKind.TIP, True, bool, desc)
@@ -95,7 +121,7 @@ class TableParam(ConfigParam):
             nums.append(len(headers))
         if default_line:
             nums.append(len(default_line))
-        assert len(set(nums)) == 1, "参数数量不一致"
+        assert len(set(nums)) <= 1, "参数数量不一致"
 
         if item_types is None:
             item_types = [str]
@@ -126,14 +152,332 @@ param_kind_map = {
 }
 
 
+class ConfigValueError(ValueError):
+    def __init__(self, path: str, value: Any, reason: str):
+        super().__init__(f"{path}: {reason} ({value!r})")
+        self.path = path
+        self.value = value
+        self.reason = reason
+
+
+Coercer = Callable[[Any, str], Any]  # (值, 键路径) -> 转换后的值, 无效时抛出 ConfigValueError
+BOOL_STRINGS = {"T": True, "True": True, "true": True, "F": False, "False": False, "false": False, "": False}
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value in BOOL_STRINGS:
+        return BOOL_STRINGS[value]
+    raise ValueError
+
+
+def _to_str(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return str(value)
+    raise TypeError
+
+
+def _to_color(value: Any) -> tuple[int, int, int]:
+    color = tuple(int(c) for c in value)
+    if len(color) != 3 or not all(0 <= c <= 255 for c in color):
+        raise ValueError
+    return color
+
+
+SCALAR_CONVERTERS: dict[Type[Any], tuple[Callable[[Any], Any], str]] = {
+    bool: (_to_bool, "需要布尔值"),
+    int: (int, "需要整数"),
+    float: (float, "需要小数"),
+    str: (_to_str, "需要字符串"),
+    tuple: (_to_color, "需要颜色 (R, G, B)"),
+}
+
+
+def _scalar_coercer(convert: Callable[[Any], Any], reason: str, nullable: bool = False) -> Coercer:
+    def coerce(value: Any, path: str) -> Any:
+        if nullable and (value is None or value == ""):
+            return None
+        try:
+            return convert(value)
+        except (TypeError, ValueError):
+            raise ConfigValueError(path, value, reason) from None
+
+    return coerce
+
+
+def _identity(value: Any, _: str) -> Any:
+    return value
+
+
+def _choice_coercer(choices_values: list[Any]) -> Coercer:
+    def coerce(value: Any, path: str) -> Any:
+        for choice in choices_values:  # 返回选项本身, 从JSON读取的值会还原为枚举
+            if choice == value or (isinstance(choice, Enum) and choice.value == value):
+                return choice
+        raise ConfigValueError(path, value, "不在可选值中")
+
+    return coerce
+
+
+def _member_coercer(coerce: Coercer, choices: list[Any]) -> Coercer:
+    def coerce_member(value: Any, path: str) -> Any:
+        value = coerce(value, path)
+        if value not in choices:
+            raise ConfigValueError(path, value, "不在可选值中")
+        return value
+
+    return coerce_member
+
+
+def _table_coercer(item_types: list[Type[Any]], flat: bool) -> Coercer:
+    # 表格的整数/小数列允许为空 (编辑器中无法转换的单元格为None)
+    cells = [_scalar_coercer(*SCALAR_CONVERTERS.get(t, (_to_str, "需要字符串")), nullable=t in (int, float))
+             for t in item_types]
+    column_count = len(cells)
+
+    def coerce(value: Any, path: str) -> list[Any]:
+        if not isinstance(value, (list, tuple)):
+            raise ConfigValueError(path, value, "需要列表")
+        if flat:
+            return [cells[0](item, f"{path}[{i}]") for i, item in enumerate(value)]
+        rows = []
+        for i, row in enumerate(value):
+            row_path = f"{path}[{i}]"
+            if not isinstance(row, (list, tuple)):
+                raise ConfigValueError(row_path, row, "需要列表")
+            if len(row) > column_count:
+                raise ConfigValueError(row_path, row, f"列数超过 {column_count}")
+            rows.append([cells[j](item, f"{row_path}[{j}]") for j, item in enumerate(row)])
+        return rows
+
+    return coerce
+
+
+def compile_param(param: ConfigParam) -> Coercer:
+    """按参数类型生成校验与转换函数"""
+    if param.kind in (ParamKind.BUTTON, ParamKind.TIP):
+        return _identity
+    if param.kind == ParamKind.CHOICE and hasattr(param, "choices_values"):
+        return _choice_coercer(getattr(param, "choices_values"))
+    if param.kind == ParamKind.LIST:
+        return _table_coercer(getattr(param, "item_types", None) or [str], not getattr(param, "headers", None))
+    kind_types = {ParamKind.BOOL: bool, ParamKind.INT: int, ParamKind.FLOAT: float, ParamKind.COLOR: tuple}
+    coerce = _scalar_coercer(*SCALAR_CONVERTERS.get(kind_types.get(param.kind, str)))
+    if param.kind == ParamKind.CHOICE and getattr(param, "choices", None):
+        return _member_coercer(coerce, getattr(param, "choices"))
+    return coerce
+
+
+class CompiledField:
+    __slots__ = ("key", "param", "coerce")
+
+    def __init__(self, key: str, param: ConfigParam):
+        self.key = key
+        self.param = param
+        self.coerce: Coercer = param.coercer()
+
+
+class CompiledSchema:
+    """配置参数编译后的校验器, 每个 ModuleConfig 只编译一次"""
+    __slots__ = ("fields",)
+
+    def __init__(self, params: dict[str, ConfigParam]):
+        self.fields = {key: CompiledField(key, param) for key, param in params.items()}
+
+    def coerce(self, data: dict[str, Any], path: str = "") -> tuple[dict[str, Any], list[ConfigValueError]]:
+        """一次校验并转换整节配置, 忽略未定义的项, 返回 (有效值, 错误列表)"""
+        values, errors = {}, []
+        fields = self.fields
+        for key, value in data.items():
+            field = fields.get(key)
+            if field is None:
+                continue
+            try:
+                values[key] = field.coerce(value, f"{path}.{key}" if path else key)
+            except ConfigValueError as e:
+                errors.append(e)
+        return values, errors
+
+
+PARAM_TYPES: dict[str, Type[Any]] = {t.__name__: t for t in (str, int, float, bool, tuple, list)}
+
+
+def dump_param(param: ConfigParam) -> dict[str, Any]:
+    """把参数定义转为可JSON序列化的字典 (不包含按钮回调等运行时对象)"""
+    data = {
+        "class": param.__class__.__name__,
+        "kind": param.kind.name,
+        "type": param.type.__name__,
+        "default": param.default,
+        "desc": param.desc,
+        "help_string": param.help_string,
+        "hot": param.hot,
+    }
+    for attr in ("choices", "choices_values", "headers", "default_line", "pre_def_data"):
+        if hasattr(param, attr):
+            data[attr] = getattr(param, attr)
+    if isinstance(param, TableParam):
+        data["item_types"] = [t.__name__ for t in param.item_types]
+    return data
+
+
+def load_param(data: dict[str, Any]) -> ConfigParam:
+    """从 dump_param 的结果重建参数定义"""
+    param_cls = next((cls for cls in all_param_classes() if cls.__name__ == data["class"]), ConfigParam)
+    param = param_cls.__new__(param_cls)
+    type_ = PARAM_TYPES.get(data["type"], str)
+    default = data["default"]
+    if type_ is tuple and isinstance(default, list):
+        default = tuple(default)
+    ConfigParam.__init__(param, ParamKind[data["kind"]], default, type_, data["desc"], data.get("help_string", ""))
+    param.hot = data.get("hot", False)
+    for attr in ("choices", "choices_values", "headers", "default_line", "pre_def_data"):
+        if attr in data:
+            setattr(param, attr, data[attr])
+    if "item_types" in data:
+        setattr(param, "item_types", [PARAM_TYPES.get(name, str) for name in data["item_types"]])
+    if isinstance(param, ButtonParam):
+        param.handler = lambda: None
+    return param
+
+
+def all_param_classes() -> list[Type[ConfigParam]]:
+    classes = [ConfigParam]
+    for cls in classes:
+        classes.extend(sub for sub in cls.__subclasses__() if sub not in classes)
+    return classes
+
+
+def dump_schema(params: dict[str, ConfigParam]) -> dict[str, dict[str, Any]]:
+    return {name: dump_param(param) for name, param in params.items()}
+
+
+def load_schema(schema: dict[str, dict[str, Any]]) -> dict[str, ConfigParam]:
+    return {name: load_param(data) for name, data in schema.items()}
+
+
+def schema_fingerprint(schema: dict[str, dict[str, Any]]) -> str:
+    content = json.dumps(schema, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+
+
+def diff_config(old_config: dict[str, Any], new_config: dict[str, Any]) -> dict[str, Any]:
+    """返回 new_config 中值与 old_config 不同的项"""
+    return {key: value for key, value in new_config.items() if key not in old_config or old_config[key] != value}
+
+
+class ConfigSnapshot(Mapping[str, Any]):
+    """
+    不可变的配置快照, 插件线程持有后读取到的各项总是同一次更新的结果, 无需加锁
+    更新时生成新快照, 未变化的值与旧快照共享同一对象 (因此不能原地修改快照中的值)
+    """
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Mapping[str, Any] | None = None):
+        self._data: dict[str, Any] = dict(data) if data else {}
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "_data" or name.startswith("__"):  # 复制/序列化时 _data 尚未设置
+            raise AttributeError(name)
+        try:
+            return self._data[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __copy__(self) -> "ConfigSnapshot":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "ConfigSnapshot":
+        snapshot = ConfigSnapshot.__new__(ConfigSnapshot)
+        snapshot._data = deepcopy(self._data, memo)
+        return snapshot
+
+    def __reduce__(self):
+        return ConfigSnapshot, (self._data,)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self):
+        return f"ConfigSnapshot({self._data!r})"
+
+    def set(self, changes: Mapping[str, Any]) -> "ConfigSnapshot":
+        if not changes:
+            return self
+        snapshot = ConfigSnapshot.__new__(ConfigSnapshot)
+        snapshot._data = {**self._data, **changes}
+        return snapshot
+
+
 class ModuleConfig(dict):
+    _snapshot = ConfigSnapshot()
+    schema = CompiledSchema({})
+
     def __init__(self, params: dict[str, ConfigParam]):
         super().__init__()
         self.params: dict[str, ConfigParam] = params
-        self.update({copy(key): copy(param.default) for key, param in params.items()})
-
-    def load_values(self, data: dict[str, Any]):
-        self.update({copy(key): copy(data[key]) for key in data if key in self.params})
+        self.schema = CompiledSchema(params)
+        self.update({key: copy(param.default) for key, param in params.items()})
+
+    def __setitem__(self, key: str, value: Any):
+        super().__setitem__(key, value)
+        self._snapshot = self._snapshot.set({key: value})
+
+    def update(self, m=(), /, **kwargs):
+        changes = dict(m, **kwargs)
+        super().update(changes)
+        self._snapshot = self._snapshot.set(changes)
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        self._snapshot = ConfigSnapshot(self)
+
+    def pop(self, key: str, *default: Any) -> Any:
+        value = super().pop(key, *default)
+        self._snapshot = ConfigSnapshot(self)
+        return value
+
+    def popitem(self) -> tuple[str, Any]:
+        item = super().popitem()
+        self._snapshot = ConfigSnapshot(self)
+        return item
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self):
+        super().clear()
+        self._snapshot = ConfigSnapshot()
+
+    def snapshot(self) -> ConfigSnapshot:
+        """当前配置的不可变快照, 可在任意线程中使用"""
+        return self._snapshot
+
+    def load_values(self, data: dict[str, Any], path: str = "") -> dict[str, Any]:
+        """校验并转换整节配置, 只写入值发生变化的项并返回这些项; 无效的项保留原值, 按键路径记录日志"""
+        values, errors = self.schema.coerce(data, path)
+        for error in errors:
+            _logger.warning(f"忽略无效的配置项 {error}")
+        changed = diff_config(self, values)
+        self.update(changed)  # 转换后的列表/元组都是新对象, 无需再复制
+        return changed
+
+    def needs_restart(self, changed: dict[str, Any]) -> bool:
+        """变化的项中是否有不能热更新的参数"""
+        return any(not self.params[key].hot for key in changed if key in self.params)
 
 
 class ModuleConfigPlus(ModuleConfig):
@@ -153,11 +497,14 @@ class ModuleConfigPlus(ModuleConfig):
         self.end_collection = True
         params = self.find_params()
         self.params: dict[str, ConfigParam] = params
-        self.update({copy(key): copy(param.default) for key, param in params.items()})
-
-    def update(self, m, /, **kwargs):
-        super().update(m, **kwargs)
-        for key, value in m.items():
+        self.schema = CompiledSchema(params)
+        self.update({key: copy(param.default) for key, param in params.items()})
+
+    def update(self, m=(), /, **kwargs):
+        # 只为值发生变化的项运行钩子并更新属性
+        changed = diff_config(self, dict(m, **kwargs))
+        super().update(changed)
+        for key, value in changed.items():
             if key in self.hooks:
                 value = self.hooks[key](value)
             setattr(self, key, value)
@@ -177,7 +524,28 @@ class BasePlugin:
         pass
 
     def update_config(self, old_config: dict[str, Any], new_config: dict[str, Any]):
-        self.config.load_values(new_config)
+        changed = self.config.load_values(new_config)  # 只包含校验转换后确实变化的项
+        if changed:
+            self.on_config_changed(changed)
+
+    def on_config_changed(self, changed: dict[str, Any]):
+        """配置更新后调用, changed 只包含值发生变化的项"""
+        pass
 
     def stop(self):
         pass
+
+
+class LazyPlugin(BasePlugin):
+    """未导入插件的占位对象, 仅持有由缓存/清单重建的配置"""
+
+    def __init__(self, params: dict[str, ConfigParam] | None = None):
+        self.config = ModuleConfig(params or {})
+
+    def user_values(self, stored: dict[str, Any]) -> dict[str, Any]:
+        """用户实际设置的值: 配置文件中已有的项, 以及与缓存结构默认值不同的项 (缓存的默认值可能已过时)"""
+        values = dict(stored)
+        for key, param in self.config.params.items():
+            if key in self.config and (key in stored or self.config[key] != param.default):
+                values[key] = self.config[key]
+        return values
@@ -0,0 +1,36 @@
+"""
+离线基准测试
+python -m benchmarks 运行所有基准测试, 结果写入 benchmarks/results/latest.json 并与 benchmarks/baseline.json 比较,
+变慢超过阈值时以非零状态退出; Win32/WinRT 接口由 benchmarks.fakes 中的替身代替, 可以在 Linux 上运行
+每个基准测试由 @benchmark 注册, 被装饰的函数完成准备工作并返回要计时的无参函数
+"""
+import os
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+DATA_DIR = os.path.join(ROOT, "benchmarks", "data")
+
+
+@dataclass
+class Benchmark:
+    name: str
+    setup: Callable[[], Callable[[], Any]]
+    desc: str = ""  # 每次调用代表的工作量
+    requires: tuple[str, ...] = ()  # 需要安装的第三方模块, 缺少时跳过
+    threshold: float | None = None  # 允许的变慢比例, None使用命令行的默认值
+
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, desc: str = "", requires: tuple[str, ...] = (), threshold: float | None = None):
+    def decorator(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = Benchmark(name, setup, desc, requires, threshold)
+        return setup
+
+    return decorator
@@ -0,0 +1,54 @@
+import argparse
+import logging
+import os
+import sys
+
+from benchmarks import BENCHMARKS
+from benchmarks.runner import (BASELINE_FILE, DEFAULT_ROUNDS, DEFAULT_THRESHOLD, RESULTS_DIR, compare,
+                               format_comparison, load_benchmarks, load_results, run_all, save_results)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="WinEnchantKit 离线基准测试")
+    parser.add_argument("-k", "--filter", default="", help="只运行名称包含该字符串的基准测试")
+    parser.add_argument("-r", "--rounds", type=int, default=DEFAULT_ROUNDS, help="每个基准测试的轮数")
+    parser.add_argument("-o", "--output", default=os.path.join(RESULTS_DIR, "latest.json"), help="结果文件")
+    parser.add_argument("-b", "--baseline", default=BASELINE_FILE, help="基线文件")
+    parser.add_argument("-t", "--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="允许的变慢比例 (0.25 表示慢 25%% 以内)")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--list", action="store_true", help="列出所有基准测试")
+    args = parser.parse_args()
+
+    logging.getLogger().addHandler(logging.NullHandler())  # 被测代码的日志不输出到控制台
+    if args.list:
+        load_benchmarks()
+        for bench in BENCHMARKS.values():
+            requires = f"  (需要 {', '.join(bench.requires)})" if bench.requires else ""
+            print(f"{bench.name:<32} {bench.desc}{requires}")
+        return 0
+
+    results = run_all(args.filter, args.rounds)
+    save_results(results, args.output)
+    print(f"\n结果已保存: {args.output}")
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"基线已保存: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("没有基线文件, 跳过比较 (使用 --save-baseline 创建)")
+        return 0
+
+    comparisons = compare(results, load_results(args.baseline), args.threshold)
+    print("\n与基线比较:")
+    for comparison in comparisons:
+        print(format_comparison(comparison))
+    regressions = [comparison for comparison in comparisons if comparison.regressed]
+    if regressions:
+        print(f"\n{len(regressions)} 个基准测试变慢超过阈值")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""配置: 校验转换与读写"""
+import os
+
+from base import (BoolParam, ChoiceParam, ColorParam, FloatParam, IntParam, ModuleConfig, StringParam, TableParam,
+                  ListParam)
+from benchmarks import benchmark
+from lib.config_store import ConfigStore
+
+PLUGIN_COUNT = 20
+TABLE_ROWS = 200
+TABLE_TYPES = [str, str, str, str, int, bool, str, int, float, bool, bool]  # 与自启应用隐藏的规则表相同
+
+
+def plugin_params() -> dict:
+    params = {}
+    for i in range(5):
+        params[f"int_{i}"] = IntParam(i, f"整数{i}")
+        params[f"float_{i}"] = FloatParam(i / 2, f"小数{i}")
+        params[f"bool_{i}"] = BoolParam(False, f"开关{i}")
+        params[f"string_{i}"] = StringParam("", f"文本{i}")
+    params["color"] = ColorParam((0, 0, 0), "颜色")
+    params["choice"] = ChoiceParam("a", ["a", "b", "c"], "选项")
+    params["list"] = ListParam([], "列表")
+    params["table"] = TableParam([], "规则表", TABLE_TYPES, [(f"列{i}", 60) for i in range(len(TABLE_TYPES))])
+    return params
+
+
+def plugin_values(variant: int) -> dict:
+    """配置文件中读出的原始值, 不同 variant 的每一项都不同"""
+    values = {}
+    for i in range(5):
+        values[f"int_{i}"] = str(i + variant)
+        values[f"float_{i}"] = i + variant + 0.5
+        values[f"bool_{i}"] = "T" if variant % 2 else "F"
+        values[f"string_{i}"] = f"文本{i}-{variant}"
+    values["color"] = [variant % 256, 128, 255]
+    values["choice"] = "abc"[variant % 3]
+    values["list"] = [f"项目{i}-{variant}" for i in range(20)]
+    values["table"] = [[f"规则{row}", f"标题{variant}", "Chrome_WidgetWin_1", "QQ.exe", str(row % 3), "F",
+                        "WS_VISIBLE|WS_MINIMIZEBOX", "2", "0.0", "T", "F"] for row in range(TABLE_ROWS)]
+    return values
+
+
+@benchmark("config.load_values", f"校验转换 {TABLE_ROWS} 行规则表的插件配置")
+def load_values():
+    config = ModuleConfig(plugin_params())
+    data = [plugin_values(0), plugin_values(1)]
+    state = {"index": 0}
+
+    def run():
+        state["index"] ^= 1  # 交替加载两份配置, 每次所有项都有变化
+        config.load_values(data[state["index"]], "plugins.bench")
+
+    return run
+
+
+def store_benchmark(split_plugins: bool):
+    store = ConfigStore(os.path.abspath("config.json"), os.path.abspath("config.d"), split_plugins=split_plugins)
+    main = {"font_size": 11, "auto_startup_wait_time": 1.0}
+    plugins = [{f"plugin_{i}": plugin_values(i) for i in range(PLUGIN_COUNT)} for _ in range(2)]
+    plugins[1]["plugin_0"] = plugin_values(PLUGIN_COUNT)  # 每次保存只有一个插件的配置变化
+    state = {"index": 0}
+
+    def run():
+        state["index"] ^= 1
+        store.update(main, plugins[state["index"]])
+        store.flush()
+        store.read()
+
+    return run
+
+
+@benchmark("config.save_read", f"{PLUGIN_COUNT} 个插件, 单文件, 保存后读取", threshold=0.5)  # 受磁盘影响, 波动较大
+def save_read():
+    return store_benchmark(False)
+
+
+@benchmark("config.save_read_split", f"{PLUGIN_COUNT} 个插件, 按插件分文件 (config.d), 保存后读取", threshold=0.5)
+def save_read_split():
+    return store_benchmark(True)
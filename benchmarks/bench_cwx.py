@@ -0,0 +1,40 @@
+"""cwx: 关键帧动画取值与颜色变换"""
+from benchmarks import benchmark, fakes
+
+SAMPLES = 1000
+COLORS = 256
+
+
+@benchmark("cwx.key_frame_animation", f"{SAMPLES} 次 raw_get_value", requires=("wx", "colour"))
+def key_frame_animation():
+    fakes.install()
+    from cwx.animation import KeyFrame, KeyFrameAnimation, KeyFrameWay
+
+    ways = [KeyFrameWay.SMOOTH, KeyFrameWay.QUADRATIC_EASE, KeyFrameWay.CUBE_EASE, KeyFrameWay.BLINK]
+    frames = [KeyFrame(ways[i % len(ways)], i / 8, float(i * i)) for i in range(9)]
+    animation = KeyFrameAnimation(1.0, frames)
+    percents = [i / (SAMPLES - 1) for i in range(SAMPLES)]
+
+    def run():
+        for percent in percents:
+            animation.raw_get_value(percent)
+
+    return run
+
+
+@benchmark("cwx.color_transform", f"{COLORS} 种颜色的亮度变换", requires=("wx", "colour"))
+def color_transform():
+    fakes.install()
+    import wx
+    from cwx.style.color import CT, TC
+
+    colors = [wx.Colour((i * 37) % 256, (i * 91) % 256, (i * 53) % 256) for i in range(COLORS)]
+    transformable = [TC((color.GetRed(), color.GetGreen(), color.GetBlue(), 255)) for color in colors]
+
+    def run():
+        for color, tc in zip(colors, transformable):
+            CT.light2(color)
+            CT.dark1(color)
+            tc.add_luminance(0.04).reset()
+
+    return run
@@ -0,0 +1,69 @@
+"""高清酷狗封面: 搜索结果匹配与听歌报告"""
+import importlib
+import json
+import os
+import random
+
+from benchmarks import DATA_DIR, benchmark, fakes
+
+SEARCH_DATA = os.path.join(DATA_DIR, "kugou_search.json")  # 与搜索接口返回的结构相同, 可替换为录制的响应
+HISTORY_POINTS = 50_000
+HISTORY_SONGS = 2_000
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.status_code = 200
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeRequests:
+    """替换 backend 模块中的 requests 属性, 按请求的URL返回预先保存的响应"""
+
+    def __init__(self, responses: dict[str, str], exceptions):
+        self.responses = responses
+        self.exceptions = exceptions
+
+    def get(self, url: str, **_) -> FakeResponse:
+        return FakeResponse(self.responses[url])
+
+
+@benchmark("hd_kugou_cover.search_music", "匹配 25 次搜索的结果", requires=("requests", "wx"))
+def search_music():
+    fakes.install()
+    import requests
+    backend = importlib.import_module("plugins.HDKugouCover.backend")
+    with open(SEARCH_DATA, "r", encoding="utf-8") as f:
+        queries = json.load(f)["queries"]
+    responses = {}
+    for query in queries:
+        title, _ = backend.extract_music_title(query["title"])
+        url = backend.SEARCH_URL.format(keyword=f"{title} {query['artist']}")
+        responses[url] = json.dumps(query["response"], ensure_ascii=False)
+    backend.requests = FakeRequests(responses, requests.exceptions)
+    args = [(query["title"], query["artist"], query["album"]) for query in queries]
+
+    def run():
+        for title, artist, album in args:
+            backend.transform_to_url(backend.search_music(title, artist, album))
+
+    return run
+
+
+@benchmark("hd_kugou_cover.output_report", f"{HISTORY_POINTS} 条播放记录 ({HISTORY_SONGS} 首歌) 生成报告")
+def output_report():
+    from plugins.HDKugouCover.music_reporter import Music, MusicPoint, MusicReporter
+
+    rnd = random.Random(0)
+    songs = [Music(f"歌曲{i}", f"歌手{i % 300}", f"专辑{i % 500}", f"歌手{i % 300}") for i in range(HISTORY_SONGS)]
+    reporter = MusicReporter()
+    start = 1_700_000_000.0
+    for _ in range(HISTORY_POINTS):
+        length = rnd.uniform(30, 300)
+        reporter.music_points.append(MusicPoint(rnd.choice(songs), start, start + length, rnd.uniform(0, 10)))
+        start += length
+
+    return reporter.output_report
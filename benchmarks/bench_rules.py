@@ -0,0 +1,52 @@
+"""自启应用隐藏: 对合成的窗口集合执行规则匹配"""
+import importlib
+import random
+
+from benchmarks import benchmark, fakes
+
+WINDOW_COUNT = 500
+RULE_COUNT = 40
+STYLE_NAMES = ["WS_VISIBLE", "WS_MINIMIZEBOX", "WS_CAPTION", "WS_BORDER", "WS_EX_APPWINDOW", "WS_EX_TOPMOST",
+               "WS_EX_LAYOUTRTL", "WS_EX_TOOLWINDOW"]
+
+
+def synthetic_rules(count: int, seed: int = 0) -> list[list]:
+    """与配置中的规则格式相同: [规则名, 标题, 类名, 进程名, 次数, 启用正则, 窗口样式, 隐藏方式, 操作延迟, 检测显示, 仅执行最后操作]"""
+    rnd = random.Random(seed)
+    rules = []
+    for index in range(count):
+        use_re = rnd.random() < 0.3
+        title = rnd.choice(fakes.TITLES[1:])
+        if use_re:
+            title = f"^{title[:2]}.*"
+        rules.append([
+            f"规则{index}",
+            title if rnd.random() < 0.6 else "",
+            rnd.choice(fakes.CLASS_NAMES) if rnd.random() < 0.5 else "",
+            rnd.choice(fakes.PROCESS_NAMES),
+            -1,  # 不限次数, 每轮的结果相同
+            "T" if use_re else "F",
+            "|".join(rnd.sample(STYLE_NAMES, rnd.randint(1, 3))),
+            rnd.randint(0, 2),
+            0.0,
+            "F",
+            "F",
+        ])
+    return rules
+
+
+@benchmark("auto_startup_app_hide.match", f"{WINDOW_COUNT} 个窗口 x {RULE_COUNT} 条规则", requires=("wx", "psutil"))
+def rule_matching():
+    desktop = fakes.install(fakes.FakeDesktop.synthetic(WINDOW_COUNT))
+    plugin_module = importlib.import_module("plugins.AutoStartupAppHide.main")
+    plugin_module.psutil = fakes.FakePsutil(desktop)
+    plugin = plugin_module.Plugin()
+    plugin.config.load_values({"windows": synthetic_rules(RULE_COUNT)})
+    hwnds = list(desktop.windows)
+
+    def run():
+        desktop.actions.clear()
+        for hwnd in hwnds:
+            plugin.parse_create_window(hwnd)
+
+    return run
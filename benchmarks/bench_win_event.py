@@ -0,0 +1,47 @@
+"""WinEvent 分发: 通过 FakeEventSource 回放合成的事件序列"""
+import random
+import re
+
+from benchmarks import benchmark
+from lib.win_event import OBJID_WINDOW, WinEvent, WinEventDispatcher, FakeEventSource
+
+EVENT_COUNT = 10000
+WINDOW_COUNT = 300
+OBJID_CURSOR = -9
+EVENT_TYPES = [0x0003, 0x0008, 0x0016, 0x0017, 0x8000, 0x8001, 0x8002, 0x8003, 0x800B, 0x800C]
+CLASS_NAMES = ["Chrome_WidgetWin_1", "Notepad", "kugou_ui", "CabinetWClass", "ConsoleWindowClass", "Shell_TrayWnd"]
+PROCESS_NAMES = ["chrome.exe", "notepad.exe", "KuGou.exe", "explorer.exe", "javaw.exe", "WeChat.exe"]
+
+
+def synthetic_events(count: int, seed: int = 0) -> list[WinEvent]:
+    """大部分为窗口对象的事件, 少量光标等非窗口对象事件"""
+    rnd = random.Random(seed)
+    return [WinEvent(rnd.choice(EVENT_TYPES), rnd.randrange(1, WINDOW_COUNT + 1),
+                     OBJID_WINDOW if rnd.random() < 0.8 else OBJID_CURSOR, time=index)
+            for index in range(count)]
+
+
+@benchmark("win_event.dispatch", f"{EVENT_COUNT} 个事件")
+def dispatch():
+    rnd = random.Random(1)
+    class_names = {hwnd: rnd.choice(CLASS_NAMES) for hwnd in range(1, WINDOW_COUNT + 1)}
+    process_names = {hwnd: rnd.choice(PROCESS_NAMES) for hwnd in range(1, WINDOW_COUNT + 1)}
+    source = FakeEventSource()
+    dispatcher = WinEventDispatcher(source, class_names.get, process_names.get)
+    received = []
+    callback = received.append
+    # 与插件中常见的订阅方式对应: 只看事件类型、按类名、按类名正则、按进程名、任意对象
+    dispatcher.subscribe(callback, [0x8000, 0x8002], name="创建/显示")
+    dispatcher.subscribe(callback, 0x0003, class_name="kugou_ui", name="前台窗口 (类名)")
+    dispatcher.subscribe(callback, [0x800B, 0x800C], class_name=re.compile(r"^Chrome_"), name="位置/名称 (正则)")
+    dispatcher.subscribe(callback, [0x0016, 0x0017], process_name="javaw.exe", name="最小化 (进程名)")
+    dispatcher.subscribe(callback, 0x8001, process_name=re.compile(r"kugou", re.I), class_name="kugou_ui",
+                         name="销毁 (类名+进程名)")
+    dispatcher.subscribe(callback, 0x8003, id_object=None, name="隐藏 (任意对象)")
+    events = synthetic_events(EVENT_COUNT)
+
+    def run():
+        received.clear()
+        source.replay(events)
+
+    return run
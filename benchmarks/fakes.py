@@ -0,0 +1,284 @@
+"""
+Win32/WinRT 替身
+install() 把 win32con/win32gui/win32process/pywintypes/winsdk 替换为由 FakeDesktop 驱动的模块,
+非 Windows 平台上再补充 ctypes.windll/WinDLL/WINFUNCTYPE/HRESULT, 使依赖它们的模块可以导入;
+需在导入被测模块之前调用; 跨平台的第三方库 (wx, psutil, requests, colour) 不在此替代
+"""
+import ctypes
+import random
+import sys
+from dataclasses import dataclass
+from types import ModuleType
+from typing import Any, Callable
+
+WINDOW_STYLES = {
+    "WS_OVERLAPPED": 0x00000000, "WS_POPUP": 0x80000000, "WS_CHILD": 0x40000000, "WS_MINIMIZE": 0x20000000,
+    "WS_VISIBLE": 0x10000000, "WS_DISABLED": 0x08000000, "WS_CLIPSIBLINGS": 0x04000000,
+    "WS_CLIPCHILDREN": 0x02000000, "WS_MAXIMIZE": 0x01000000, "WS_CAPTION": 0x00C00000, "WS_BORDER": 0x00800000,
+    "WS_DLGFRAME": 0x00400000, "WS_VSCROLL": 0x00200000, "WS_HSCROLL": 0x00100000, "WS_SYSMENU": 0x00080000,
+    "WS_THICKFRAME": 0x00040000, "WS_GROUP": 0x00020000, "WS_TABSTOP": 0x00010000, "WS_MINIMIZEBOX": 0x00020000,
+    "WS_MAXIMIZEBOX": 0x00010000, "WS_TILED": 0x00000000, "WS_ICONIC": 0x20000000, "WS_SIZEBOX": 0x00040000,
+    "WS_OVERLAPPEDWINDOW": 0x00CF0000, "WS_TILEDWINDOW": 0x00CF0000, "WS_POPUPWINDOW": 0x80880000,
+    "WS_CHILDWINDOW": 0x40000000,
+}
+WINDOW_EX_STYLES = {
+    "WS_EX_DLGMODALFRAME": 0x00000001, "WS_EX_NOPARENTNOTIFY": 0x00000004, "WS_EX_TOPMOST": 0x00000008,
+    "WS_EX_ACCEPTFILES": 0x00000010, "WS_EX_TRANSPARENT": 0x00000020, "WS_EX_MDICHILD": 0x00000040,
+    "WS_EX_TOOLWINDOW": 0x00000080, "WS_EX_WINDOWEDGE": 0x00000100, "WS_EX_CLIENTEDGE": 0x00000200,
+    "WS_EX_CONTEXTHELP": 0x00000400, "WS_EX_RIGHT": 0x00001000, "WS_EX_LEFT": 0x00000000,
+    "WS_EX_RTLREADING": 0x00002000, "WS_EX_LTRREADING": 0x00000000, "WS_EX_LEFTSCROLLBAR": 0x00004000,
+    "WS_EX_RIGHTSCROLLBAR": 0x00000000, "WS_EX_CONTROLPARENT": 0x00010000, "WS_EX_STATICEDGE": 0x00020000,
+    "WS_EX_APPWINDOW": 0x00040000, "WS_EX_OVERLAPPEDWINDOW": 0x00000300, "WS_EX_PALETTEWINDOW": 0x00000188,
+    "WS_EX_LAYERED": 0x00080000, "WS_EX_NOINHERITLAYOUT": 0x00100000, "WS_EX_LAYOUTRTL": 0x00400000,
+    "WS_EX_COMPOSITED": 0x02000000, "WS_EX_NOACTIVATE": 0x08000000,
+}
+CONSTANTS = {
+    "GWL_STYLE": -16, "GWL_EXSTYLE": -20, "EVENT_OBJECT_CREATE": 0x8000, "EVENT_OBJECT_DESTROY": 0x8001,
+    "EVENT_OBJECT_SHOW": 0x8002, "EVENT_OBJECT_HIDE": 0x8003, "WINEVENT_OUTOFCONTEXT": 0x0000,
+    "WINEVENT_SKIPOWNPROCESS": 0x0002, "WM_CLOSE": 0x0010, "WM_QUIT": 0x0012, "WM_APP": 0x8000, "SW_HIDE": 0,
+    "SW_SHOW": 5, "SW_MINIMIZE": 6,
+}
+
+TITLES = ["", "QQ", "微信", "哔哩哔哩", "设置", "Steam", "腾讯元宝", "Microsoft Edge", "OneDrive", "酷狗音乐",
+          "任务管理器", "文件资源管理器", "Visual Studio Code", "Discord", "Clash for Windows", "L19", "更新"]
+CLASS_NAMES = ["Chrome_WidgetWin_1", "Tauri Window", "XYClient", "CabinetWClass", "TXGuiFoundation",
+               "ApplicationFrameWindow", "Windows.UI.Core.CoreWindow", "tooltips_class32", "#32770", "IME",
+               "MSCTFIME UI", "GDI+ Hook Window Class", "wxWindowNR", "SDL_app"]
+PROCESS_NAMES = ["explorer.exe", "QQ.exe", "WeChat.exe", "哔哩哔哩.exe", "steam.exe", "Yuanbao.exe", "msedge.exe",
+                 "OneDrive.exe", "KuGou.exe", "Taskmgr.exe", "Code.exe", "Discord.exe", "DeviceDriver.exe",
+                 "svchost.exe", "RuntimeBroker.exe"]
+
+
+@dataclass
+class FakeWindow:
+    title: str
+    class_name: str
+    pid: int
+    style: int = WINDOW_STYLES["WS_VISIBLE"]
+    ex_style: int = 0
+    parent: int = 0
+
+
+class FakeDesktop:
+    """窗口与进程表, 替身模块从这里读取窗口信息, 并记录对窗口的操作"""
+
+    def __init__(self):
+        self.windows: dict[int, FakeWindow] = {}
+        self.processes: dict[int, str] = {}
+        self.actions: list[tuple[str, int, int]] = []  # (操作, 窗口, 参数)
+        self.next_hwnd = 0x10000
+
+    def add_process(self, pid: int, name: str):
+        self.processes[pid] = name
+
+    def add_window(self, window: FakeWindow) -> int:
+        hwnd = self.next_hwnd
+        self.next_hwnd += 2
+        self.windows[hwnd] = window
+        return hwnd
+
+    @classmethod
+    def synthetic(cls, count: int, seed: int = 0) -> "FakeDesktop":
+        """随机生成 count 个窗口, 约四分之一为子窗口"""
+        rnd = random.Random(seed)
+        desktop = cls()
+        for index, name in enumerate(PROCESS_NAMES):
+            desktop.add_process(1000 + index * 4, name)
+        pids = list(desktop.processes)
+        styles, ex_styles = list(WINDOW_STYLES.values()), list(WINDOW_EX_STYLES.values())
+        top_levels: list[int] = []
+        for _ in range(count):
+            style = WINDOW_STYLES["WS_VISIBLE"] if rnd.random() < 0.7 else 0
+            for value in rnd.sample(styles, 4):
+                style |= value
+            ex_style = 0
+            for value in rnd.sample(ex_styles, 3):
+                ex_style |= value
+            parent = rnd.choice(top_levels) if top_levels and rnd.random() < 0.25 else 0
+            hwnd = desktop.add_window(FakeWindow(rnd.choice(TITLES), rnd.choice(CLASS_NAMES), rnd.choice(pids),
+                                                 style, ex_style, parent))
+            if not parent:
+                top_levels.append(hwnd)
+        return desktop
+
+
+class FakeError(Exception):
+    """pywintypes.error"""
+
+    def __init__(self, winerror: int = 1400, funcname: str = "", strerror: str = "无效的窗口句柄"):
+        super().__init__(winerror, funcname, strerror)
+        self.winerror = winerror
+        self.funcname = funcname
+        self.strerror = strerror
+
+
+def module(name: str, attrs: dict[str, Any]) -> ModuleType:
+    mod = ModuleType(name)
+    mod.__dict__.update(attrs)
+    sys.modules[name] = mod
+    return mod
+
+
+class StandInModule(ModuleType):
+    """任意属性都返回一个占位类型, 用于只在导入时引用的 WinRT 类型"""
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        value = type(name, (), {"__module__": self.__name__})
+        setattr(self, name, value)
+        return value
+
+
+def stand_in(name: str) -> ModuleType:
+    parent_name, _, child = name.rpartition(".")
+    mod = sys.modules.get(name)
+    if not isinstance(mod, StandInModule):
+        mod = sys.modules[name] = StandInModule(name)
+        mod.__path__ = []
+    if parent_name:
+        setattr(stand_in(parent_name), child, mod)
+    return mod
+
+
+_desktop = FakeDesktop()
+
+
+def window(hwnd: int) -> FakeWindow:
+    try:
+        return _desktop.windows[hwnd]
+    except KeyError:
+        raise FakeError() from None
+
+
+def get_window_long(hwnd: int, index: int) -> int:
+    win = window(hwnd)
+    return win.ex_style if index == CONSTANTS["GWL_EXSTYLE"] else win.style
+
+
+def enum_windows(callback: Callable[[int, Any], Any], extra: Any):
+    for hwnd, win in list(_desktop.windows.items()):
+        if not win.parent:
+            callback(hwnd, extra)
+
+
+def recorder(action: str) -> Callable[..., None]:
+    def func(hwnd: int, arg: int = 0, *_):
+        window(hwnd)
+        _desktop.actions.append((action, hwnd, arg))
+
+    return func
+
+
+def install_win32():
+    pywintypes = module("pywintypes", {"error": FakeError})
+    module("win32con", {**WINDOW_STYLES, **WINDOW_EX_STYLES, **CONSTANTS})
+    win32gui = module("win32gui", {
+        "GetParent": lambda hwnd: window(hwnd).parent,
+        "GetWindowText": lambda hwnd: window(hwnd).title,
+        "GetClassName": lambda hwnd: window(hwnd).class_name,
+        "GetWindowLong": get_window_long,
+        "IsWindowVisible": lambda hwnd: bool(window(hwnd).style & WINDOW_STYLES["WS_VISIBLE"]),
+        "EnumWindows": enum_windows,
+        "ShowWindow": recorder("ShowWindow"),
+        "PostMessage": recorder("PostMessage"),
+        "PostThreadMessage": lambda *_: None,
+    })
+    module("win32process", {"GetWindowThreadProcessId": lambda hwnd: (window(hwnd).pid + 1, window(hwnd).pid)})
+    win32 = module("win32", {"win32gui": win32gui, "__path__": []})
+    win32.lib = module("win32.lib", {"pywintypes": pywintypes, "__path__": []})
+
+
+class FakeProcess:
+    def __init__(self, desktop: FakeDesktop, pid: int):
+        if pid not in desktop.processes:
+            raise ProcessLookupError(pid)
+        self.pid = pid
+        self.desktop = desktop
+
+    def name(self) -> str:
+        return self.desktop.processes[self.pid]
+
+
+class FakePsutil:
+    """替换被测模块中的 psutil 属性, 让进程名来自 FakeDesktop"""
+
+    def __init__(self, desktop: FakeDesktop):
+        self.desktop = desktop
+
+    # noinspection PyPep8Naming
+    def Process(self, pid: int) -> FakeProcess:
+        return FakeProcess(self.desktop, pid)
+
+
+class FakeFunction:
+    def __init__(self, result: Any):
+        self.result = result
+        self.argtypes = None
+        self.restype = None
+
+    def __call__(self, *_):
+        return self.result
+
+
+class FakeDLL:
+    RESULTS = {
+        "GetDeviceCaps": 96,  # 100% 缩放
+        "DwmGetColorizationColor": 1,  # 失败, 使用默认主题色
+    }
+
+    def __init__(self, name: str = "", *_, **__):
+        self.name = name
+
+    def __getattr__(self, name: str) -> FakeFunction:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        func = FakeFunction(self.RESULTS.get(name, 0))
+        setattr(self, name, func)
+        return func
+
+
+class FakeDLLLoader:
+    def __getattr__(self, name: str) -> FakeDLL:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        dll = FakeDLL(name)
+        setattr(self, name, dll)
+        return dll
+
+
+def install_ctypes():
+    if sys.platform == "win32":
+        return
+    ctypes.WinDLL = FakeDLL
+    ctypes.windll = FakeDLLLoader()
+    ctypes.WINFUNCTYPE = ctypes.CFUNCTYPE
+    ctypes.HRESULT = ctypes.c_long
+    ctypes.WinError = lambda code=None, descr=None: OSError(code, descr)
+
+
+WINSDK_MODULES = [
+    "winsdk.windows.foundation",
+    "winsdk.windows.media",
+    "winsdk.windows.media.control",
+    "winsdk.windows.media.playback",
+    "winsdk.windows.storage",
+    "winsdk.windows.storage.streams",
+]
+
+
+_installed = False
+
+
+def install(desktop: FakeDesktop | None = None) -> FakeDesktop:
+    """安装所有替身 (只在第一次调用时创建模块), 之后替身读取给定的 FakeDesktop 并返回它"""
+    global _desktop, _installed
+    if desktop is not None:
+        _desktop = desktop
+    if not _installed:
+        install_win32()
+        for name in WINSDK_MODULES:
+            stand_in(name)
+        install_ctypes()
+        _installed = True
+    return _desktop
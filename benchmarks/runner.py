@@ -0,0 +1,152 @@
+"""运行基准测试, 保存结果并与基线比较"""
+import importlib
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from typing import Any
+
+from benchmarks import BENCHMARKS, Benchmark, ROOT
+
+BENCHMARK_MODULES = ["bench_rules", "bench_cwx", "bench_kugou", "bench_config", "bench_win_event"]
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_ROUNDS = 7
+DEFAULT_THRESHOLD = 0.25  # 比基线慢 25% 以上视为性能退化
+MIN_ROUND_TIME = 0.2  # 秒, 每轮的调用次数按此自动确定
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    desc: str = ""
+    number: int = 0  # 每轮调用次数
+    best: float = 0.0  # 秒/次, 各轮中最快的一轮
+    median: float = 0.0  # 秒/次
+    rounds: list[float] = field(default_factory=list)
+    skipped: str | None = None  # 跳过的原因
+
+
+@dataclass
+class Comparison:
+    name: str
+    baseline: float
+    current: float
+    threshold: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline else 1.0
+
+    @property
+    def regressed(self) -> bool:
+        return self.ratio > 1 + self.threshold
+
+
+def load_benchmarks():
+    for name in BENCHMARK_MODULES:
+        importlib.import_module(f"benchmarks.{name}")
+
+
+def missing_requirement(bench: Benchmark) -> str | None:
+    for name in bench.requires:
+        if importlib.util.find_spec(name) is None:
+            return name
+    return None
+
+
+def run_benchmark(bench: Benchmark, rounds: int = DEFAULT_ROUNDS) -> BenchmarkResult:
+    result = BenchmarkResult(bench.name, bench.desc)
+    missing = missing_requirement(bench)
+    if missing is not None:
+        result.skipped = f"缺少依赖: {missing}"
+        return result
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="wek_bench_") as work_dir:
+        os.chdir(work_dir)  # 被测代码写入的相对路径 (缓存、报告等) 都落在临时目录中
+        try:
+            func = bench.setup()
+            timer = timeit.Timer(func)
+            number, elapsed = timer.autorange()
+            if elapsed < MIN_ROUND_TIME:
+                number = max(1, int(number * MIN_ROUND_TIME / max(elapsed, 1e-9)))
+            times = [t / number for t in timer.repeat(repeat=rounds, number=number)]
+        except ImportError as e:
+            result.skipped = f"无法导入: {e}"
+            return result
+        finally:
+            os.chdir(cwd)
+    result.number = number
+    result.rounds = times
+    result.best = min(times)
+    result.median = statistics.median(times)
+    return result
+
+
+def run_all(pattern: str = "", rounds: int = DEFAULT_ROUNDS) -> list[BenchmarkResult]:
+    load_benchmarks()
+    results = []
+    for name, bench in BENCHMARKS.items():
+        if pattern and pattern not in name:
+            continue
+        result = run_benchmark(bench, rounds)
+        print(format_result(result), flush=True)
+        results.append(result)
+    return results
+
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def format_result(result: BenchmarkResult) -> str:
+    if result.skipped:
+        return f"{result.name:<32} 跳过 ({result.skipped})"
+    return (f"{result.name:<32} {format_time(result.best):>12} (中位数 {format_time(result.median)}, "
+            f"{result.number} 次 x {len(result.rounds)} 轮)  {result.desc}")
+
+
+def environment() -> dict[str, Any]:
+    return {"time": datetime.now().isoformat(timespec="seconds"), "python": sys.version.split()[0],
+            "platform": platform.platform(), "machine": platform.machine()}
+
+
+def save_results(results: list[BenchmarkResult], fp: str):
+    os.makedirs(os.path.dirname(os.path.abspath(fp)), exist_ok=True)
+    data = {"environment": environment(), "results": {result.name: asdict(result) for result in results}}
+    with open(fp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+
+def load_results(fp: str) -> dict[str, dict[str, Any]]:
+    with open(fp, "r", encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def compare(results: list[BenchmarkResult], baseline: dict[str, dict[str, Any]],
+            threshold: float = DEFAULT_THRESHOLD) -> list[Comparison]:
+    """按最快一轮的用时与基线比较, 跳过的与基线中没有的基准测试不参与比较"""
+    comparisons = []
+    for result in results:
+        base = baseline.get(result.name)
+        if result.skipped or not base or base.get("skipped"):
+            continue
+        bench = BENCHMARKS.get(result.name)
+        limit = bench.threshold if bench is not None and bench.threshold is not None else threshold
+        comparisons.append(Comparison(result.name, base["best"], result.best, limit))
+    return comparisons
+
+
+def format_comparison(comparison: Comparison) -> str:
+    state = "变慢" if comparison.regressed else "正常"
+    return (f"{comparison.name:<32} {format_time(comparison.baseline):>12} -> {format_time(comparison.current):>12} "
+            f"({(comparison.ratio - 1) * 100:+.1f}%, 阈值 +{comparison.threshold * 100:.0f}%)  {state}")
@@ -1,6 +1,6 @@
 import wx
 
-from lib.perf import Counter
+from lib.tracing import get_tracer
 from ..animation import Animation, AnimationGroup
 from ..style import WidgetStyle
 from ..widgets.base_widget import Widget
@@ -70,7 +70,10 @@ class AnimationWidget(Widget):
             self.timer.Stop()
 
     def animation_call(self, _):
-        timer = Counter(create_start=True)
+        with get_tracer().span(f"animation:{self.__class__.__name__}", "paint"):
+            self.animation_frame()
+
+    def animation_frame(self):
         try:
             self.animation_callback()
         except RuntimeError:
@@ -84,7 +87,6 @@ class AnimationWidget(Widget):
             for animation in self.in_playing:
                 frame_time = min(frame_time, max(0, animation.get_next_frame_time(self.fps)))
             self.timer.StartOnce(int(frame_time * 1000))
-        # print(f"Animation Frame Use: {timer.endT()}")
 
     def animation_callback(self):
         pass
@@ -2,7 +2,7 @@ import wx
 
 from ..dpi import translate_size
 from ..style import Style, WidgetStyle
-from lib.perf import Counter
+from lib.tracing import get_tracer
 
 cwxEVT_STYLE_UPDATE = wx.NewEventType()
 EVT_STYLE_UPDATE = wx.PyEventBinder(cwxEVT_STYLE_UPDATE, 1)
@@ -106,10 +106,8 @@ class Widget(wx.Window):
 
     def on_paint(self, _):
         dc = wx.PaintDC(self)
-
-        timer = Counter(create_start=True)
-        self.draw_content(wx.GraphicsContext.Create(dc))
-        #print(f"{self.__class__.__name__}: {timer.endT()}")
+        with get_tracer().span(f"paint:{self.__class__.__name__}", "paint"):
+            self.draw_content(wx.GraphicsContext.Create(dc))
 
     def draw_content(self, gc: wx.GraphicsContext):
         pass
@@ -1,16 +1,8 @@
-import json
-import logging
 import multiprocessing
 import os
 import random
-from dataclasses import dataclass
-from importlib import import_module
-from os import listdir
-from os.path import join, isfile, basename, exists, expandvars
+from os.path import expandvars
 from queue import Queue
-from subprocess import Popen, PIPE
-from sys import executable
-from sys import path
 from threading import Thread
 from time import sleep
 from typing import cast as type_cast
@@ -20,90 +12,260 @@ import wx
 from PIL import Image
 
 from base import *
-from gui.about_dialog import AboutDialog
-from gui.config import ConfigEditor
 from gui.font import ft
 from gui.win_icon import set_multi_size_icon
 from lib import startup_lib
-from lib.log import logger, get_plugin_logger
-from lib.perf import Counter
+from lib.control_api import ControlServer
+from lib.lifecycle import LifecycleResult
+from lib.log import logger
+from lib.plugin_host import PluginHost, PluginHostListener, PluginInfo, PluginState, WEKConfig, format_bytes
+from lib.startup_profile import startup_span
+
+RESOURCE_COLUMN = 5  # 资源占用列的起始位置: CPU, 线程, 唤醒/分, 内存
 
 
 # ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(ctypes.c_wchar_p("WinEnchantKit"))
 
-def get_packages():
-    packages = []
-    exec_ = executable
-    if exec_.endswith("pythonw.exe") or not exec_.endswith("python.exe"):
-        return []
-    proc = Popen([exec_, "-m", "pip", "list"], shell=True, stdout=PIPE)
-    proc.wait()
-    for i, line in enumerate(proc.stdout.readlines()):
-        line = line.decode("utf-8").rstrip("\r\n")
-        if i > 2:
-            packages.append(line.split(" ")[0])
-    logger.info(f"找到{len(packages)}个包: " + ", ".join(packages))
-    return packages
-
-
-class PluginState(Enum):
-    STOPPED = 0
-    STOPPING = 1
-    STARTING = 2
-    RUNNING = 3
-
-
-@dataclass
-class PluginInfo:
-    id: str
-    info: dict[str, Any]
-    main_class: BasePlugin
-    state: PluginState
-    line: int
-    logger: logging.Logger
-
-
-class WEKConfig(ModuleConfigPlus):
-    def __init__(self):
-        super().__init__()
-        self.font_size: IntParam | int = IntParam(11, "字体大小")
-        self.auto_startup_wait_time: FloatParam | float = FloatParam(1.0, "自动启动等待时间")
-        self.set_reg_startup: ButtonParam = ButtonParam(desc="设置注册表开机启动")
-        self.delete_reg_startup: ButtonParam = ButtonParam(desc="取消注册表开机启动")
-        self.set_task_startup: ButtonParam = ButtonParam(desc="设置任务计划开机启动 (更快)")
-        self.delete_task_startup: ButtonParam = ButtonParam(desc="取消任务计划开机启动")
-        self.open_log_dir: ButtonParam = ButtonParam(desc="打开日志目录")
+STATE_TEXTS = {
+    PluginState.STOPPED: "已停止",
+    PluginState.STOPPING: "停止中",
+    PluginState.STARTING: "启动中",
+    PluginState.RUNNING: "运行中",
+}
 
 
-class ControlPanel(wx.Frame):
+def status_text(plugin_info: PluginInfo) -> str:
+    if plugin_info.state == PluginState.STOPPED and not plugin_info.loaded:
+        return "未导入"
+    return STATE_TEXTS[plugin_info.state]
+
+
+class ControlPanelController(PluginHostListener):
+    """
+    托盘图标、插件宿主与控制接口
+    管理面板窗口在第一次显示时才创建, 隐藏期间插件的状态只记录在 PluginHost.plugins 中, 创建窗口时再填入列表
+    """
     SUCCESS_ENDS = ["o(*￣▽￣*)o", "ヾ(≧ ▽ ≦)ゝ", "(≧∇≦)ﾉ"]
     FAILED_ENDS = ["(⊙▃⊙;)?", "〒▽〒", "o(TヘTo)"]
 
-    def __init__(self, parent: wx.Window | None, show_window: bool = True):
-        super().__init__(parent, size=(860, 450), title="WinEnchantKit管理面板")
-
-        # 初始化变量
-        self.first_run = True
-        self.has_exited = False
+    def __init__(self, show_window: bool = True):
+        self.frame: ControlPanel | None = None
         self.stray_icon: pystray.Icon = None
         self.stray_icon_image = Image.open("assets/icon.png")
 
-        # 加载工具配置
-        self.config = WEKConfig()
-        self.config.set_reg_startup.handler = self.add_reg_auto_startup
-        self.config.delete_reg_startup.handler = self.remove_reg_auto_startup
-        self.config.set_task_startup.handler = self.add_task_auto_startup
-        self.config.delete_task_startup.handler = self.remove_task_auto_startup
-        self.config.open_log_dir.handler = self.open_log_dir
-        self.config.load()
-        self.read_config(first_load=True)
+        # 加载工具配置, 插件的加载与运行由 PluginHost 负责
+        config = WEKConfig()
+        config.set_reg_startup.handler = self.add_reg_auto_startup
+        config.delete_reg_startup.handler = self.remove_reg_auto_startup
+        config.set_task_startup.handler = self.add_task_auto_startup
+        config.delete_task_startup.handler = self.remove_task_auto_startup
+        config.open_log_dir.handler = self.open_log_dir
+        config.dump_plugin_resources.handler = self.dump_plugin_resources
+        config.dump_trace.handler = self.dump_trace
+        with startup_span("PluginHost.__init__"):
+            self.host = PluginHost(self, config)
+        self.config = self.host.config
+        self.plugins = self.host.plugins
+
+        with startup_span("创建托盘图标"):
+            self.create_stray_icon()
+        if show_window:
+            self.show_or_hide()
+        else:
+            self.stray_icon.run_detached()
+        self.host.load_all_plugins_async()
+        self.control_server = ControlServer(self.host, self.on_activate, wx.CallAfter)
+        self.control_server.start()
+
+    def ensure_frame(self) -> 'ControlPanel':
+        if self.frame is None:
+            with startup_span("创建管理面板"):
+                self.frame = ControlPanel(self)
+        return self.frame
+
+    def show_or_hide(self):
+        """在托盘与窗口之间切换, 需在GUI线程中调用"""
+        if self.frame is not None and self.frame.IsShown():
+            self.create_stray_icon()
+            self.stray_icon.run_detached()
+            self.frame.Hide()
+        else:
+            self.stray_icon.stop()
+            frame = self.ensure_frame()
+            frame.refresh_all()
+            frame.Show()
+
+    def show_window(self):
+        if self.frame is None or not self.frame.IsShown():
+            self.show_or_hide()
+        self.frame.Raise()
+
+    def destroy(self):
+        self.host.save_config(flush=True)  # 保存配置
+        if self.frame is not None:
+            frame, self.frame = self.frame, None
+            frame.Destroy()  # 再销毁窗口
+        app = wx.GetApp()
+        if app is not None:  # 窗口可能从未创建, 不能依赖最后一个窗口关闭时退出消息循环
+            app.ExitMainLoop()
+
+    def create_stray_icon(self):
+        # pystray 在自己的线程中调用菜单回调, 界面操作转到GUI线程
+        menu = pystray.Menu(pystray.MenuItem('显示窗口', lambda: wx.CallAfter(self.show_or_hide), default=True),
+                            pystray.MenuItem('退出', self.on_exit_gui))
+
+        self.stray_icon = pystray.Icon(name='Win Enchant Kit', title="Win Enchant Kit", icon=self.stray_icon_image,
+                                       menu=menu)
+
+    @staticmethod
+    def open_log_dir():
+        os.startfile(expandvars("%APPDATA%/WinEnchantKit/logs"))
+
+    def add_reg_auto_startup(self):
+        self.run_func_with_error_dialog(startup_lib.create_reg, "已添加注册表开机启动项", "添加开机启动项失败")
+
+    def remove_reg_auto_startup(self):
+        self.run_func_with_error_dialog(startup_lib.remove_reg, "已删除注册表开机启动项", "删除开机启动项失败")
+
+    def add_task_auto_startup(self):
+        self.run_func_with_error_dialog(startup_lib.create_task, "已添加计划任务开机启动项", "添加开机启动项失败")
+
+    def remove_task_auto_startup(self):
+        self.run_func_with_error_dialog(startup_lib.remove_task, "已删除计划任务开机启动项", "删除开机启动项失败")
+
+    def run_func_with_error_dialog(self, func, success_msg: str, failed_msg: str):
+        try:
+            func()
+            end = self.SUCCESS_ENDS[random.randint(0, len(self.SUCCESS_ENDS) - 1)]
+            wx.MessageBox(f"{success_msg}", f"成功！- {end}", wx.OK | wx.ICON_INFORMATION)
+        except Exception as e:
+            logger.info(f"{e.__class__.__name__}: {e} -> {failed_msg}")
+            end = self.FAILED_ENDS[random.randint(0, len(self.FAILED_ENDS) - 1)]
+            wx.MessageBox(f"{e.__class__.__name__}: {e}\n{failed_msg}",
+                          f"失败啦~ - {end}",
+                          wx.OK | wx.ICON_ERROR)
+
+    def dump_plugin_resources(self):
+        try:
+            fp = self.host.dump_plugin_resources()
+        except OSError as e:
+            wx.MessageBox(f"{e.__class__.__name__}: {e}", "导出插件资源占用失败", wx.OK | wx.ICON_ERROR)
+            return
+        wx.MessageBox(f"已导出到 {fp}", "导出成功", wx.OK | wx.ICON_INFORMATION)
+
+    def dump_trace(self):
+        try:
+            fp = self.host.dump_trace()
+        except OSError as e:
+            wx.MessageBox(f"{e.__class__.__name__}: {e}", "导出性能追踪失败", wx.OK | wx.ICON_ERROR)
+            return
+        wx.MessageBox(f"已导出到 {fp}\n同目录下的 .json 文件可在 chrome://tracing 或 Perfetto 中打开",
+                      "导出成功", wx.OK | wx.ICON_INFORMATION)
+
+    # PluginHostListener, 可能在后台线程中调用; 窗口未创建时只需要宿主中记录的状态
+    def on_plugin_registered(self, plugin_info: PluginInfo) -> int:
+        if self.frame is not None:
+            wx.CallAfter(self.frame.sync_rows)
+        return len(self.plugins)  # 列表按注册顺序排列, 行号即注册序号
+
+    def on_plugin_loaded(self, plugin_info: PluginInfo):
+        if self.frame is not None:
+            wx.CallAfter(self.frame.refresh_plugin_state, plugin_info)
+
+    def on_plugin_state_changed(self, plugin_info: PluginInfo):
+        if self.frame is not None:
+            wx.CallAfter(self.frame.refresh_plugin_state, plugin_info)
+
+    def on_resources_updated(self):
+        if self.frame is not None:
+            wx.CallAfter(self.frame.refresh_resource_columns)
+
+    def on_auto_start_finished(self):
+        if self.host.first_run:
+            self.host.first_run = False
+            ret = wx.MessageBox("你是第一次运行WinEnchantKit, 是否创建SMTC支持快捷方式?\n"
+                                "这样就可以在SMTC页面中看到 [🅺 Kugou]\n\n"
+                                "也可稍后在插件[高清酷狗封面]的配置中查看", "提示", wx.YES_NO | wx.ICON_QUESTION)
+            if ret == wx.YES:
+                main_class = self.host.ensure_plugin_loaded("hd_kugou_cover")
+                wx.CallAfter(type_cast(Any, main_class).install_kugou_lnk)
+
+    def on_requirements_installing(self, requirements: list[str]) -> Callable[[], None]:
+        msg = "正在安装依赖 {}，请稍候..."
+        msg_queue = Queue()
+        wx.CallAfter(self.progress_dialog_func, msg, msg_queue)
+        msg_queue.put((0, (", ".join(requirements),)))
+        return lambda: msg_queue.put("STOP")
+
+    def show_error(self, title: str, msg: str):
+        wx.CallAfter(wx.MessageBox, msg, title, wx.ICON_ERROR)
+
+    def on_activate(self) -> bool:
+        """再次启动程序时由控制接口调用, 显示已运行实例的窗口"""
+        wx.CallAfter(self.show_window)
+        return True
+
+    def progress_dialog_func(self, msg: str, msg_queue: Queue):
+        if self.frame is None or not self.frame.IsShown():
+            return
+        dialog = wx.GenericProgressDialog("安装插件依赖中", msg.format(""), 100,
+                                          style=wx.PD_APP_MODAL | wx.PD_AUTO_HIDE)
+        dialog.Pulse()
+
+        def msg_thread():
+            while True:
+                data = msg_queue.get(block=True)
+                if data == "STOP":
+                    wx.CallAfter(dialog.Destroy)
+                    break
+                _, format_args = data
+                wx.CallAfter(dialog.Pulse, msg.format(*format_args))
+
+        Thread(target=msg_thread, daemon=True).start()
+
+    @staticmethod
+    def show_lifecycle_error(result: LifecycleResult):
+        if not result.ok:
+            title = "启动插件时遇到错误" if result.action == "start" else "停止插件时遇到错误"
+            wx.CallAfter(wx.MessageBox, result.error, title, wx.ICON_ERROR)
+
+    def on_exit(self):
+        if self.host.has_exited:
+            return
+        logger.info("正在退出")
+        Thread(target=self.on_exit_timeout, daemon=True).start()
+        self.control_server.close()
+        self.stray_icon.stop()
+        self.host.shutdown()
+        logger.info("再见！")
+
+    @staticmethod
+    def on_exit_timeout():
+        sleep(4)
+        logger.info("退出时间到达限制 (4s), 触发大保底, 直接杀进程！")
+        for process in multiprocessing.active_children():
+            process.terminate()
+        import ctypes
+        ctypes.windll.kernal32.ExitProcess(0)
+        exit(0)
+
+    def on_exit_gui(self, *_):
+        wx.CallAfter(self.destroy)
+        Thread(target=self.on_exit).start()
+
+
+class ControlPanel(wx.Frame):
+    def __init__(self, controller: ControlPanelController):
+        super().__init__(None, size=(860, 450), title="WinEnchantKit管理面板")
+        self.controller = controller
+        self.host = controller.host
+        self.config = controller.config
+        self.plugins = controller.plugins
+        self.log_viewer: wx.Frame | None = None
+        self.perf_viewer: wx.Frame | None = None
 
         # 初始化控件
         self.SetFont(ft(self.config.font_size))
-        self.plugins_config = {}
-        self.packages = []
-        self.plugins: dict[str, PluginInfo] = {}
-        self.auto_launch_plugins: list[str] = []
         self.sizer = wx.BoxSizer(wx.HORIZONTAL)
         self.plugins_lc = wx.ListCtrl(self, style=wx.LC_REPORT)
         self.plugins_lc.InsertColumn(0, "插件ID")
@@ -111,6 +273,10 @@ class ControlPanel(wx.Frame):
         self.plugins_lc.InsertColumn(2, "状态", width=60)
         self.plugins_lc.InsertColumn(3, "版本", width=60)
         self.plugins_lc.InsertColumn(4, "描述", width=450)
+        self.plugins_lc.InsertColumn(RESOURCE_COLUMN, "CPU", width=60)
+        self.plugins_lc.InsertColumn(RESOURCE_COLUMN + 1, "线程", width=50)
+        self.plugins_lc.InsertColumn(RESOURCE_COLUMN + 2, "唤醒/分", width=70)
+        self.plugins_lc.InsertColumn(RESOURCE_COLUMN + 3, "内存", width=80)
         self.plugins_lc.SetColumnWidth(0, 0)
 
         # 布局控件
@@ -119,15 +285,23 @@ class ControlPanel(wx.Frame):
         self.start_btn = wx.Button(self.button_panel, label="启动")
         self.stop_btn = wx.Button(self.button_panel, label="停止")
         self.config_btn = wx.Button(self.button_panel, label="配置")
+        self.reload_btn = wx.Button(self.button_panel, label="重载")
         self.auto_launch_cb = wx.CheckBox(self.button_panel, label="自动启动")
+        self.isolated_cb = wx.CheckBox(self.button_panel, label="独立进程 (重启生效)")
+        self.log_viewer_btn = wx.Button(self.button_panel, label="日志")
+        self.perf_viewer_btn = wx.Button(self.button_panel, label="性能")
         self.about_dialog_btn = wx.Button(self.button_panel, label="关于")
         self.self_config_btn = wx.Button(self.button_panel, label="程序配置")
         self.exit_btn = wx.Button(self.button_panel, label="退出程序")
         self.button_panel.sizer.Add(self.start_btn, 0, wx.EXPAND)
         self.button_panel.sizer.Add(self.stop_btn, 0, wx.EXPAND)
         self.button_panel.sizer.Add(self.config_btn, 0, wx.EXPAND)
+        self.button_panel.sizer.Add(self.reload_btn, 0, wx.EXPAND)
         self.button_panel.sizer.Add(self.auto_launch_cb, 0, wx.EXPAND | wx.LEFT, 2)
+        self.button_panel.sizer.Add(self.isolated_cb, 0, wx.EXPAND | wx.LEFT, 2)
         self.button_panel.sizer.AddStretchSpacer()
+        self.button_panel.sizer.Add(self.log_viewer_btn, 0, wx.EXPAND)
+        self.button_panel.sizer.Add(self.perf_viewer_btn, 0, wx.EXPAND)
         self.button_panel.sizer.Add(self.about_dialog_btn, 0, wx.EXPAND)
         self.button_panel.sizer.Add(self.self_config_btn, 0, wx.EXPAND)
         self.button_panel.sizer.Add(self.exit_btn, 0, wx.EXPAND)
@@ -141,272 +315,155 @@ class ControlPanel(wx.Frame):
         self.start_btn.Bind(wx.EVT_BUTTON, self.start_plugin_gui)
         self.stop_btn.Bind(wx.EVT_BUTTON, self.stop_plugin_gui)
         self.config_btn.Bind(wx.EVT_BUTTON, self.config_plugin_gui)
+        self.reload_btn.Bind(wx.EVT_BUTTON, self.reload_plugin_gui)
         self.auto_launch_cb.Bind(wx.EVT_CHECKBOX, self.auto_launch_gui)
+        self.isolated_cb.Bind(wx.EVT_CHECKBOX, self.isolated_gui)
+        self.log_viewer_btn.Bind(wx.EVT_BUTTON, self.on_log_viewer)
+        self.perf_viewer_btn.Bind(wx.EVT_BUTTON, self.on_perf_viewer)
         self.about_dialog_btn.Bind(wx.EVT_BUTTON, self.on_about_dialog)
         self.self_config_btn.Bind(wx.EVT_BUTTON, self.on_config_self)
-        self.exit_btn.Bind(wx.EVT_BUTTON, self.on_exit_gui)
+        self.exit_btn.Bind(wx.EVT_BUTTON, self.controller.on_exit_gui)
         self.plugins_lc.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_item_selected)
         self.Bind(wx.EVT_CLOSE, self.on_close_window)
 
         self.start_btn.Disable()
         self.stop_btn.Disable()
+        self.reload_btn.Disable()
 
-        set_multi_size_icon(self, "assets/icon.png", Image.Resampling.BICUBIC)
-        self.create_stray_icon()
-        if not show_window and self.stray_icon is not None:
-            self.stray_icon.run_detached()
-        self.Show(show_window)
-        self.read_config()
-        self.load_all_plugins_gui()
+        with startup_span("set_multi_size_icon"):
+            set_multi_size_icon(self, "assets/icon.png", Image.Resampling.BICUBIC)
+        self.sync_rows()
 
-    def on_about_dialog(self, _):
-        dialog = AboutDialog(self)
-        dialog.Show()
-
-    def on_config_self(self, _):
-        dialog = ConfigEditor(self, "WinEnchantKit", self.config, self.self_config_cbk)
-        dialog.ShowModal()
-        self.save_config()
-
-    def self_config_cbk(self, config):
-        self.config.update(config)
+    def sync_rows(self):
+        """把尚未显示的插件按注册顺序加入列表 (窗口创建前注册的插件在此一次性补上)"""
+        if self.host.has_exited or not self.plugins_lc:
+            return
+        for plugin_info in list(self.plugins.values())[self.plugins_lc.GetItemCount():]:
+            self.add_plugin_to_gui(plugin_info.info, status_text(plugin_info))
+
+    def refresh_all(self):
+        self.sync_rows()
+        for plugin_info in list(self.plugins.values()):
+            self.refresh_plugin_state(plugin_info)
+        self.refresh_resource_columns(force=True)
+
+    def on_log_viewer(self, _):
+        if self.log_viewer:
+            self.log_viewer.Raise()
+            return
+        from gui.log_viewer import LogViewer
+        from lib.log_store import get_log_store
 
-    @staticmethod
-    def open_log_dir():
-        os.startfile(expandvars("%APPDATA%/WinEnchantKit/logs"))
+        self.log_viewer = LogViewer(self, get_log_store())
+        self.log_viewer.Show()
 
-    def add_reg_auto_startup(self):
-        self.run_func_with_error_dialog(startup_lib.create_reg, "已添加注册表开机启动项", "添加开机启动项失败")
+    def on_perf_viewer(self, _):
+        if self.perf_viewer:
+            self.perf_viewer.Raise()
+            return
+        from gui.perf_viewer import PerfViewer
 
-    def remove_reg_auto_startup(self):
-        self.run_func_with_error_dialog(startup_lib.remove_reg, "已删除注册表开机启动项", "删除开机启动项失败")
+        self.perf_viewer = PerfViewer(self)
+        self.perf_viewer.Show()
 
-    def add_task_auto_startup(self):
-        self.run_func_with_error_dialog(startup_lib.create_task, "已添加计划任务开机启动项", "添加开机启动项失败")
+    def on_about_dialog(self, _):
+        from gui.about_dialog import AboutDialog  # 依赖DWM相关模块, 用到时才导入
 
-    def remove_task_auto_startup(self):
-        self.run_func_with_error_dialog(startup_lib.remove_task, "已删除计划任务开机启动项", "删除开机启动项失败")
+        dialog = AboutDialog(self)
+        dialog.Show()
 
-    def run_func_with_error_dialog(self, func, success_msg: str, failed_msg: str):
-        try:
-            func()
-            end = self.SUCCESS_ENDS[random.randint(0, len(self.SUCCESS_ENDS) - 1)]
-            wx.MessageBox(f"{success_msg}", f"成功！- {end}", wx.OK | wx.ICON_INFORMATION)
-        except Exception as e:
-            logger.info(f"{e.__class__.__name__}: {e} -> {failed_msg}")
-            end = self.FAILED_ENDS[random.randint(0, len(self.FAILED_ENDS) - 1)]
-            wx.MessageBox(f"{e.__class__.__name__}: {e}\n{failed_msg}",
-                          f"失败啦~ - {end}",
-                          wx.OK | wx.ICON_ERROR)
+    def on_config_self(self, _):
+        from gui.config import ConfigEditor
 
-    def load_all_plugins_gui(self):
-        Thread(target=self.load_all_plugins, daemon=True).start()
-
-    def load_all_plugins(self):
-        logger.info("加载插件中...")
-        timer = Counter(create_start=True)
-        # self.packages = get_packages()
-        for dir_name in listdir("plugins"):
-            logger.info(f"加载插件: [{dir_name}]")
-            plugin_dir = join("plugins", dir_name)
-            if not self.load_plugin(plugin_dir):
-                logger.error(f"加载插件失败: [{dir_name}]")
-        logger.info(f"加载插件完成, 用时: {timer.endT()}")
-        Thread(target=self.auto_start_plugins, daemon=True).start()
-
-    def auto_start_plugins(self):
-        sleep(self.config.auto_startup_wait_time)
-        for plugin_id in self.auto_launch_plugins:
-            info = self.plugins[plugin_id]
-            if info.state == PluginState.STOPPED:
-                self.start_plugin(plugin_id)
-                info.state = PluginState.RUNNING
-                self.plugins_lc.SetItem(info.line, 2, "运行中")
-        for index in range(self.plugins_lc.GetItemCount()):
-            item: wx.ListItem = self.plugins_lc.GetItem(index)
-            self.refresh_button_state(item.GetId())
-
-        if self.first_run:
-            self.first_run = False
-            ret = wx.MessageBox("你是第一次运行WinEnchantKit, 是否创建SMTC支持快捷方式?\n"
-                                "这样就可以在SMTC页面中看到 [🅺 Kugou]\n\n"
-                                "也可稍后在插件[高清酷狗封面]的配置中查看", "提示", wx.YES_NO | wx.ICON_QUESTION)
-            if ret == wx.YES:
-                wx.CallAfter(type_cast(Any, self.plugins["hd_kugou_cover"].main_class).install_kugou_lnk)
-
-    def load_plugin(self, plugin_dir: str):
-        if isfile(join(plugin_dir, "plugin.json")):
-            with open(join(plugin_dir, "plugin.json"), "r", encoding="utf-8") as f:
-                plugin_info = json.load(f)
-            if not self.inst_plugin_req_gui(plugin_info):
-                return False
-            path.append(plugin_dir)
-            plugin_logger = get_plugin_logger(plugin_info["id"], plugin_info["name"])
-            module = import_module(f"plugins.{basename(plugin_dir)}.{plugin_info['main_file'].split('.')[0]}")
-            main_class: BasePlugin = getattr(module, plugin_info["main_class"])()
-            line = self.add_plugin_to_gui(plugin_info)
-            self.plugins[plugin_info["id"]] = PluginInfo(plugin_info["id"], plugin_info, main_class,
-                                                         PluginState.STOPPED, line, plugin_logger)
-            if plugin_info["id"] in self.plugins_config:
-                main_class.config.load_values(self.plugins_config[plugin_info["id"]])
-            return True
-        else:
-            return False
-
-    def inst_plugin_req_gui(self, plugin_info: dict[str, Any]):
-        if plugin_info["requirements"]:
-            msg = "正在加载插件{} ({}/{})，请稍候..."
-            msg_queue = Queue()
-            wx.CallAfter(self.progress_dialog_func, msg, msg_queue)
-            for i, (req, version) in enumerate(plugin_info["requirements"].items()):
-                msg_queue.put((0, msg.format(req, i, len(plugin_info["requirements"]))))
-                if req in self.packages or self.packages == []:
-                    continue
-                logger.debug(f"安装依赖 {req}")
-                result = self.inst_package_thread(req, version, [])
-                if not result:
-                    msg_queue.put("STOP")
-                    wx.MessageBox(f"安装依赖{req}失败，请手动安装依赖后再次尝试", "错误", wx.ICON_ERROR)
-                    return False
-            msg_queue.put("STOP")
-        return True
+        dialog = ConfigEditor(self, "WinEnchantKit", self.config, self.host.update_self_config)
+        dialog.ShowModal()
+        self.host.save_config()
 
-    def progress_dialog_func(self, msg: str, msg_queue: Queue):
-        if not self.IsShown():
+    def reload_plugin_gui(self, _):
+        item = self.plugins_lc.GetFocusedItem()
+        if item == -1:
+            wx.MessageBox("请选择一个插件", "错误", wx.ICON_ERROR)
             return
-        dialog = wx.GenericProgressDialog("安装插件中", msg, 100,
-                                          style=wx.PD_APP_MODAL | wx.PD_CAN_ABORT | wx.PD_AUTO_HIDE)
-        dialog.Pulse()
+        self.host.reload_plugin(self.plugins_lc.GetItemText(item, 0), self.controller.show_lifecycle_error)
 
-        def msg_thread():
-            wx.CallAfter(dialog.ShowModal)
-            while True:
-                data = msg_queue.get(block=True)
-                if data == "STOP":
-                    wx.CallAfter(dialog.EndModal, wx.ID_OK)
-                    break
-                value, format_args = data
-                wx.CallAfter(dialog.Update, value, msg.format(*format_args))
-
-        thread = Thread(target=msg_thread, daemon=True)
-        thread.start()
-        thread.join()
-        dialog.Destroy()
-
-    @staticmethod
-    def inst_package_thread(package_name: str, version: str, result_list: list):
-        proc = Popen([executable, "-m", "pip", "install", package_name + (version if version else "")], shell=True)
-        proc.wait()
-        if proc.returncode != 0:
-            result_list.append(False)
-            return False
-        result_list.append(True)
-        return True
-
-    def add_plugin_to_gui(self, plugin_info: dict[str, Any]) -> int:
+    def refresh_resource_columns(self, force: bool = False):
+        if self.host.has_exited or not self.plugins_lc or not (force or self.IsShown()):
+            return
+        for plugin_info in list(self.plugins.values()):
+            if plugin_info.line >= self.plugins_lc.GetItemCount():
+                continue
+            usage = plugin_info.resources
+            wakeups = "-" if usage.wakeups_per_min is None else f"{usage.wakeups_per_min:.0f}"
+            self.plugins_lc.SetItem(plugin_info.line, RESOURCE_COLUMN, f"{usage.cpu_percent:.1f}%")
+            self.plugins_lc.SetItem(plugin_info.line, RESOURCE_COLUMN + 1, str(usage.threads))
+            self.plugins_lc.SetItem(plugin_info.line, RESOURCE_COLUMN + 2, wakeups)
+            self.plugins_lc.SetItem(plugin_info.line, RESOURCE_COLUMN + 3, format_bytes(usage.alloc_bytes))
+
+    def add_plugin_to_gui(self, plugin_info: dict[str, Any], status: str = "已加载") -> int:
         line = self.plugins_lc.InsertItem(self.plugins_lc.GetItemCount(), plugin_info["id"])
         self.plugins_lc.SetItem(line, 1, plugin_info["name"])
-        self.plugins_lc.SetItem(line, 2, "已加载")
+        self.plugins_lc.SetItem(line, 2, status)
         self.plugins_lc.SetItem(line, 3, plugin_info["version"])
         self.plugins_lc.SetItem(line, 4, plugin_info["desc"])
         return line
 
     def config_plugin_gui(self, _: str):
+        from gui.config import ConfigEditor
+
         item = self.plugins_lc.GetFocusedItem()
         if item == -1:
             wx.MessageBox("请选择一个插件", "错误", wx.ICON_ERROR)
             return
         plugin_info: PluginInfo = self.plugins[self.plugins_lc.GetItemText(item, 0)]
+        if not plugin_info.loaded and not plugin_info.main_class.config:  # 没有缓存的配置结构, 只能先导入
+            self.host.ensure_plugin_loaded(plugin_info.id)
         if plugin_info.main_class.config:
             dialog = ConfigEditor(self, plugin_info.info["name"], plugin_info.main_class.config,
-                                  lambda cfg: self.plugin_config_cbk(plugin_info.id, cfg))
+                                  lambda cfg: self.host.update_plugin_config(plugin_info.id, cfg))
             dialog.ShowModal()
-            self.save_config()
-
-    def plugin_config_cbk(self, id_: str, config_dict: dict[str, Any]):
-        plugin_info = self.plugins[id_]
-        if plugin_info.main_class.config:
-            plugin_info.main_class.update_config(plugin_info.main_class.config.copy(), config_dict)
-        self.save_config()
+            self.host.save_config()
 
     def on_item_selected(self, event: wx.ListEvent):
         if event.GetIndex() != -1:
             self.refresh_button_state(event.GetIndex())
 
-    def start_plugin(self, id_: str, start_before_cbk: Callable[[], None] = lambda: None) -> str | None:
-        plugin_info = self.plugins[id_]
-        logger.info(f"启动插件: [{plugin_info.info['name']}]")
-        try:
-            if plugin_info.state == PluginState.STOPPED:
-                plugin_info.state = PluginState.STARTING
-                start_before_cbk()
-                plugin_info.main_class.start()
-                plugin_info.state = PluginState.RUNNING
-                plugin_info.main_class.enable = True
-                logger.info(f"插件启动成功: [{plugin_info.info['name']}]")
-                return None
-            else:
-                logger.warning(f"插件 [{plugin_info.info['name']}] 已处于启动状态")
-                return None
-        except Exception as e:
-            plugin_info.state = PluginState.STOPPED
-            logger.error(f"启动插件 [{plugin_info.info['name']}] 失败: {str(e)}")
-            return str(e)
-
     def start_plugin_gui(self, _):
         item = self.plugins_lc.GetFocusedItem()
         if item == -1:
             wx.MessageBox("请选择一个插件", "错误", wx.ICON_ERROR)
             return
-        msg = self.start_plugin(self.plugins_lc.GetItemText(item, 0), lambda: self.refresh_button_state(item))
-        if msg:
-            wx.MessageBox(msg, "启动插件时遇到错误", wx.ICON_ERROR)
-        else:
-            self.plugins_lc.SetItem(self.plugins_lc.GetFocusedItem(), 2, "运行中")
-        self.refresh_button_state(item)
-
-    def stop_plugin(self, id_: str, stop_before_cbk: Callable[[], None]) -> str | None:
-        plugin_info = self.plugins[id_]
-        logger.info(f"停止插件: [{plugin_info.info['name']}]")
-        try:
-            if plugin_info.state == PluginState.RUNNING:
-                plugin_info.state = PluginState.STOPPING
-                stop_before_cbk()
-                plugin_info.main_class.stop()
-                plugin_info.state = PluginState.STOPPED
-                plugin_info.main_class.enable = False
-                logger.info(f"插件 [{plugin_info.info['name']}] 已停止")
-                return None
-            else:
-                logger.warning(f"插件 [{plugin_info.info['name']}] 已处于停止状态")
-                return None
-        except Exception as e:
-            plugin_info.state = PluginState.RUNNING
-            logger.error(f"停止插件 [{plugin_info.info['name']}] 失败: {str(e)}")
-            return str(e)
+        self.host.start_plugin(self.plugins_lc.GetItemText(item, 0), self.controller.show_lifecycle_error)
 
     def stop_plugin_gui(self, _):
         item = self.plugins_lc.GetFocusedItem()
         if item == -1:
             wx.MessageBox("请选择一个插件", "错误", wx.ICON_ERROR)
             return
-        msg = self.stop_plugin(self.plugins_lc.GetItemText(item, 0), lambda: self.refresh_button_state(item))
-        if msg:
-            wx.MessageBox(msg, "停止插件时遇到错误", wx.ICON_ERROR)
-        else:
-            self.plugins_lc.SetItem(self.plugins_lc.GetFocusedItem(), 2, "已停止")
-        self.refresh_button_state(item)
+        self.host.stop_plugin(self.plugins_lc.GetItemText(item, 0), self.controller.show_lifecycle_error)
+
+    def refresh_plugin_state(self, plugin_info: PluginInfo):
+        if self.host.has_exited or not self.plugins_lc:  # 窗口已销毁
+            return
+        if plugin_info.line >= self.plugins_lc.GetItemCount():
+            self.sync_rows()
+        self.plugins_lc.SetItem(plugin_info.line, 2, status_text(plugin_info))
+        if self.plugins_lc.GetFocusedItem() == plugin_info.line:
+            self.refresh_button_state(plugin_info.line)
 
     def auto_launch_gui(self, _):
         item = self.plugins_lc.GetFocusedItem()
         if item == -1:
             wx.MessageBox("请选择一个插件", "错误", wx.ICON_ERROR)
             return
-        plugin_id = self.plugins_lc.GetItemText(item, 0)
-        if plugin_id in self.auto_launch_plugins:
-            self.auto_launch_plugins.remove(plugin_id)
-        else:
-            self.auto_launch_plugins.append(plugin_id)
+        self.host.toggle_auto_launch(self.plugins_lc.GetItemText(item, 0))
+        self.refresh_button_state(item)
+
+    def isolated_gui(self, _):
+        item = self.plugins_lc.GetFocusedItem()
+        if item == -1:
+            wx.MessageBox("请选择一个插件", "错误", wx.ICON_ERROR)
+            return
+        self.host.toggle_isolated(self.plugins_lc.GetItemText(item, 0))
         self.refresh_button_state(item)
 
     def refresh_button_state(self, item: int):
@@ -423,99 +480,13 @@ class ControlPanel(wx.Frame):
         elif info.state == PluginState.STARTING:
             self.start_btn.Disable()
             self.stop_btn.Disable()
-        self.auto_launch_cb.SetValue(info.id in self.auto_launch_plugins)
+        self.reload_btn.Enable(info.state in (PluginState.RUNNING, PluginState.STOPPED))
+        self.auto_launch_cb.SetValue(info.id in self.host.auto_launch_plugins)
+        self.isolated_cb.SetValue(info.id in self.host.isolated_plugins)
 
     def on_close_window(self, event: wx.CloseEvent):
         if event.CanVeto():
-            self.show_or_hide()
+            self.controller.show_or_hide()
             event.Veto()
             return
-        self.Destroy()
-
-    def Destroy(self):
-        self.save_config()  # 保存配置
-        super().Destroy()  # 再销毁窗口
-
-    def on_exit(self):
-        if self.has_exited:
-            return
-        logger.info("正在退出")
-        Thread(target=self.on_exit_timeout, daemon=True).start()
-        self.save_config()
-        self.stray_icon.stop()
-        for plugin_info in self.plugins.values():
-            if plugin_info.state == PluginState.RUNNING:
-                self.stop_plugin(plugin_info.id, lambda: None)
-        logger.info("再见！")
-        self.has_exited = True
-
-    @staticmethod
-    def on_exit_timeout():
-        sleep(4)
-        logger.info("退出时间到达限制 (4s), 触发大保底, 直接杀进程！")
-        for process in multiprocessing.active_children():
-            process.terminate()
-        import ctypes
-        ctypes.windll.kernal32.ExitProcess(0)
-        exit(0)
-
-    def show_or_hide(self):
-        if self.IsShown():
-            self.create_stray_icon()
-            self.stray_icon.run_detached()
-            self.Hide()
-        else:
-            self.stray_icon.stop()
-            self.Show()
-
-    def on_exit_gui(self, *_):
-        self.Destroy()
-        Thread(target=self.on_exit).start()
-
-    def create_stray_icon(self):
-        menu = pystray.Menu(pystray.MenuItem('显示窗口', self.show_or_hide, default=True),
-                            pystray.MenuItem('退出', self.on_exit_gui))
-
-        self.stray_icon = pystray.Icon(name='Win Enchant Kit', title="Win Enchant Kit", icon=self.stray_icon_image,
-                                       menu=menu)
-
-    def save_config(self):
-        config_fp = r".\config.json"
-        config_data = {
-            "first_run": self.first_run,
-            "WEK_config": self.config.copy(),
-            'auto_launch': self.auto_launch_plugins,
-            'plugins': {}
-        }
-        for plugin_id, plugin_info in self.plugins.items():
-            prepare = {}
-            for key, value in plugin_info.main_class.config.items():
-                if type(value) in [str, int, float, bool, tuple, list, dict]:
-                    prepare[key] = value
-                if isinstance(value, Enum):
-                    prepare[key] = value.value
-            config_data['plugins'][plugin_id] = prepare
-        try:
-            content = json.dumps(config_data, indent=4, ensure_ascii=False)
-            with open(config_fp, "w", encoding="utf-8") as f:
-                f.write(content)
-        except OSError:
-            logger.error("无法保存配置文件")
-
-    def read_config(self, first_load: bool = False):
-        config_fp = r".\config.json"
-        if not exists(config_fp):
-            if not first_load:
-                self.save_config()  # 创建空配置
-            return
-        try:
-            with open(config_fp, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.first_run = data.get("first_run", self.first_run)
-                if data.get("WEK_config"):
-                    self.self_config_cbk(data["WEK_config"])
-                self.auto_launch_plugins = data.get('auto_launch', [])
-                # 加载插件配置
-                self.plugins_config = data.get('plugins', {})
-        except OSError:
-            logger.error("无法读取配置文件")
+        self.controller.destroy()
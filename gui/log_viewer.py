@@ -0,0 +1,161 @@
+"""
+日志查看器
+通过虚拟列表 (LC_VIRTUAL) 显示内存日志存储中的记录, 只为可见的行取数据, 记录数量再多也不会卡顿;
+切换插件/等级筛选时重新扫描存储, 之后定时只扫描新增的记录
+"""
+import logging
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+import wx
+
+from gui.font import ft
+from lib.log import plugin_names, PLUGIN_LOGGER_PREFIX
+from lib.log_store import LogStore, LogEntry, MAIN_SOURCE
+
+REFRESH_INTERVAL = 500  # 毫秒
+LEVEL_FILTERS = [("全部等级", 0), ("DEBUG", logging.DEBUG), ("INFO", logging.INFO), ("WARNING", logging.WARNING),
+                 ("ERROR", logging.ERROR)]
+LEVEL_COLOURS = {
+    logging.DEBUG: wx.Colour(128, 128, 128),
+    logging.WARNING: wx.Colour(190, 120, 0),
+    logging.ERROR: wx.Colour(210, 0, 0),
+    logging.CRITICAL: wx.Colour(160, 0, 0),
+}
+ALL_PLUGINS = "全部来源"
+MAIN_SOURCE_NAME = "主程序"
+
+
+def source_name(plugin: str) -> str:
+    if plugin == MAIN_SOURCE:
+        return MAIN_SOURCE_NAME
+    return plugin_names.get(f"{PLUGIN_LOGGER_PREFIX}{plugin}", plugin)
+
+
+class LogListCtrl(wx.ListCtrl):
+    def __init__(self, parent: wx.Window, store: LogStore):
+        super().__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
+        self.store = store
+        self.view = array("q")  # 当前筛选结果中的记录序号
+        self.cached: LogEntry | None = None
+        self.attrs: dict[int, wx.ItemAttr] = {}
+        for level, colour in LEVEL_COLOURS.items():
+            attr = wx.ItemAttr()
+            attr.SetTextColour(colour)
+            self.attrs[level] = attr
+        self.AppendColumn("时间", width=150)
+        self.AppendColumn("等级", width=75)
+        self.AppendColumn("来源", width=130)
+        self.AppendColumn("线程", width=130)
+        self.AppendColumn("消息", width=700)
+
+    def entry(self, item: int) -> LogEntry | None:
+        if item >= len(self.view):
+            return None
+        seq = self.view[item]
+        if self.cached is None or self.cached.seq != seq:  # 每行的各列依次获取, 缓存最近一条
+            self.cached = self.store.get(seq)
+        return self.cached
+
+    def OnGetItemText(self, item: int, column: int) -> str:
+        entry = self.entry(item)
+        if entry is None:
+            return ""
+        if column == 0:
+            return datetime.fromtimestamp(entry.time).strftime("%m-%d %H:%M:%S.%f")[:-3]
+        elif column == 1:
+            return logging.getLevelName(entry.level)
+        elif column == 2:
+            return source_name(entry.plugin)
+        elif column == 3:
+            return entry.thread
+        return entry.message
+
+    def OnGetItemAttr(self, item: int):
+        entry = self.entry(item)
+        return None if entry is None else self.attrs.get(entry.level)
+
+
+class LogViewer(wx.Frame):
+    def __init__(self, parent: wx.Window | None, store: LogStore):
+        super().__init__(parent, title="日志查看器", size=(1100, 600))
+        self.store = store
+        self.scanned_seq = 0
+        self.plugin_filter: str | None = None
+        self.level_filter = 0
+        self.known_plugins = 0
+
+        self.SetFont(ft(10))
+        self.toolbar = wx.Panel(self)
+        self.plugin_choice = wx.Choice(self.toolbar, choices=[ALL_PLUGINS])
+        self.plugin_choice.SetSelection(0)
+        self.level_choice = wx.Choice(self.toolbar, choices=[name for name, _ in LEVEL_FILTERS])
+        self.level_choice.SetSelection(0)
+        self.follow_cb = wx.CheckBox(self.toolbar, label="自动滚动")
+        self.follow_cb.SetValue(True)
+        self.count_text = wx.StaticText(self.toolbar)
+        toolbar_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        toolbar_sizer.Add(self.plugin_choice, 0, wx.ALL, 3)
+        toolbar_sizer.Add(self.level_choice, 0, wx.ALL, 3)
+        toolbar_sizer.Add(self.follow_cb, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 3)
+        toolbar_sizer.AddStretchSpacer()
+        toolbar_sizer.Add(self.count_text, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 3)
+        self.toolbar.SetSizer(toolbar_sizer)
+
+        self.list = LogListCtrl(self, store)
+        self.sizer = wx.BoxSizer(wx.VERTICAL)
+        self.sizer.Add(self.toolbar, 0, wx.EXPAND)
+        self.sizer.Add(self.list, 1, wx.EXPAND)
+        self.SetSizer(self.sizer)
+
+        self.plugin_choice.Bind(wx.EVT_CHOICE, self.on_filter_changed)
+        self.level_choice.Bind(wx.EVT_CHOICE, self.on_filter_changed)
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda _: self.refresh())
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.timer.Start(REFRESH_INTERVAL)
+        self.rescan()
+
+    def sync_plugin_choices(self):
+        plugins = self.store.plugins.names
+        for plugin in plugins[self.known_plugins:]:
+            self.plugin_choice.Append(source_name(plugin), plugin)
+        self.known_plugins = len(plugins)
+
+    def on_filter_changed(self, _):
+        selection = self.plugin_choice.GetSelection()
+        self.plugin_filter = None if selection <= 0 else self.plugin_choice.GetClientData(selection)
+        self.level_filter = LEVEL_FILTERS[self.level_choice.GetSelection()][1]
+        self.rescan()
+
+    def rescan(self):
+        self.list.view, self.scanned_seq = self.store.scan(0, self.plugin_filter, self.level_filter)
+        self.list.cached = None
+        self.update_list(force_refresh=True)
+
+    def refresh(self):
+        if self.store.next_seq == self.scanned_seq:
+            return
+        view = self.list.view
+        new_seqs, self.scanned_seq = self.store.scan(self.scanned_seq, self.plugin_filter, self.level_filter)
+        view.extend(new_seqs)
+        evicted = bisect_left(view, self.store.first_seq)  # 去掉已被覆盖的记录
+        if evicted:
+            del view[:evicted]
+        self.update_list(force_refresh=evicted > 0)
+
+    def update_list(self, force_refresh: bool = False):
+        self.sync_plugin_choices()
+        count = len(self.list.view)
+        self.list.SetItemCount(count)
+        if force_refresh:  # 行与记录的对应关系改变, 需要重绘可见的行
+            self.list.Refresh()
+        if self.follow_cb.GetValue() and count:
+            self.list.EnsureVisible(count - 1)
+        self.count_text.SetLabel(f"{count} / {self.store.next_seq - self.store.first_seq} 条")
+        self.toolbar.Layout()
+
+    def on_close(self, event: wx.CloseEvent):
+        self.timer.Stop()
+        event.Skip()
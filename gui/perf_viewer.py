@@ -0,0 +1,154 @@
+"""
+性能面板
+每秒采样一次注册表中的指标 (事件速率、热点耗时、队列深度、缓存命中率、主循环延迟、插件CPU),
+列表原地更新, 下方曲线显示选中指标最近两分钟的变化; 窗口隐藏或最小化时不采样
+"""
+import math
+from time import monotonic
+
+import wx
+
+from gui.font import ft
+from lib.metrics import (EVENTS, LATENCY, QUEUES, CACHES, MAIN_LOOP, PLUGIN_CPU, MetricRow, MetricsSampler,
+                         get_metrics)
+
+SAMPLE_INTERVAL = 1000  # 毫秒
+SECTION_ORDER = [MAIN_LOOP, EVENTS, LATENCY, QUEUES, CACHES, PLUGIN_CPU]
+MAIN_LOOP_METRIC = "wx 主循环"
+CHART_HEIGHT = 160
+CHART_MARGIN = 8
+CHART_COLOUR = wx.Colour(0, 120, 215)
+
+
+def format_value(row: MetricRow) -> str:
+    if row.value is None:
+        return "-"
+    if row.section == QUEUES:
+        return f"{row.value:.0f}"
+    return f"{row.value:.1f} {row.unit}".rstrip()
+
+
+def sort_key(row: MetricRow) -> tuple[int, str]:
+    section = SECTION_ORDER.index(row.section) if row.section in SECTION_ORDER else len(SECTION_ORDER)
+    return section, row.name
+
+
+class ChartPanel(wx.Panel):
+    """选中指标的历史曲线, 没有数据的采样点处断开"""
+
+    def __init__(self, parent: wx.Window, sampler: MetricsSampler):
+        super().__init__(parent, size=(-1, CHART_HEIGHT))
+        self.sampler = sampler
+        self.row: MetricRow | None = None
+        self.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.Bind(wx.EVT_PAINT, self.on_paint)
+        self.Bind(wx.EVT_SIZE, lambda _: self.Refresh())
+
+    def set_row(self, row: MetricRow | None):
+        self.row = row
+        self.Refresh()
+
+    def on_paint(self, _):
+        dc = wx.AutoBufferedPaintDC(self)
+        dc.SetBackground(wx.WHITE_BRUSH)
+        dc.Clear()
+        width, height = self.GetClientSize()
+        if self.row is None:
+            dc.DrawText("选择一个指标以显示曲线", CHART_MARGIN, CHART_MARGIN)
+            return
+        values = list(self.sampler.history.get(self.row.key, ()))
+        finite = [value for value in values if not math.isnan(value)]
+        top = max(finite, default=0.0) or 1.0
+        dc.DrawText(f"{self.row.section} · {self.row.name}    最大 {top:.1f} {self.row.unit}".rstrip(),
+                    CHART_MARGIN, CHART_MARGIN)
+
+        plot_top = CHART_MARGIN * 2 + dc.GetCharHeight()
+        plot_height = max(height - plot_top - CHART_MARGIN, 1)
+        plot_width = max(width - CHART_MARGIN * 2, 1)
+        dc.SetPen(wx.Pen(wx.Colour(220, 220, 220)))
+        dc.DrawLine(CHART_MARGIN, plot_top + plot_height, CHART_MARGIN + plot_width, plot_top + plot_height)
+        dc.SetPen(wx.Pen(CHART_COLOUR, 2))
+        step = plot_width / max(self.sampler.history_length - 1, 1)
+        offset = self.sampler.history_length - len(values)  # 新数据靠右对齐
+        line: list[wx.Point] = []
+        for index, value in enumerate(values):
+            if math.isnan(value):
+                self.draw_line(dc, line)
+                line = []
+                continue
+            x = CHART_MARGIN + (offset + index) * step
+            y = plot_top + plot_height - value / top * plot_height
+            line.append(wx.Point(round(x), round(y)))
+        self.draw_line(dc, line)
+
+    @staticmethod
+    def draw_line(dc: wx.DC, points: list[wx.Point]):
+        if len(points) > 1:
+            dc.DrawLines(points)
+        elif points:
+            dc.DrawCircle(points[0], 1)
+
+
+class PerfViewer(wx.Frame):
+    def __init__(self, parent: wx.Window | None):
+        super().__init__(parent, title="性能面板", size=(900, 650))
+        self.sampler = MetricsSampler(get_metrics())
+        self.main_loop_metric = get_metrics().gauge(MAIN_LOOP_METRIC, section=MAIN_LOOP)
+        self.rows: list[MetricRow] = []
+        self.last_tick: float | None = None
+
+        self.SetFont(ft(10))
+        self.list = wx.ListCtrl(self, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        self.list.AppendColumn("分类", width=110)
+        self.list.AppendColumn("名称", width=300)
+        self.list.AppendColumn("当前", width=100)
+        self.list.AppendColumn("详情", width=360)
+        self.chart = ChartPanel(self, self.sampler)
+        self.sizer = wx.BoxSizer(wx.VERTICAL)
+        self.sizer.Add(self.list, 1, wx.EXPAND)
+        self.sizer.Add(self.chart, 0, wx.EXPAND)
+        self.SetSizer(self.sizer)
+
+        self.list.Bind(wx.EVT_LIST_ITEM_SELECTED, lambda _: self.chart.set_row(self.selected_row()))
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda _: self.on_tick())
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.timer.Start(SAMPLE_INTERVAL)
+        self.refresh()
+
+    def selected_row(self) -> MetricRow | None:
+        index = self.list.GetFirstSelected()
+        return self.rows[index] if 0 <= index < len(self.rows) else None
+
+    def on_tick(self):
+        if not self.IsShownOnScreen() or self.IsIconized():
+            self.last_tick = None  # 恢复显示后重新计算, 不把暂停的时间算作延迟
+            return
+        now = monotonic() * 1000
+        if self.last_tick is not None:  # 定时器比预期晚到的时间即为主循环被阻塞的时间
+            self.main_loop_metric.set(max(now - self.last_tick - SAMPLE_INTERVAL, 0))
+        self.last_tick = now
+        self.refresh()
+
+    def refresh(self):
+        selected = self.selected_row()
+        rows = sorted(self.sampler.sample(), key=sort_key)
+        if [row.key for row in rows] != [row.key for row in self.rows]:  # 指标增减时重建列表
+            self.list.DeleteAllItems()
+            for row in rows:
+                self.list.Append([row.section, row.name, format_value(row), row.detail])
+            if selected is not None:
+                for index, row in enumerate(rows):
+                    if row.key == selected.key:
+                        self.list.Select(index)
+                        break
+        else:
+            for index, row in enumerate(rows):
+                self.list.SetItem(index, 2, format_value(row))
+                self.list.SetItem(index, 3, row.detail)
+        self.rows = rows
+        self.chart.set_row(self.selected_row())
+
+    def on_close(self, event: wx.CloseEvent):
+        self.timer.Stop()
+        event.Skip()
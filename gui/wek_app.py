@@ -2,17 +2,19 @@ import sys
 
 import wx
 
-from gui.control_panel import ControlPanel
+from gui.control_panel import ControlPanelController
+from lib.startup_profile import startup_span
 
 
 class WinEnchantKitApp(wx.App):
     # noinspection PyAttributeOutsideInit
     def OnInit(self):
         show_window = not (len(sys.argv) > 1 and "-startup" in sys.argv)
-        self.control_panel = ControlPanel(None, show_window)
+        with startup_span("ControlPanelController.__init__"):
+            self.control_panel = ControlPanelController(show_window)
         self.Bind(wx.EVT_QUERY_END_SESSION, self.OnQueryEndSession)
         return True
 
     def OnQueryEndSession(self, event):
-        self.control_panel.Destroy()
+        self.control_panel.destroy()
         event.Skip()  # 允许关闭
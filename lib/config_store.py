@@ -0,0 +1,154 @@
+"""
+配置文件存储
+按 主配置/各插件 分节记录上次写入的内容, 只有内容变化的节才算作脏数据;
+写入在后台线程中进行, 一段时间内的多次修改合并为一次写入 (防抖),
+每个文件先写入临时文件再原子替换, 写入过程中崩溃不会损坏原文件
+可选把每个插件的配置保存为单独的文件, 修改一个插件的配置不会重写其他插件的配置
+"""
+import json
+import logging
+import os
+from copy import deepcopy
+from os.path import join, exists
+from threading import Condition, Lock, Thread
+from time import monotonic
+from typing import Any
+
+CONFIG_FILE = r".\config.json"
+PLUGIN_CONFIG_DIR = r".\config.d"
+DEFAULT_DEBOUNCE = 1.0  # 秒
+MAX_DELAY_FACTOR = 5  # 持续修改时最迟在 debounce * MAX_DELAY_FACTOR 后写入
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+
+def atomic_write(fp: str, content: str):
+    tmp_fp = fp + ".tmp"
+    with open(tmp_fp, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_fp, fp)
+
+
+class ConfigStore:
+    MAIN = ""  # 主配置节的键
+
+    def __init__(self, fp: str = CONFIG_FILE, plugin_dir: str = PLUGIN_CONFIG_DIR,
+                 debounce: float = DEFAULT_DEBOUNCE, split_plugins: bool = False):
+        self.fp = fp
+        self.plugin_dir = plugin_dir
+        self.debounce = debounce
+        self.split_plugins = split_plugins
+        self.cond = Condition()
+        self.write_lock = Lock()  # 后台写入与 flush 不能同时进行, 持有后才取出待写入的内容, 保证后写入的总是较新的内容
+        self.saved: dict[str, Any] = {}  # 节 -> 上次写入的内容
+        self.sections: dict[str, Any] = {}  # 节 -> 当前内容
+        self.dirty: set[str] = set()
+        self.first_dirty_time = 0.0
+        self.last_update_time = 0.0
+        self.thread: Thread | None = None
+        self.writes = 0
+
+    def plugin_fp(self, plugin_id: str) -> str:
+        return join(self.plugin_dir, f"{plugin_id}.json")
+
+    def read(self) -> dict[str, Any] | None:
+        """读取配置, 文件不存在时返回None"""
+        if not exists(self.fp):
+            return None
+        with open(self.fp, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        plugins = data.setdefault("plugins", {})
+        if data.get("split_plugins") and exists(self.plugin_dir):
+            for name in os.listdir(self.plugin_dir):
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    with open(join(self.plugin_dir, name), "r", encoding="utf-8") as f:
+                        plugins[name[:-5]] = json.load(f)
+                except (OSError, ValueError):
+                    logger.error(f"无法读取插件配置文件: {name}")
+        with self.cond:
+            self.saved = {self.MAIN: {key: value for key, value in data.items() if key != "plugins"}}
+            self.saved.update(deepcopy(plugins))
+        return data
+
+    def set_split_plugins(self, split_plugins: bool):
+        with self.cond:
+            if split_plugins == self.split_plugins:
+                return
+            self.split_plugins = split_plugins
+            self.saved.clear()  # 存储方式改变, 所有节都需要重新写入
+
+    def update(self, main: dict[str, Any], plugins: dict[str, dict[str, Any]]):
+        """提交当前配置, 与上次写入的内容比较后标记变化的节, 稍后在后台写入"""
+        sections = {self.MAIN: {**main, "split_plugins": self.split_plugins}, **plugins}
+        with self.cond:
+            changed = {key for key, value in sections.items() if self.saved.get(key) != value}
+            if not self.split_plugins and changed:
+                changed.add(self.MAIN)  # 单文件模式下任何插件变化都要重写主文件
+            self.sections = sections
+            if not changed:
+                return
+            now = monotonic()
+            if not self.dirty:
+                self.first_dirty_time = now
+            self.last_update_time = now
+            self.dirty |= changed
+            self.cond.notify()
+            if self.thread is None:
+                self.thread = Thread(target=self.write_thread_func, daemon=True, name="ConfigWriter")
+                self.thread.start()
+
+    def flush(self):
+        """立即写入所有脏数据"""
+        self.write_pending()
+
+    def write_thread_func(self):
+        while True:
+            with self.cond:
+                while not self.dirty:
+                    self.cond.wait()
+                # 修改停止 debounce 秒后写入, 持续修改时不超过最长延迟
+                deadline = min(self.last_update_time + self.debounce,
+                               self.first_dirty_time + self.debounce * MAX_DELAY_FACTOR)
+                timeout = deadline - monotonic()
+                if timeout > 0:
+                    self.cond.wait(timeout)
+                    continue
+            self.write_pending()
+
+    def write_pending(self):
+        with self.write_lock:
+            with self.cond:
+                dirty, self.dirty = self.dirty, set()
+                sections = self.sections
+            if dirty:
+                self._write(dirty, sections)
+
+    def _write(self, dirty: set[str], sections: dict[str, Any]):
+        try:
+            if self.split_plugins:
+                plugin_ids = [key for key in dirty if key != self.MAIN and key in sections]
+                if plugin_ids:
+                    os.makedirs(self.plugin_dir, exist_ok=True)
+                for plugin_id in plugin_ids:
+                    atomic_write(self.plugin_fp(plugin_id),
+                                 json.dumps(sections[plugin_id], indent=4, ensure_ascii=False))
+                if self.MAIN in dirty:
+                    atomic_write(self.fp, json.dumps(sections[self.MAIN], indent=4, ensure_ascii=False))
+            else:
+                data = {**sections[self.MAIN],
+                        "plugins": {key: value for key, value in sections.items() if key != self.MAIN}}
+                atomic_write(self.fp, json.dumps(data, indent=4, ensure_ascii=False))
+        except Exception as e:  # 包括无法序列化的值, 不能让写入线程退出
+            logger.error(f"无法保存配置文件: {e.__class__.__name__}: {e}")
+            with self.cond:  # 下次提交时重试
+                self.saved = {key: value for key, value in self.saved.items() if key not in dirty}
+            return
+        with self.cond:
+            for key in dirty:
+                if key in sections:
+                    self.saved[key] = deepcopy(sections[key])
+            self.writes += 1
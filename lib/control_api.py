@@ -0,0 +1,340 @@
+"""
+本地控制接口
+运行中的实例在 命名管道 (Windows) / Unix socket (其他平台) 上提供 JSON-RPC 2.0 服务,
+每条消息是一个 JSON 请求或请求数组 (批量调用), 地址与认证密钥写入 %APPDATA%/WinEnchantKit/control.json
+客户端: python -m wek ctl ...; 重复启动程序时也通过该接口把窗口交给已运行的实例
+"""
+import json
+import logging
+import os
+import secrets
+import sys
+from enum import Enum
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from os.path import expandvars
+from threading import Thread
+from typing import Any, Callable, TYPE_CHECKING
+
+from base import ButtonParam, TipParam
+
+if TYPE_CHECKING:  # 客户端 (python -m wek ctl) 不导入插件宿主, 以免初始化日志等
+    from lib.plugin_host import PluginHost, PluginInfo, PluginState
+
+CONTROL_FILE = "%APPDATA%/WinEnchantKit/control.json"
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+
+class ControlError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def to_json_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): to_json_value(item) for key, item in value.items()}
+    return str(value)
+
+
+def listener_family() -> str:
+    return "AF_PIPE" if sys.platform == "win32" else "AF_UNIX" if hasattr(os, "fork") else "AF_INET"
+
+
+class ControlServer:
+    """
+    在后台线程中处理控制请求, 每个连接一个线程
+    on_activate: 第二次启动程序时调用 (显示窗口), 返回是否已处理
+    run_in_ui: 按钮处理函数需要在界面线程中执行时传入 (如 wx.CallAfter)
+    """
+
+    def __init__(self, host: 'PluginHost', on_activate: Callable[[], bool] | None = None,
+                 run_in_ui: Callable[[Callable[[], Any]], Any] | None = None):
+        self.host = host
+        self.on_activate = on_activate
+        self.run_in_ui = run_in_ui
+        self.authkey = secrets.token_bytes(16)
+        self.listener: Listener | None = None
+        self.methods: dict[str, Callable[..., Any]] = {
+            "ping": lambda: "pong",
+            "activate": self.activate,
+            "list": self.list_plugins,
+            "status": self.status,
+            "start": self.start_plugins,
+            "stop": self.stop_plugins,
+            "reload": self.reload_plugin,
+            "get_config": self.get_config,
+            "set_config": self.set_config,
+            "invoke_button": self.invoke_button,
+        }
+
+    def start(self):
+        try:
+            self.listener = Listener(family=listener_family(), authkey=self.authkey)
+        except OSError as e:
+            logger.warning(f"无法启动控制接口: {e.__class__.__name__}: {e}")
+            return
+        fp = expandvars(CONTROL_FILE)
+        try:
+            os.makedirs(os.path.dirname(fp), exist_ok=True)
+            with open(fp, "w", encoding="utf-8") as f:
+                json.dump({"address": self.listener.address, "family": listener_family(),
+                           "authkey": self.authkey.hex(), "pid": os.getpid()}, f)
+        except OSError:
+            logger.warning("无法写入控制接口地址文件")
+        Thread(target=self.accept_thread_func, daemon=True, name="ControlServer").start()
+        logger.debug(f"控制接口已启动: {self.listener.address}")
+
+    def close(self):
+        if self.listener is None:
+            return
+        listener, self.listener = self.listener, None
+        try:
+            fp = expandvars(CONTROL_FILE)
+            with open(fp, "r", encoding="utf-8") as f:
+                if json.load(f).get("pid") == os.getpid():
+                    os.remove(fp)
+        except (OSError, ValueError):
+            pass
+        listener.close()
+
+    def accept_thread_func(self):
+        while self.listener is not None:
+            try:
+                conn = self.listener.accept()
+            except AuthenticationError:
+                logger.warning("控制接口: 拒绝了一个认证失败的连接")
+                continue
+            except OSError:  # 已关闭
+                break
+            Thread(target=self.connection_thread_func, args=(conn,), daemon=True,
+                   name="ControlConnection").start()
+
+    def connection_thread_func(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    data = conn.recv_bytes()
+                except (EOFError, OSError):
+                    break
+                # 只有通知时也回复 null, 让客户端每次发送都能对应一次接收
+                response = self.handle_message(data)
+                conn.send_bytes(json.dumps(response, ensure_ascii=False).encode("utf-8"))
+
+    def handle_message(self, data: bytes) -> Any:
+        try:
+            message = json.loads(data)
+        except ValueError as e:
+            return self.error_response(None, PARSE_ERROR, f"无法解析请求: {e}")
+        if isinstance(message, list):  # 批量调用, 按顺序执行
+            if not message:
+                return self.error_response(None, INVALID_REQUEST, "批量请求为空")
+            responses = [response for request in message if (response := self.handle_request(request)) is not None]
+            return responses or None
+        return self.handle_request(message)
+
+    def handle_request(self, request: Any) -> dict[str, Any] | None:
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return self.error_response(None, INVALID_REQUEST, "无效的请求")
+        request_id = request.get("id")
+        params = request.get("params", {})
+        try:
+            method = self.methods.get(request["method"])
+            if method is None:
+                raise ControlError(METHOD_NOT_FOUND, f"未知方法: {request['method']}")
+            if isinstance(params, list):
+                result = method(*params)
+            elif isinstance(params, dict):
+                result = method(**params)
+            else:
+                raise ControlError(INVALID_PARAMS, "params 必须是数组或对象")
+        except ControlError as e:
+            return self.error_response(request_id, e.code, e.message) if "id" in request else None
+        except TypeError as e:
+            return self.error_response(request_id, INVALID_PARAMS, str(e)) if "id" in request else None
+        except Exception as e:
+            logger.error(f"控制接口执行 {request['method']} 出错: {e.__class__.__name__}: {e}")
+            return self.error_response(request_id, SERVER_ERROR, f"{e.__class__.__name__}: {e}") \
+                if "id" in request else None
+        if "id" not in request:  # 通知, 不需要响应
+            return None
+        return {"jsonrpc": "2.0", "id": request_id, "result": to_json_value(result)}
+
+    @staticmethod
+    def error_response(request_id: Any, code: int, message: str) -> dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+    def get_plugin(self, plugin_id: str) -> 'PluginInfo':
+        plugin_info = self.host.plugins.get(plugin_id)
+        if plugin_info is None:
+            raise ControlError(INVALID_PARAMS, f"插件不存在: {plugin_id}")
+        return plugin_info
+
+    def plugin_ids(self, ids: str | list[str] | None) -> list[str]:
+        if ids is None:
+            return list(self.host.plugins)
+        ids = [ids] if isinstance(ids, str) else ids
+        for plugin_id in ids:
+            self.get_plugin(plugin_id)
+        return ids
+
+    def describe(self, plugin_info: 'PluginInfo') -> dict[str, Any]:
+        return {
+            "id": plugin_info.id,
+            "name": plugin_info.info["name"],
+            "version": plugin_info.info.get("version", ""),
+            "state": plugin_info.state.name,
+            "loaded": plugin_info.loaded,
+            "auto_launch": plugin_info.id in self.host.auto_launch_plugins,
+            "isolated": plugin_info.id in self.host.isolated_plugins,
+        }
+
+    # ---- 方法 ----
+
+    def activate(self) -> bool:
+        return self.on_activate() if self.on_activate is not None else False
+
+    def list_plugins(self) -> list[dict[str, Any]]:
+        return [self.describe(plugin_info) for plugin_info in list(self.host.plugins.values())]
+
+    def status(self, ids: str | list[str] | None = None) -> list[dict[str, Any]]:
+        result = []
+        for plugin_id in self.plugin_ids(ids):
+            plugin_info = self.host.plugins[plugin_id]
+            result.append({**self.describe(plugin_info), "resources": vars(plugin_info.resources)})
+        return result
+
+    def start_plugins(self, ids: str | list[str]) -> dict[str, Any]:
+        from lib.plugin_host import PluginState
+        return self.run_lifecycle(self.plugin_ids(ids), self.host.start_plugin, PluginState.STOPPED)
+
+    def stop_plugins(self, ids: str | list[str]) -> dict[str, Any]:
+        from lib.plugin_host import PluginState
+        return self.run_lifecycle(self.plugin_ids(ids), self.host.stop_plugin, PluginState.RUNNING)
+
+    def run_lifecycle(self, ids: list[str], func: Callable[[str], Any], from_state: 'PluginState') -> dict[str, Any]:
+        """并行执行启动/停止, 等待全部完成或超时后返回每个插件的结果"""
+        from lib.plugin_host import PluginState
+        jobs = {}
+        result: dict[str, Any] = {}
+        for plugin_id in ids:
+            state = self.host.plugins[plugin_id].state
+            if state != from_state:
+                result[plugin_id] = {"ok": state != PluginState.STARTING and state != PluginState.STOPPING,
+                                     "error": f"插件处于 {state.name} 状态"}
+                continue
+            jobs[plugin_id] = func(plugin_id)
+        for plugin_id, job in jobs.items():
+            if job is None:
+                result[plugin_id] = {"ok": False, "error": "插件状态已改变"}
+                continue
+            job_result = job.wait()
+            result[plugin_id] = {"ok": job_result.ok, "error": job_result.error, "elapsed": job_result.elapsed,
+                                 "timed_out": job_result.timed_out}
+        return {plugin_id: result[plugin_id] for plugin_id in ids}
+
+    def reload_plugin(self, plugin_id: str) -> dict[str, Any]:
+        self.get_plugin(plugin_id)
+        job = self.host.reload_plugin(plugin_id)
+        if job is None:
+            return {"ok": False, "error": "插件正在启动或停止"}
+        job_result = job.wait()
+        return {"ok": job_result.ok, "error": job_result.error, "elapsed": job_result.elapsed}
+
+    def get_config(self, plugin_id: str) -> dict[str, Any]:
+        config = self.get_plugin(plugin_id).main_class.config
+        return {key: value for key, value in config.items()
+                if not isinstance(config.params.get(key), (ButtonParam, TipParam))}
+
+    def set_config(self, plugin_id: str, values: dict[str, Any]) -> dict[str, Any]:
+        """只修改给出的配置项, 其余保持不变"""
+        plugin_info = self.get_plugin(plugin_id)
+        if not isinstance(values, dict):
+            raise ControlError(INVALID_PARAMS, "values 必须是对象")
+        if not plugin_info.loaded and not plugin_info.main_class.config:
+            self.host.ensure_plugin_loaded(plugin_id)
+        config = plugin_info.main_class.config
+        new_config = config.copy()
+        for key, value in values.items():
+            param = config.params.get(key)
+            if param is None or isinstance(param, (ButtonParam, TipParam)):
+                raise ControlError(INVALID_PARAMS, f"插件 [{plugin_id}] 没有配置项: {key}")
+            parsed = param.parse_value(value)
+            if parsed is None:
+                raise ControlError(INVALID_PARAMS, f"配置项 {key} 的值无效: {value!r}")
+            new_config[key] = parsed
+        self.host.update_plugin_config(plugin_id, new_config)
+        return self.get_config(plugin_id)
+
+    def invoke_button(self, plugin_id: str, name: str) -> bool:
+        self.get_plugin(plugin_id)
+        main_class = self.host.ensure_plugin_loaded(plugin_id)
+        param = main_class.config.params.get(name)
+        if not isinstance(param, ButtonParam):
+            raise ControlError(INVALID_PARAMS, f"插件 [{plugin_id}] 没有按钮: {name}")
+        if self.run_in_ui is not None:
+            self.run_in_ui(param.handler)
+        else:
+            param.handler()
+        return True
+
+
+class ControlClient:
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.next_id = 0
+
+    @classmethod
+    def connect(cls) -> 'ControlClient | None':
+        """连接到正在运行的实例, 没有运行中的实例时返回None"""
+        try:
+            with open(expandvars(CONTROL_FILE), "r", encoding="utf-8") as f:
+                info = json.load(f)
+            address = tuple(info["address"]) if isinstance(info["address"], list) else info["address"]
+            conn = Client(address, family=info["family"], authkey=bytes.fromhex(info["authkey"]))
+        except (OSError, ValueError, KeyError, EOFError, AuthenticationError):
+            return None
+        return cls(conn)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def request(self, message: Any) -> Any:
+        self.conn.send_bytes(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+        return json.loads(self.conn.recv_bytes())
+
+    def make_request(self, method: str, params: dict[str, Any] | list[Any] | None = None) -> dict[str, Any]:
+        self.next_id += 1
+        return {"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params or {}}
+
+    def call(self, method: str, **params) -> Any:
+        response = self.request(self.make_request(method, params))
+        if "error" in response:
+            raise ControlError(response["error"]["code"], response["error"]["message"])
+        return response["result"]
+
+    def batch(self, calls: list[tuple[str, dict[str, Any]]]) -> list[dict[str, Any]]:
+        """一次往返执行多个调用, 返回按请求顺序排列的响应"""
+        requests = [self.make_request(method, params) for method, params in calls]
+        responses = {response.get("id"): response for response in self.request(requests)}
+        return [responses.get(request["id"]) for request in requests]
@@ -1,3 +1,5 @@
 import os
+from os.path import expandvars
 
 IS_PACKAGE_ENV = os.path.isdir(os.path.join(os.getcwd(), "runtime"))
+APP_DATA_DIR = expandvars("%APPDATA%/WinEnchantKit")
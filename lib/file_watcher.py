@@ -0,0 +1,83 @@
+"""
+轮询式目录监视器
+定期比较目录中文件的修改时间, 变化停止 debounce 秒后才触发回调, 避免保存过程中多次触发
+"""
+import os
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Callable
+
+WATCH_EXTENSIONS = (".py", ".json")
+
+
+def snapshot_dir(directory: str) -> dict[str, int]:
+    result = {}
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for name in files:
+            if name.endswith(WATCH_EXTENSIONS):
+                fp = os.path.join(root, name)
+                try:
+                    result[fp] = os.stat(fp).st_mtime_ns
+                except OSError:
+                    pass
+    return result
+
+
+class DirectoryWatcher:
+    def __init__(self, callback: Callable[[str], None], interval: float = 1.0, debounce: float = 1.0):
+        self.callback = callback
+        self.interval = interval
+        self.debounce = debounce
+        self.lock = Lock()
+        self.dirs: dict[str, str] = {}  # 键 -> 目录
+        self.snapshots: dict[str, dict[str, int]] = {}
+        self.changed_at: dict[str, float] = {}
+        self.stop_event = Event()
+        self.thread: Thread | None = None
+
+    def watch(self, key: str, directory: str):
+        snapshot = snapshot_dir(directory)
+        with self.lock:
+            self.dirs[key] = directory
+            self.snapshots[key] = snapshot
+            self.changed_at.pop(key, None)
+
+    def unwatch(self, key: str):
+        with self.lock:
+            self.dirs.pop(key, None)
+            self.snapshots.pop(key, None)
+            self.changed_at.pop(key, None)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = Thread(target=self.watch_thread_func, daemon=True, name="DirectoryWatcher")
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def poll(self):
+        now = perf_counter()
+        with self.lock:
+            dirs = dict(self.dirs)
+        fired = []
+        for key, directory in dirs.items():
+            snapshot = snapshot_dir(directory)
+            with self.lock:
+                if key not in self.dirs:
+                    continue
+                if snapshot != self.snapshots.get(key):
+                    self.snapshots[key] = snapshot
+                    self.changed_at[key] = now
+                elif key in self.changed_at and now - self.changed_at[key] >= self.debounce:
+                    self.changed_at.pop(key)
+                    fired.append(key)
+        for key in fired:
+            self.callback(key)
+
+    def watch_thread_func(self):
+        while not self.stop_event.wait(self.interval):
+            self.poll()
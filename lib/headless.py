@@ -0,0 +1,55 @@
+"""
+无界面模式 (--headless)
+不创建管理面板与托盘图标, 只读取 config.json 并加载、自动启动插件, 适合只运行后台插件的开机启动场景
+本模块不导入wx, 只有插件自身导入了wx时才会在主线程运行wx消息循环
+"""
+import signal
+import sys
+from threading import Event, Thread
+
+from lib.control_api import ControlServer
+from lib.log import logger
+from lib.plugin_host import PluginHost
+
+
+def run_headless():
+    logger.info("以无界面模式运行")
+    host = PluginHost()
+    control_server = ControlServer(host)
+    control_server.start()
+    exit_event = Event()
+
+    def on_signal(signum, _):
+        logger.info(f"收到信号 {signum}, 正在退出")
+        exit_event.set()
+
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+
+    host.load_all_plugins()  # 在主线程中导入插件, 之后才能知道是否需要wx消息循环
+
+    wx = sys.modules.get("wx")
+    if wx is None:
+        # 定时醒来, 让信号处理函数有机会执行
+        while not exit_event.wait(1):
+            pass
+        control_server.close()
+        host.shutdown()
+    else:  # 插件使用了wx (对话框、CallAfter等), 在主线程运行消息循环
+        app = wx.App(False)
+        app.SetExitOnFrameDelete(False)
+        control_server.run_in_ui = wx.CallAfter
+
+        def exit_thread():
+            exit_event.wait()
+            control_server.close()
+            host.shutdown()
+            wx.CallAfter(app.ExitMainLoop)
+
+        Thread(target=exit_thread, daemon=True, name="HeadlessExit").start()
+        timer = wx.Timer()  # 消息循环中定时回到Python, 让信号处理函数有机会执行
+        timer.Bind(wx.EVT_TIMER, lambda _: None)
+        timer.Start(1000)
+        app.MainLoop()
+    logger.info("再见！")
@@ -0,0 +1,100 @@
+"""
+插件生命周期执行器
+启动/停止操作在独立的后台线程中并行执行, 每个操作有单独的截止时间,
+超时后立即返回超时结果 (不会阻塞调用方), 操作之后真正完成时会再次回调
+"""
+import logging
+from dataclasses import dataclass
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Any, Callable
+
+DEFAULT_DEADLINE = 10.0
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+
+@dataclass
+class LifecycleResult:
+    plugin_id: str
+    action: str
+    ok: bool
+    error: str | None = None
+    elapsed: float = 0.0
+    timed_out: bool = False
+    late: bool = False  # 超时后才完成
+
+
+class LifecycleJob:
+    def __init__(self, plugin_id: str, action: str, func: Callable[[], Any], deadline: float,
+                 callback: Callable[[LifecycleResult], None] | None = None):
+        self.plugin_id = plugin_id
+        self.action = action
+        self.func = func
+        self.deadline = deadline
+        self.callback = callback
+        self.lock = Lock()
+        self.done = Event()
+        self.result: LifecycleResult | None = None
+        self.start_time = perf_counter()
+
+    def run(self):
+        try:
+            self.func()
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, str(e)
+        result = LifecycleResult(self.plugin_id, self.action, ok, error, perf_counter() - self.start_time)
+        with self.lock:
+            result.late = self.result is not None
+            if not result.late:
+                self.result = result
+        self.done.set()
+        if result.late:
+            logger.warning(f"插件 [{self.plugin_id}] {self.action} 在超时后完成, 用时 {result.elapsed:.2f}s")
+        self.notify(result)
+
+    def wait(self) -> LifecycleResult:
+        """等待操作完成或到达截止时间"""
+        remaining = self.deadline - (perf_counter() - self.start_time)
+        if not self.done.wait(max(remaining, 0)):
+            with self.lock:
+                if self.result is None:
+                    self.result = LifecycleResult(self.plugin_id, self.action, False,
+                                                  f"{self.action} 超时 ({self.deadline}s)",
+                                                  perf_counter() - self.start_time, timed_out=True)
+                    timed_out = True
+                else:
+                    timed_out = False
+            if timed_out:
+                self.notify(self.result)
+        return self.result
+
+    def notify(self, result: LifecycleResult):
+        if self.callback is None:
+            return
+        try:
+            self.callback(result)
+        except Exception as e:
+            logger.error(f"插件 [{self.plugin_id}] {self.action} 回调出错: {e.__class__.__name__}: {e}")
+
+
+class LifecycleExecutor:
+    """每个操作使用一个守护线程, 卡住的插件不会占用其他插件的执行机会, 也不会阻止程序退出"""
+
+    def __init__(self, deadline: float = DEFAULT_DEADLINE):
+        self.deadline = deadline
+
+    def submit(self, plugin_id: str, action: str, func: Callable[[], Any],
+               callback: Callable[[LifecycleResult], None] | None = None,
+               deadline: float | None = None) -> LifecycleJob:
+        job = LifecycleJob(plugin_id, action, func, self.deadline if deadline is None else deadline, callback)
+        Thread(target=job.run, daemon=True, name=f"Plugin-{action}-{plugin_id}").start()
+        if callback is not None:  # 保证超时时也会回调
+            Thread(target=job.wait, daemon=True, name=f"PluginWaiter-{action}-{plugin_id}").start()
+        return job
+
+    @staticmethod
+    def wait_all(jobs: list[LifecycleJob]) -> list[LifecycleResult]:
+        """等待所有操作, 总耗时取决于最慢 (或截止时间最长) 的操作"""
+        return [job.wait() for job in jobs]
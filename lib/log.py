@@ -1,9 +1,19 @@
+"""
+日志
+所有记录器只向有界队列投递记录 (QueueHandler), 由唯一的后台线程输出到控制台与轮转的日志文件,
+插件的热路径 (如窗口事件钩子回调) 不会等待磁盘I/O; 队列已满时丢弃记录并在之后报告丢弃数量
+"""
+import atexit
 import io
 import logging
 import sys
-from datetime import datetime
-from os import makedirs
+from logging.handlers import QueueHandler, QueueListener
 from os.path import expandvars
+from queue import Queue, Full
+
+from lib.log_rotation import RotatingLogFile, get_log_archiver, is_plugin_worker
+from lib.log_store import LogStoreHandler, get_log_store
+from lib.metrics import get_metrics
 
 
 class AnsiColorCodes:
@@ -20,6 +30,9 @@ NO_TIME_FMT = "%(module)s.py:%(lineno)d [%(levelname)s]"
 TIME_FMT = "[%(asctime)s] %(module)s:%(lineno)d [%(levelname)s]"
 GLOBAL_LEVEL = logging.DEBUG
 USE_COLOR = True
+LOG_QUEUE_SIZE = 10000
+PLUGIN_LOGGER_PREFIX = "WinEnchantKitLogger_"
+IS_PLUGIN_WORKER = is_plugin_worker()
 #logging.basicConfig(encoding="utf-8")
 
 COLOR_MAP = {
@@ -32,6 +45,14 @@ COLOR_MAP = {
 COLOR_MAP.setdefault(0, AnsiColorCodes.RESET)
 
 
+plugin_names: dict[str, str] = {}  # 插件记录器名 -> 插件名, 用于在输出中标注插件
+
+
+def plugin_tag(record: logging.LogRecord) -> str:
+    name = plugin_names.get(record.name)
+    return "" if name is None else f"[{name}] "
+
+
 class ColoredFormatter(logging.Formatter):
 
     def __init__(self):
@@ -46,9 +67,9 @@ class ColoredFormatter(logging.Formatter):
 
     def format(self, record):
         if USE_COLOR:
-            return f"{COLOR_MAP.get(record.levelno)}{self.formatter.format(record)} : {record.message}{AnsiColorCodes.RESET}"
+            return f"{COLOR_MAP.get(record.levelno)}{self.formatter.format(record)} : {plugin_tag(record)}{record.message}{AnsiColorCodes.RESET}"
         else:
-            return f"{self.formatter.format(record)} : {record.message}"
+            return f"{self.formatter.format(record)} : {plugin_tag(record)}{record.message}"
 
 
 class TimedFormatter(logging.Formatter):
@@ -57,43 +78,103 @@ class TimedFormatter(logging.Formatter):
         self.formatter = logging.Formatter(TIME_FMT)
 
     def format(self, record):
-        return f"{self.formatter.format(record)} : {record.message}"
+        return f"{self.formatter.format(record)} : {plugin_tag(record)}{record.message}"
 
 
-class PluginFormatter(ColoredFormatter):
-    def __init__(self, name: str = None):
-        super().__init__()
-        self.name = name
+class DroppingQueueHandler(QueueHandler):
+    """队列已满时丢弃记录而不是阻塞调用方"""
+
+    def __init__(self, queue: Queue):
+        super().__init__(queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
 
-    def format(self, record):
-        if USE_COLOR:
-            return f"{COLOR_MAP.get(record.levelno)}{self.formatter.format(record)} : [{self.name}] {record.message}{AnsiColorCodes.RESET}"
-        else:
-            return f"{self.formatter.format(record)} : [{self.name}] {record.message}"
+
+class LogListener(QueueListener):
+    """后台线程, 独占控制台与文件输出"""
+
+    def __init__(self, queue: Queue, queue_handler: DroppingQueueHandler, *handlers: logging.Handler):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.queue_handler = queue_handler
+        self.reported_dropped = 0
+
+    def handle(self, record: logging.LogRecord):
+        dropped = self.queue_handler.dropped
+        if dropped != self.reported_dropped:
+            count, self.reported_dropped = dropped - self.reported_dropped, dropped
+            super().handle(logger.makeRecord(logger.name, logging.WARNING, __file__, 0,
+                                             f"日志队列已满, 丢弃了 {count} 条日志", None, None))
+        super().handle(record)
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)  # 队列满时等待后台线程取走记录, 保证退出前输出完所有日志
+
+    def stop(self):
+        if self._thread is not None:
+            super().stop()
 
 
 def get_plugin_logger(id_: str, name: str):
-    plugin_logger = logging.getLogger(f"WinEnchantKitLogger_{id_}")
+    logger_name = f"{PLUGIN_LOGGER_PREFIX}{id_}"
+    plugin_names[logger_name] = name
+    plugin_logger = logging.getLogger(logger_name)
     plugin_logger.setLevel(GLOBAL_LEVEL)
-    plugin_console_handler = logging.StreamHandler(io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8'))
-    plugin_console_handler.setLevel(GLOBAL_LEVEL)
-    plugin_console_handler.setFormatter(PluginFormatter(name))
-    plugin_logger.addHandler(plugin_console_handler)
-    plugin_logger.addHandler(time_rotating_file_handler)
+    if not IS_PLUGIN_WORKER and queue_handler not in plugin_logger.handlers:  # 重载插件时不重复添加
+        plugin_logger.addHandler(queue_handler)
     return plugin_logger
 
 
-makedirs(expandvars('%APPDATA%/WinEnchantKit/logs'), exist_ok=True)
-time_rotating_file_handler = logging.FileHandler(
-    filename=expandvars(f"%APPDATA%/WinEnchantKit/logs/log_{datetime.now().strftime('%Y-%m-%d')}.log"))
-time_rotating_file_handler.setLevel(logging.DEBUG)
-time_rotating_file_handler.setFormatter(TimedFormatter())
+def configure_log_rotation(max_mb: float, retention_days: float, retention_mb: float):
+    get_log_archiver().configure(int(max_mb * 1024 * 1024), retention_days, int(retention_mb * 1024 * 1024))
+
 
+def stop_logging():
+    """输出队列中剩余的日志并停止后台线程"""
+    if listener is not None:
+        listener.stop()
+
+
+def console_stream():
+    # pythonw 下标准输出已被重定向到轮转文件 (没有 buffer), 直接写入
+    if sys.stdout is None:
+        return io.StringIO()
+    if hasattr(sys.stdout, "buffer"):
+        return io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    return sys.stdout
+
+
+log_queue: Queue[logging.LogRecord] = Queue(LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(log_queue)
+listener: LogListener | None = None
 
 logger = logging.getLogger("WinEnchantKitLogger")
 logger.setLevel(GLOBAL_LEVEL)
-console_handler = logging.StreamHandler(io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8'))
-console_handler.setLevel(GLOBAL_LEVEL)
-console_handler.setFormatter(ColoredFormatter())
-logger.addHandler(console_handler)
-logger.addHandler(time_rotating_file_handler)
+
+# 插件子进程中的记录由 plugin_worker 经管道交给主进程输出, 不再打开日志文件, 避免重复记录与两个进程写同一文件
+if not IS_PLUGIN_WORKER:
+    file_handler = logging.StreamHandler(RotatingLogFile(expandvars('%APPDATA%/WinEnchantKit/logs')))
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(TimedFormatter())
+
+    console_handler = logging.StreamHandler(console_stream())
+    console_handler.setLevel(GLOBAL_LEVEL)
+    console_handler.setFormatter(ColoredFormatter())
+
+    logger.addHandler(queue_handler)
+
+    # 内存环形缓冲区与 JSONL 副本, 供日志查看器使用
+    store_handler = LogStoreHandler(get_log_store(), RotatingLogFile(expandvars('%APPDATA%/WinEnchantKit/logs'),
+                                                                     "records", extension=".jsonl"),
+                                    PLUGIN_LOGGER_PREFIX)
+    store_handler.setLevel(logging.DEBUG)
+
+    listener = LogListener(log_queue, queue_handler, console_handler, file_handler, store_handler)
+    listener.start()
+    get_metrics().gauge("日志队列", log_queue.qsize)
+    get_metrics().gauge("日志丢弃 (累计)", lambda: queue_handler.dropped)
+    atexit.register(stop_logging)
@@ -0,0 +1,129 @@
+"""
+限流的插件日志
+按调用位置 (文件, 行号) 使用令牌桶限制输出速率, 超出的记录不格式化、只计数,
+之后在该位置下一次输出时或定时输出 "消息重复 N 次" 的汇总;
+消息可以是无参函数, 只有等级启用且未被限流时才调用, 关闭的等级几乎没有开销
+"""
+import logging
+import sys
+from os.path import basename
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable
+
+from lib.scheduler import get_scheduler, Job
+
+DEFAULT_RATE = 20.0  # 每个调用位置每秒允许的记录数
+DEFAULT_BURST = 50  # 突发时最多连续输出的记录数
+SUMMARY_INTERVAL = 5.0  # 秒, 被限流的记录最迟在这之后输出汇总
+
+INTERNAL_FILES = {logging.addLevelName.__code__.co_filename}
+
+
+def call_site() -> tuple[str, int]:
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_code.co_filename in INTERNAL_FILES:
+        frame = frame.f_back
+    return (frame.f_code.co_filename, frame.f_lineno) if frame is not None else ("", 0)
+
+
+INTERNAL_FILES.add(call_site.__code__.co_filename)
+
+
+def render_message(msg: Any, args: tuple) -> str:
+    if callable(msg):
+        msg = msg()
+    try:
+        return str(msg) % args if args else str(msg)
+    except (TypeError, ValueError):
+        return str(msg)
+
+
+class CallSiteBucket:
+    __slots__ = ("tokens", "updated", "suppressed", "first_suppressed", "level", "msg", "args")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+        self.suppressed = 0
+        self.first_suppressed = 0.0
+        self.level = logging.NOTSET
+        self.msg: Any = ""
+        self.args: tuple = ()
+
+
+class RateLimitedLogger(logging.LoggerAdapter):
+    """
+    用法与 Logger 相同, 另外支持传入无参函数作为消息:
+    logger.debug(lambda: f"窗口样式: {extract_window_style(hwnd)}")
+    """
+
+    def __init__(self, logger: logging.Logger, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 summary_interval: float = SUMMARY_INTERVAL):
+        super().__init__(logger, {})
+        self.rate = rate
+        self.burst = burst
+        self.summary_interval = summary_interval
+        self.buckets: dict[tuple[str, int], CallSiteBucket] = {}
+        self.lock = Lock()
+        self.summary_job: Job | None = None
+
+    def log(self, level: int, msg: str | Callable[[], str], *args, **kwargs):
+        if not self.isEnabledFor(level):
+            return
+        site = call_site()
+        now = monotonic()
+        with self.lock:
+            bucket = self.buckets.get(site)
+            if bucket is None:
+                bucket = self.buckets[site] = CallSiteBucket(self.burst, now)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+            if bucket.tokens < 1:
+                if not bucket.suppressed:
+                    bucket.first_suppressed = now
+                bucket.suppressed += 1
+                bucket.level, bucket.msg, bucket.args = level, msg, args
+                self.schedule_summary()
+                return
+            bucket.tokens -= 1
+            summary = self.take_summary(site, bucket, now) if bucket.suppressed else None
+        kwargs["stacklevel"] = kwargs.get("stacklevel", 1) + 1  # 记录调用方的位置而不是本模块
+        if summary is not None:
+            self.logger.log(summary[0], summary[1](), stacklevel=kwargs["stacklevel"])
+        if callable(msg):
+            msg = msg()
+        msg, kwargs = self.process(msg, kwargs)
+        self.logger.log(level, msg, *args, **kwargs)
+
+    @staticmethod
+    def take_summary(site: tuple[str, int], bucket: CallSiteBucket, now: float) -> tuple[int, Callable[[], str]]:
+        """在锁中取出汇总并清零计数, 返回的函数在锁外调用 (消息函数可能很慢, 甚至再次记录日志)"""
+        count, duration, msg, args = bucket.suppressed, now - bucket.first_suppressed, bucket.msg, bucket.args
+        bucket.suppressed = 0
+        return bucket.level, lambda: (f"消息重复 {count} 次 ({duration:.1f} 秒内, "
+                                      f"{basename(site[0])}:{site[1]}): {render_message(msg, args)}")
+
+    def schedule_summary(self):
+        if self.summary_job is None:
+            self.summary_job = get_scheduler().call_later(self.summary_interval, self.flush_summaries,
+                                                          name="RateLimitedLogger.flush_summaries")
+
+    def flush_summaries(self):
+        """输出等待时间已超过 summary_interval 的汇总, 仍有等待中的汇总时再次调度"""
+        now = monotonic()
+        summaries = []
+        with self.lock:
+            self.summary_job = None
+            pending = False
+            for site, bucket in self.buckets.items():
+                if not bucket.suppressed:
+                    continue
+                if now - bucket.first_suppressed >= self.summary_interval:
+                    summaries.append(self.take_summary(site, bucket, now))
+                else:
+                    pending = True
+            if pending:
+                self.schedule_summary()
+        for level, render in summaries:
+            self.logger.log(level, render())
@@ -0,0 +1,204 @@
+"""
+日志文件轮转
+日期变化或文件超过大小上限时切换到新文件, 切换下来的文件在后台线程中压缩为 .gz,
+并按保留天数与总大小删除最旧的压缩文件
+结构化日志 (logs/log_*.log) 与 pythonw 下重定向的标准输出 (national_logs/log_*.log) 共用
+"""
+import gzip
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+from multiprocessing import parent_process
+from os.path import join, exists, basename, dirname
+from queue import Queue
+from threading import Thread, Lock, RLock
+from time import time
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_RETENTION_BYTES = 200 * 1024 * 1024
+COMPRESS_LEVEL = 6
+WORKER_ENV = "WEK_PLUGIN_WORKER"  # 主进程启动插件子进程时设置
+
+
+def is_plugin_worker() -> bool:
+    """是否运行在插件子进程中 (子进程的日志经管道交给主进程输出)"""
+    return parent_process() is not None or os.environ.get(WORKER_ENV) == "1"
+
+
+def next_midnight() -> float:
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    return datetime(tomorrow.year, tomorrow.month, tomorrow.day).timestamp()
+
+
+class LogArchiver:
+    """在后台线程中压缩切换下来的日志文件并执行保留策略"""
+
+    def __init__(self):
+        self.max_bytes = DEFAULT_MAX_BYTES  # 单个日志文件的大小上限, 0为不按大小切换
+        self.retention_days = DEFAULT_RETENTION_DAYS  # 0为不按天数删除
+        self.retention_bytes = DEFAULT_RETENTION_BYTES  # 每个目录中压缩文件的总大小上限, 0为不限制
+        self.queue: Queue[tuple[str, str]] = Queue()
+        self.thread: Thread | None = None
+        self.lock = Lock()
+
+    def configure(self, max_bytes: int, retention_days: float, retention_bytes: int):
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.retention_bytes = retention_bytes
+
+    def submit(self, fp: str, prefix: str):
+        self.queue.put((fp, prefix))
+        with self.lock:
+            if self.thread is None:
+                self.thread = Thread(target=self.archive_thread_func, daemon=True, name="LogArchiver")
+                self.thread.start()
+
+    def archive_thread_func(self):
+        while True:
+            fp, prefix = self.queue.get()
+            try:
+                self.compress(fp)
+                self.enforce_retention(dirname(fp), prefix)
+            except OSError:
+                pass  # 日志系统自身的错误无处可记, 下次切换时会重试保留策略
+
+    @staticmethod
+    def compress(fp: str):
+        if not exists(fp):
+            return
+        tmp_fp = fp + ".gz.tmp"
+        with open(fp, "rb") as src, gzip.open(tmp_fp, "wb", compresslevel=COMPRESS_LEVEL) as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_fp, fp + ".gz")
+        os.remove(fp)
+
+    def enforce_retention(self, directory: str, prefix: str):
+        files = []
+        for name in os.listdir(directory):
+            if name.startswith(prefix + "_") and name.endswith(".gz"):
+                fp = join(directory, name)
+                stat = os.stat(fp)
+                files.append((stat.st_mtime, stat.st_size, fp))
+        files.sort(reverse=True)  # 从新到旧
+        oldest = time() - self.retention_days * 86400
+        total = 0
+        for mtime, size, fp in files:
+            total += size
+            if (self.retention_days and mtime < oldest) or (self.retention_bytes and total > self.retention_bytes):
+                os.remove(fp)
+
+
+_archiver: LogArchiver | None = None
+
+
+def get_log_archiver() -> LogArchiver:
+    global _archiver
+    if _archiver is None:
+        _archiver = LogArchiver()
+    return _archiver
+
+
+class RotatingLogFile:
+    """
+    按日期与大小轮转的文本文件, 当前文件为 {prefix}_{日期}{extension}, 切换下来的文件为 {prefix}_{日期}.{序号}{extension}.gz
+    可作为 sys.stdout/sys.stderr 或 logging.StreamHandler 的输出流, 线程安全
+    不同用途的文件需使用不同的 prefix, 保留策略按 prefix 区分
+    """
+    encoding = "utf-8"
+
+    def __init__(self, directory: str, prefix: str = "log", archiver: LogArchiver | None = None,
+                 extension: str = ".log"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.extension = extension
+        self.archiver = archiver or get_log_archiver()
+        self.lock = RLock()
+        self.date = ""
+        self.size = 0
+        self.rollover_at = 0.0
+        self.file = self.open_current()
+        if not is_plugin_worker():  # 插件子进程不处理遗留文件, 避免与主进程同时压缩
+            self.archive_leftovers()
+
+    def path_for(self, date: str) -> str:
+        return join(self.directory, f"{self.prefix}_{date}{self.extension}")
+
+    def archive_path_for(self, date: str) -> str:
+        index = 1
+        while True:
+            fp = join(self.directory, f"{self.prefix}_{date}.{index}{self.extension}")
+            if not exists(fp) and not exists(fp + ".gz"):
+                return fp
+            index += 1
+
+    def open_current(self):
+        self.date = datetime.now().strftime("%Y-%m-%d")
+        self.rollover_at = next_midnight()
+        fp = self.path_for(self.date)
+        self.size = os.path.getsize(fp) if exists(fp) else 0
+        return open(fp, "a", encoding="utf-8")
+
+    def archive_leftovers(self):
+        """压缩上次运行留下的往日日志与未压缩完的文件"""
+        pattern = re.compile(rf"{re.escape(self.prefix)}_(\d{{4}}-\d{{2}}-\d{{2}})(\.\d+)?{re.escape(self.extension)}")
+        current = basename(self.path_for(self.date))
+        for name in os.listdir(self.directory):
+            match = pattern.fullmatch(name)
+            if match is None or name == current:
+                continue
+            fp = join(self.directory, name)
+            if match.group(2) is None:
+                archived = self.archive_path_for(match.group(1))
+                try:
+                    os.replace(fp, archived)
+                except OSError:
+                    continue
+                fp = archived
+            self.archiver.submit(fp, self.prefix)
+
+    def should_rollover(self) -> bool:
+        max_bytes = self.archiver.max_bytes
+        return time() >= self.rollover_at or (max_bytes > 0 and self.size >= max_bytes)
+
+    def rollover(self):
+        self.file.close()
+        fp = self.path_for(self.date)
+        archived = self.archive_path_for(self.date)
+        try:
+            os.replace(fp, archived)
+        except OSError:  # 文件被其他进程占用, 继续写入原文件
+            archived = None
+        self.file = self.open_current()
+        if archived is None:
+            self.size = 0  # 避免每次写入都尝试切换
+        else:
+            self.archiver.submit(archived, self.prefix)
+
+    def write(self, text: str) -> int:
+        with self.lock:
+            if self.should_rollover():
+                self.rollover()
+            self.size += len(text)  # 按字符数估算, 足够用于大小上限
+            return self.file.write(text)
+
+    def flush(self):
+        with self.lock:
+            self.file.flush()
+
+    def fileno(self) -> int:
+        return self.file.fileno()
+
+    @staticmethod
+    def isatty() -> bool:
+        return False
+
+    @staticmethod
+    def writable() -> bool:
+        return True
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,137 @@
+"""
+内存日志存储
+每条记录 (时间, 等级, 插件, 线程, 消息) 按列保存在定长数组构成的环形缓冲区中, 超出容量后覆盖最旧的记录,
+同时以 JSONL 追加写入日志目录 (records_*.jsonl, 与文本日志一样轮转压缩); 日志查看器通过序号读取与筛选
+只由日志线程写入, 读取无需加锁: 序号小于 first_seq 的记录已被覆盖, 读取时返回None
+"""
+import json
+import logging
+from array import array
+from dataclasses import dataclass
+from itertools import compress
+
+from lib.log_rotation import RotatingLogFile
+
+LOG_STORE_CAPACITY = 200_000  # 约占用 30 MB (按每条消息 100 字符估算)
+MAIN_SOURCE = ""  # 非插件记录的来源
+
+
+@dataclass
+class LogEntry:
+    seq: int
+    time: float
+    level: int
+    plugin: str
+    thread: str
+    message: str
+
+
+class Interner:
+    """字符串 <-> 序号, 让列中只保存整数"""
+
+    def __init__(self, first: str):
+        self.names: list[str] = [first]
+        self.index: dict[str, int] = {first: 0}
+
+    def intern(self, name: str) -> int:
+        index = self.index.get(name)
+        if index is None:
+            index = self.index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+
+class LogStore:
+    def __init__(self, capacity: int = LOG_STORE_CAPACITY):
+        self.capacity = capacity
+        self.times = array("d", [0.0]) * capacity
+        self.levels = array("B", [0]) * capacity
+        self.plugin_ids = array("H", [0]) * capacity
+        self.thread_ids = array("I", [0]) * capacity
+        self.messages: list[str] = [""] * capacity
+        self.plugins = Interner(MAIN_SOURCE)
+        self.threads = Interner("")
+        self.next_seq = 0  # 下一条记录的序号, 所有列写入完成后才增加
+        self.first_seq = 0  # 最旧的有效记录, 覆盖槽位之前先增加
+
+    def append(self, time: float, level: int, plugin: str, thread: str, message: str):
+        if self.next_seq >= self.capacity:
+            self.first_seq = self.next_seq - self.capacity + 1
+        slot = self.next_seq % self.capacity
+        self.times[slot] = time
+        self.levels[slot] = min(level, 255)
+        self.plugin_ids[slot] = self.plugins.intern(plugin)
+        self.thread_ids[slot] = self.threads.intern(thread)
+        self.messages[slot] = message
+        self.next_seq += 1
+
+    def get(self, seq: int) -> LogEntry | None:
+        if not self.first_seq <= seq < self.next_seq:
+            return None
+        slot = seq % self.capacity
+        entry = LogEntry(seq, self.times[slot], self.levels[slot], self.plugins.names[self.plugin_ids[slot]],
+                         self.threads.names[self.thread_ids[slot]], self.messages[slot])
+        return entry if seq >= self.first_seq else None  # 读取期间被覆盖
+
+    def segments(self, start_seq: int, end_seq: int) -> list[tuple[int, int, int]]:
+        """把序号区间拆分为环形缓冲区中连续的 (起始序号, 起始槽位, 结束槽位)"""
+        result = []
+        while start_seq < end_seq:
+            slot = start_seq % self.capacity
+            count = min(end_seq - start_seq, self.capacity - slot)
+            result.append((start_seq, slot, slot + count))
+            start_seq += count
+        return result
+
+    def scan(self, start_seq: int, plugin: str | None = None, min_level: int = 0) -> tuple[array, int]:
+        """返回 [start_seq, 当前末尾) 中符合条件的记录序号与扫描到的末尾序号, plugin为None时不按插件筛选"""
+        end_seq = self.next_seq
+        start_seq = max(start_seq, self.first_seq)
+        result = array("q")
+        plugin_id = None if plugin is None else self.plugins.index.get(plugin, -1)
+        if plugin_id == -1:
+            return result, end_seq
+        for base, begin, end in self.segments(start_seq, end_seq):
+            seqs = range(base, base + end - begin)
+            if plugin_id is None and min_level <= 0:
+                result.extend(seqs)
+            elif plugin_id is None:
+                result.extend(compress(seqs, (level >= min_level for level in self.levels[begin:end])))
+            else:
+                result.extend(compress(seqs, (level >= min_level and plugin_id == owner for level, owner in
+                                              zip(self.levels[begin:end], self.plugin_ids[begin:end]))))
+        return result, end_seq
+
+
+class LogStoreHandler(logging.Handler):
+    """在日志线程中把记录写入内存存储与 JSONL 文件"""
+
+    def __init__(self, store: LogStore, mirror: RotatingLogFile | None, plugin_prefix: str):
+        super().__init__()
+        self.store = store
+        self.mirror = mirror
+        self.plugin_prefix = plugin_prefix
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            plugin = record.name[len(self.plugin_prefix):] if record.name.startswith(self.plugin_prefix) \
+                else MAIN_SOURCE
+            message = record.getMessage()
+            self.store.append(record.created, record.levelno, plugin, record.threadName or "", message)
+            if self.mirror is not None:
+                self.mirror.write(json.dumps({"time": record.created, "level": record.levelname, "plugin": plugin,
+                                              "thread": record.threadName, "message": message},
+                                             ensure_ascii=False) + "\n")
+                self.mirror.flush()
+        except Exception:
+            self.handleError(record)
+
+
+_store: LogStore | None = None
+
+
+def get_log_store() -> LogStore:
+    global _store
+    if _store is None:
+        _store = LogStore()
+    return _store
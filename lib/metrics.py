@@ -0,0 +1,226 @@
+"""
+性能指标
+各模块与插件把计数、瞬时值与缓存命中发布到进程共享的注册表, 发布只是修改对象的整数属性, 不加锁
+(多个线程同时写入同一个计数时偶尔会少计一次, 对统计没有影响), 只有注册时加锁;
+性能面板以固定的低频率通过 MetricsSampler 采样: 计数换算为每秒速率, 耗时取两次采样之间新增记录的百分位,
+面板关闭时不进行任何采样; 独立进程中运行的插件的指标不在本进程中, 只显示宿主采样的CPU占用
+"""
+import math
+from collections import deque
+from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
+from typing import Callable, Iterable
+
+from lib.tracing import LatencyHistogram, get_tracer
+
+# 分类
+EVENTS = "事件/秒"
+LATENCY = "耗时 p95"
+QUEUES = "队列深度"
+CACHES = "缓存命中率"
+MAIN_LOOP = "主循环延迟"
+PLUGIN_CPU = "插件CPU"
+SECTION_UNITS = {EVENTS: "/s", LATENCY: "ms", QUEUES: "", CACHES: "%", MAIN_LOOP: "ms", PLUGIN_CPU: "%"}
+
+# 动态指标的种类
+COUNTER = 0  # 单调递增的计数, 显示为每秒速率
+GAUGE = 1  # 瞬时值
+
+HISTORY_LENGTH = 120  # 每个指标保留的采样点数量
+
+SourceItem = tuple[int, str, str, float]  # (种类, 分类, 名称, 值)
+
+
+class CounterMetric:
+    __slots__ = ("name", "section", "value")
+
+    def __init__(self, name: str, section: str):
+        self.name = name
+        self.section = section
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+
+class GaugeMetric:
+    __slots__ = ("name", "section", "value", "func")
+
+    def __init__(self, name: str, section: str, func: Callable[[], float] | None = None):
+        self.name = name
+        self.section = section
+        self.value = 0.0
+        self.func = func  # 采样时调用, 为None时使用 set 设置的值
+
+    def set(self, value: float):
+        self.value = value
+
+    def read(self) -> float:
+        return self.value if self.func is None else self.func()
+
+
+class CacheMetric:
+    __slots__ = ("name", "hits", "misses")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self):
+        self.hits += 1
+
+    def miss(self):
+        self.misses += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = Lock()
+        self.counters: dict[str, CounterMetric] = {}
+        self.gauges: dict[str, GaugeMetric] = {}
+        self.caches: dict[str, CacheMetric] = {}
+        self.sources: dict[str, Callable[[], Iterable[SourceItem]]] = {}
+
+    def counter(self, name: str, section: str = EVENTS) -> CounterMetric:
+        with self.lock:
+            metric = self.counters.get(name)
+            if metric is None:
+                metric = self.counters[name] = CounterMetric(name, section)
+            return metric
+
+    def gauge(self, name: str, func: Callable[[], float] | None = None, section: str = QUEUES) -> GaugeMetric:
+        """同名的指标已存在时替换其取值函数 (例如插件重载后)"""
+        with self.lock:
+            metric = self.gauges.get(name)
+            if metric is None:
+                metric = self.gauges[name] = GaugeMetric(name, section, func)
+            else:
+                metric.func = func
+            return metric
+
+    def cache(self, name: str) -> CacheMetric:
+        with self.lock:
+            metric = self.caches.get(name)
+            if metric is None:
+                metric = self.caches[name] = CacheMetric(name)
+            return metric
+
+    def add_source(self, key: str, func: Callable[[], Iterable[SourceItem]]):
+        """数量会变化的一组指标 (如每个订阅、每个插件), 采样时调用 func 获取"""
+        with self.lock:
+            self.sources[key] = func
+
+    def remove(self, name: str):
+        with self.lock:
+            for metrics in (self.counters, self.gauges, self.caches, self.sources):
+                metrics.pop(name, None)
+
+
+@dataclass
+class MetricRow:
+    key: str
+    section: str
+    name: str
+    value: float | None  # None为本次采样没有数据
+    detail: str = ""
+
+    @property
+    def unit(self) -> str:
+        return SECTION_UNITS.get(self.section, "")
+
+
+class MetricsSampler:
+    """由性能面板按固定间隔调用, 保存每个指标最近的采样值"""
+
+    def __init__(self, registry: "MetricsRegistry", history: int = HISTORY_LENGTH):
+        self.registry = registry
+        self.history_length = history
+        self.history: dict[str, deque[float]] = {}
+        self.last_time: float | None = None
+        self.last_counters: dict[str, float] = {}
+        self.last_caches: dict[str, tuple[int, int]] = {}
+        self.last_histograms: dict[str, LatencyHistogram] = {}
+
+    def sample(self) -> list[MetricRow]:
+        now = monotonic()
+        elapsed = None if self.last_time is None else max(now - self.last_time, 1e-6)
+        self.last_time = now
+        registry = self.registry
+        with registry.lock:
+            counters = list(registry.counters.values())
+            gauges = list(registry.gauges.values())
+            caches = list(registry.caches.values())
+            sources = list(registry.sources.items())
+
+        rows: list[MetricRow] = []
+        counter_values: dict[str, float] = {}
+
+        def add_counter(section: str, name: str, value: float):
+            key = f"{section}:{name}"
+            last = self.last_counters.get(key)
+            counter_values[key] = value
+            rate = None if elapsed is None or last is None else max(value - last, 0) / elapsed
+            rows.append(MetricRow(key, section, name, rate, f"累计 {value:.0f}"))
+
+        for metric in counters:
+            add_counter(metric.section, metric.name, metric.value)
+        for metric in gauges:
+            try:
+                value = metric.read()
+            except Exception:  # 取值函数引用的对象可能已失效
+                value = None
+            rows.append(MetricRow(f"{metric.section}:{metric.name}", metric.section, metric.name, value))
+        for _, func in sources:
+            try:
+                items = list(func())
+            except Exception:
+                continue
+            for kind, section, name, value in items:
+                if kind == COUNTER:
+                    add_counter(section, name, value)
+                else:
+                    rows.append(MetricRow(f"{section}:{name}", section, name, value))
+        self.last_counters = counter_values
+
+        caches_now = {}
+        for metric in caches:
+            hits, misses = metric.hits, metric.misses
+            last_hits, last_misses = self.last_caches.get(metric.name, (0, 0))
+            lookups = (hits - last_hits) + (misses - last_misses)
+            rate = (hits - last_hits) / lookups * 100 if lookups > 0 else None
+            total = hits + misses
+            detail = f"{lookups} 次查询, 累计 {hits / total * 100:.1f}%" if total else "无查询"
+            rows.append(MetricRow(f"{CACHES}:{metric.name}", CACHES, metric.name, rate, detail))
+            caches_now[metric.name] = (hits, misses)
+        self.last_caches = caches_now
+
+        histograms = get_tracer().snapshot_histograms()
+        for name, histogram in sorted(histograms.items()):
+            delta = histogram.delta(self.last_histograms.get(name))
+            if delta.count:
+                value = delta.percentile(95) * 1000
+                detail = (f"p50 {delta.percentile(50) * 1000:.3f} / p99 {delta.percentile(99) * 1000:.3f} ms, "
+                          f"{delta.count} 次")
+            else:
+                value, detail = None, f"无调用, 累计 {histogram.count} 次"
+            rows.append(MetricRow(f"{LATENCY}:{name}", LATENCY, name, value, detail))
+        self.last_histograms = histograms
+
+        for row in rows:
+            values = self.history.get(row.key)
+            if values is None:
+                values = self.history[row.key] = deque(maxlen=self.history_length)
+            values.append(math.nan if row.value is None else row.value)
+        return rows
+
+
+_registry: MetricsRegistry | None = None
+
+
+def get_metrics() -> MetricsRegistry:
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
@@ -1,19 +1,96 @@
+import ctypes
+import os
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from functools import partial
+from dataclasses import dataclass, field
 from time import perf_counter
-from typing import Union
+from typing import Any, Iterator, Union, Callable
 
 
 def ms(n1: float, n2: float):
     return round((n2 - n1) * 1000, 4)
 
 
+@dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    end: float
+    depth: int  # 同一线程中的嵌套层级
+    thread_id: int
+    thread_name: str  # 线程ID可能被之后的线程复用, 同时记录名称
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def chrome_trace(spans: list[Span], origin: float) -> dict[str, Any]:
+    """把时间段转换为 Chrome trace 格式, 时间相对于 origin"""
+    pid = os.getpid()
+    thread_names = {span.thread_id: span.thread_name for span in spans}
+    events: list[dict[str, Any]] = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for tid, name in thread_names.items()
+    ]
+    for span in spans:
+        events.append({"name": span.name, "cat": span.category, "ph": "X", "pid": pid, "tid": span.thread_id,
+                       "ts": round((span.start - origin) * 1e6, 1), "dur": round(span.duration * 1e6, 1)})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
 class Counter:
     def __init__(self, create_start: bool = False):
         self.timers: dict[str, float] = {}
         self.results: dict[str, float] = {}
+        self.spans: list[Span] = []
+        self.span_stacks = threading.local()
+        self.lock = threading.Lock()  # 多个线程同时记录时间段
+        self.origin = perf_counter()
         self.local_timer = perf_counter()
         if create_start:
             self.start()
 
+    @contextmanager
+    def span(self, name: str, category: str = "phase") -> Iterator[None]:
+        """记录一个可嵌套的时间段, 嵌套关系按线程分别计算"""
+        stack: list[str] = self.span_stacks.__dict__.setdefault("stack", [])
+        start = perf_counter()
+        stack.append(name)
+        try:
+            yield
+        finally:
+            stack.pop()
+            thread = threading.current_thread()
+            span = Span(name, category, start, perf_counter(), len(stack), thread.ident, thread.name)
+            with self.lock:
+                self.spans.append(span)
+
+    def snapshot_spans(self) -> list[Span]:
+        with self.lock:
+            return list(self.spans)
+
+    def span_tree(self) -> list[tuple[Span, float]]:
+        """按线程与开始时间排序的 (时间段, 自身用时), 自身用时不含直接子时间段"""
+        ordered = sorted(self.snapshot_spans(), key=lambda sp: (sp.thread_id, sp.start, -sp.end))
+        child_time = [0.0] * len(ordered)
+        stack: list[int] = []
+        for i, span in enumerate(ordered):
+            while stack and (ordered[stack[-1]].thread_id != span.thread_id or ordered[stack[-1]].end <= span.start):
+                stack.pop()
+            if stack:
+                child_time[stack[-1]] += span.duration
+            stack.append(i)
+        return [(span, span.duration - child) for span, child in zip(ordered, child_time)]
+
+    def to_chrome_trace(self) -> dict[str, Any]:
+        """导出为 Chrome trace (chrome://tracing / Perfetto) 格式"""
+        return chrome_trace(self.snapshot_spans(), self.origin)
+
     def start(self, *names: str) -> Union[None, 'Counter']:
         if names:
             for name in names:
@@ -44,7 +121,296 @@ class Counter:
         ret = self.end(name)
         return f"{ret * 1000:.3f} ms"
 
+    def format_results(self, *names: str, sep: str = " | ") -> str:
+        """按给定顺序格式化计时结果, 不存在的计时器会被跳过"""
+        return sep.join(f"{n}: {self.results[n] * 1000:.3f} ms" for n in (names or self.results) if n in self.results)
+
     def __str__(self):
         return "\n".join(
             f"{n}: {v * 1000:.3f} ms" for n, v in {**self.results, "##Local##": self.local_timer}.items()
         )
+
+
+@dataclass
+class ThreadTimes:
+    cpu_time: float  # 秒
+    context_switches: int | None  # 不支持的平台为None
+
+
+# noinspection PyPep8Naming
+class _SYSTEM_THREAD_INFORMATION(ctypes.Structure):
+    _fields_ = [
+        ("KernelTime", ctypes.c_longlong),
+        ("UserTime", ctypes.c_longlong),
+        ("CreateTime", ctypes.c_longlong),
+        ("WaitTime", ctypes.c_ulong),
+        ("StartAddress", ctypes.c_void_p),
+        ("UniqueProcess", ctypes.c_void_p),
+        ("UniqueThread", ctypes.c_void_p),
+        ("Priority", ctypes.c_long),
+        ("BasePriority", ctypes.c_long),
+        ("ContextSwitches", ctypes.c_ulong),
+        ("ThreadState", ctypes.c_ulong),
+        ("WaitReason", ctypes.c_ulong),
+    ]
+
+
+# noinspection PyPep8Naming
+class _SYSTEM_PROCESS_INFORMATION(ctypes.Structure):
+    _fields_ = [
+        ("NextEntryOffset", ctypes.c_ulong),
+        ("NumberOfThreads", ctypes.c_ulong),
+        ("WorkingSetPrivateSize", ctypes.c_longlong),
+        ("HardFaultCount", ctypes.c_ulong),
+        ("NumberOfThreadsHighWatermark", ctypes.c_ulong),
+        ("CycleTime", ctypes.c_ulonglong),
+        ("CreateTime", ctypes.c_longlong),
+        ("UserTime", ctypes.c_longlong),
+        ("KernelTime", ctypes.c_longlong),
+        ("ImageNameLength", ctypes.c_ushort),
+        ("ImageNameMaximumLength", ctypes.c_ushort),
+        ("ImageNameBuffer", ctypes.c_void_p),
+        ("BasePriority", ctypes.c_long),
+        ("UniqueProcessId", ctypes.c_void_p),
+        ("InheritedFromUniqueProcessId", ctypes.c_void_p),
+        ("HandleCount", ctypes.c_ulong),
+        ("SessionId", ctypes.c_ulong),
+        ("UniqueProcessKey", ctypes.c_void_p),
+        ("PeakVirtualSize", ctypes.c_size_t),
+        ("VirtualSize", ctypes.c_size_t),
+        ("PageFaultCount", ctypes.c_ulong),
+        ("PeakWorkingSetSize", ctypes.c_size_t),
+        ("WorkingSetSize", ctypes.c_size_t),
+        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+        ("PagefileUsage", ctypes.c_size_t),
+        ("PeakPagefileUsage", ctypes.c_size_t),
+        ("PrivatePageCount", ctypes.c_size_t),
+        ("ReadOperationCount", ctypes.c_longlong),
+        ("WriteOperationCount", ctypes.c_longlong),
+        ("OtherOperationCount", ctypes.c_longlong),
+        ("ReadTransferCount", ctypes.c_longlong),
+        ("WriteTransferCount", ctypes.c_longlong),
+        ("OtherTransferCount", ctypes.c_longlong),
+    ]
+
+
+def _win_thread_times(pid: int) -> dict[int, ThreadTimes]:
+    """通过NtQuerySystemInformation获取进程中每个线程的CPU时间与上下文切换次数"""
+    nt_query = ctypes.windll.ntdll.NtQuerySystemInformation
+    size = ctypes.c_ulong(0x100000)
+    while True:
+        buffer = ctypes.create_string_buffer(size.value)
+        status = nt_query(5, buffer, size, ctypes.byref(size)) & 0xFFFFFFFF  # SystemProcessInformation
+        if status != 0xC0000004:  # STATUS_INFO_LENGTH_MISMATCH
+            break
+        size = ctypes.c_ulong(size.value + 0x10000)
+    if status != 0:
+        raise ctypes.WinError(status)
+    base = ctypes.addressof(buffer)
+    offset = 0
+    while True:
+        proc = _SYSTEM_PROCESS_INFORMATION.from_address(base + offset)
+        if (proc.UniqueProcessId or 0) == pid:
+            threads = (_SYSTEM_THREAD_INFORMATION * proc.NumberOfThreads).from_address(
+                base + offset + ctypes.sizeof(_SYSTEM_PROCESS_INFORMATION))
+            return {
+                (t.UniqueThread or 0): ThreadTimes((t.KernelTime + t.UserTime) / 10 ** 7, t.ContextSwitches)
+                for t in threads
+            }
+        if proc.NextEntryOffset == 0:
+            return {}
+        offset += proc.NextEntryOffset
+
+
+def _linux_thread_times(pid: int) -> dict[int, ThreadTimes]:
+    result = {}
+    tick = os.sysconf("SC_CLK_TCK")
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{tid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            switches = 0
+            with open(f"{task_dir}/{tid}/status") as f:
+                for line in f:
+                    if line.endswith("ctxt_switches", 0, line.find(":")):
+                        switches += int(line.split()[1])
+        except OSError:
+            continue
+        result[int(tid)] = ThreadTimes((int(fields[11]) + int(fields[12])) / tick, switches)
+    return result
+
+
+def get_thread_times(pid: int | None = None) -> dict[int, ThreadTimes]:
+    """获取进程中各线程 (以native_id为键) 的累计CPU时间与上下文切换次数"""
+    pid = os.getpid() if pid is None else pid
+    if sys.platform == "win32":
+        return _win_thread_times(pid)
+    elif os.path.isdir(f"/proc/{pid}/task"):
+        return _linux_thread_times(pid)
+    import psutil
+    return {t.id: ThreadTimes(t.user_time + t.system_time, None) for t in psutil.Process(pid).threads()}
+
+
+def callable_modules(func: Callable) -> tuple[str, ...]:
+    """推测函数所属的模块: 函数所在模块, 以及其绑定对象 (和对象的回调) 的类所在模块"""
+    if isinstance(func, partial):
+        func = func.func
+    modules = [getattr(func, "__module__", None)]
+    owner = getattr(func, "__self__", None)
+    if owner is not None:
+        modules.append(type(owner).__module__)
+        for value in vars(owner).values() if hasattr(owner, "__dict__") else ():
+            if callable(value) and hasattr(value, "__self__"):  # 例如 WindowWatcher.proc
+                modules.append(type(value.__self__).__module__)
+    return tuple(m for m in modules if m)
+
+
+def thread_target_modules(thread: threading.Thread) -> list[str]:
+    """推测线程所属的模块, 见 callable_modules"""
+    target = getattr(thread, "_target", None)
+    return [] if target is None else list(callable_modules(target))
+
+
+class SharedThreadUsage:
+    """
+    共享线程 (调度器、WinEvent钩子线程) 中执行的回调按所属模块累计CPU时间与调用次数,
+    线程本身不属于任何插件, 资源采样时据此把这些工作计入回调所属的插件
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals: dict[tuple[str, tuple[str, ...]], list[float]] = {}  # (线程名, 模块) -> [CPU时间, 调用次数]
+
+    def add(self, modules: tuple[str, ...], cpu_time: float):
+        key = (threading.current_thread().name, modules)
+        with self.lock:
+            total = self.totals.get(key)
+            if total is None:
+                total = self.totals[key] = [0.0, 0]
+            total[0] += cpu_time
+            total[1] += 1
+
+    def snapshot(self) -> dict[tuple[str, tuple[str, ...]], tuple[float, int]]:
+        with self.lock:
+            return {key: (cpu_time, int(calls)) for key, (cpu_time, calls) in self.totals.items()}
+
+
+_shared_usage = SharedThreadUsage()
+
+
+def get_shared_usage() -> SharedThreadUsage:
+    return _shared_usage
+
+
+@dataclass
+class ResourceUsage:
+    cpu_percent: float = 0.0
+    cpu_time: float = 0.0
+    threads: int = 0
+    wakeups_per_min: float | None = None
+    alloc_bytes: int | None = None  # 进程内插件为tracemalloc统计的分配量, 独立进程插件为进程内存占用
+    thread_names: list[str] = field(default_factory=list)
+
+
+class ResourceSampler:
+    """
+    按归属 (如插件ID) 汇总线程资源占用
+    thread_owner: 线程 -> 归属, 无归属返回None
+    file_owner: 源文件路径 -> 归属, 用于tracemalloc内存统计
+    modules_owner: 模块名列表 -> 归属, 用于共享线程中回调的CPU时间 (见 SharedThreadUsage)
+    processes: 归属 -> 进程PID, 整个进程都计入该归属 (独立进程插件)
+    """
+
+    def __init__(self, thread_owner: Callable[[threading.Thread], str | None],
+                 file_owner: Callable[[str], str | None] | None = None,
+                 modules_owner: Callable[[tuple[str, ...]], str | None] | None = None):
+        self.thread_owner = thread_owner
+        self.file_owner = file_owner
+        self.modules_owner = modules_owner
+        self.processes: dict[str, int] = {}
+        self.last_sample: dict[tuple[int, int], ThreadTimes] = {}
+        self.last_shared: dict[tuple[str, tuple[str, ...]], tuple[float, int]] | None = None  # None为尚未采样
+        self.last_time = perf_counter()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def enable_memory_trace(enable: bool):
+        if enable and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif not enable and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def sample(self) -> dict[str, ResourceUsage]:
+        with self.lock:  # 后台采样与手动导出可能同时进行
+            return self._sample()
+
+    def _sample(self) -> dict[str, ResourceUsage]:
+        now = perf_counter()
+        elapsed = max(now - self.last_time, 1e-6)
+        samples: dict[tuple[int, int], ThreadTimes] = {}
+        usages: dict[str, ResourceUsage] = {}
+
+        def account(owner: str, key: tuple[int, int], name: str):
+            usage = usages.setdefault(owner, ResourceUsage())
+            current = samples[key]
+            last = self.last_sample.get(key, current)
+            usage.threads += 1
+            usage.thread_names.append(name)
+            usage.cpu_time += current.cpu_time
+            usage.cpu_percent += (current.cpu_time - last.cpu_time) / elapsed * 100
+            if current.context_switches is not None:
+                usage.wakeups_per_min = (usage.wakeups_per_min or 0) + \
+                                        (current.context_switches - last.context_switches) / elapsed * 60
+
+        pid = os.getpid()
+        samples.update(((pid, tid), times) for tid, times in get_thread_times(pid).items())
+        for thread in threading.enumerate():
+            owner = self.thread_owner(thread)
+            if owner is not None and (pid, thread.native_id) in samples:
+                account(owner, (pid, thread.native_id), thread.name)
+
+        if self.modules_owner is not None:
+            shared = get_shared_usage().snapshot()
+            for (thread_name, modules), (cpu_time, calls) in shared.items():
+                owner = self.modules_owner(modules)
+                if owner is None:
+                    continue
+                # 两次采样之间新出现的回调, 其累计值都发生在这段时间内
+                last = (cpu_time, calls) if self.last_shared is None else (0.0, 0)
+                last_cpu_time, last_calls = (self.last_shared or {}).get((thread_name, modules), last)
+                usage = usages.setdefault(owner, ResourceUsage())
+                usage.cpu_time += cpu_time
+                usage.cpu_percent += (cpu_time - last_cpu_time) / elapsed * 100
+                usage.wakeups_per_min = (usage.wakeups_per_min or 0) + (calls - last_calls) / elapsed * 60
+                name = f"{thread_name} (共享)"
+                if name not in usage.thread_names:
+                    usage.thread_names.append(name)
+            self.last_shared = shared
+
+        for owner, proc_pid in list(self.processes.items()):
+            try:
+                proc_times = get_thread_times(proc_pid)
+            except OSError:
+                continue
+            samples.update(((proc_pid, tid), times) for tid, times in proc_times.items())
+            for tid in proc_times:
+                account(owner, (proc_pid, tid), str(tid))
+            try:
+                import psutil
+                usages[owner].alloc_bytes = psutil.Process(proc_pid).memory_info().rss
+            except (ImportError, OSError, KeyError):
+                pass
+
+        if self.file_owner and tracemalloc.is_tracing():
+            for stat in tracemalloc.take_snapshot().statistics("filename"):
+                owner = self.file_owner(stat.traceback[0].filename)
+                if owner is not None and owner not in self.processes:
+                    usage = usages.setdefault(owner, ResourceUsage())
+                    usage.alloc_bytes = (usage.alloc_bytes or 0) + stat.size
+        self.last_sample = samples
+        self.last_time = now
+        return usages
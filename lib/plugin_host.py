@@ -0,0 +1,701 @@
+"""
+插件宿主
+负责插件的发现、依赖检查、导入、生命周期、配置读写与资源采样, 不依赖wx,
+图形界面 (ControlPanel) 与无界面模式 (--headless) 共用, 界面通过 PluginHostListener 接收通知
+"""
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from importlib import import_module, invalidate_caches
+from os.path import join, basename, exists, expandvars, abspath, normcase
+from sys import executable
+from sys import path
+from threading import Thread, Lock, RLock
+from time import sleep
+from typing import Iterable, Iterator, cast as type_cast
+
+from base import *
+from lib.config_store import ConfigStore
+from lib.file_watcher import DirectoryWatcher
+from lib.lifecycle import LifecycleExecutor, LifecycleJob, LifecycleResult
+from lib.log import logger, get_plugin_logger, configure_log_rotation
+from lib.metrics import GAUGE, PLUGIN_CPU, SourceItem, get_metrics
+from lib.perf import Counter, ResourceSampler, ResourceUsage, thread_target_modules
+from lib.plugin_index import PluginIndex, PluginIndexEntry
+from lib.plugin_worker import PluginWorkerProxy
+from lib.requirements import RequirementResolver
+from lib.startup_profile import startup_span, finish_startup_profile
+from lib.startup_stages import (IDLE_GATED_STAGE, SystemLoadSampler, get_startup_stage, group_by_stage,
+                                wait_for_idle)
+from lib.tracing import get_tracer
+
+PLUGIN_LOAD_WORKERS = 4
+PLUGIN_LOAD_PHASES = ("manifest", "requirements", "import", "construct")
+EXIT_STOP_DEADLINE = 3.0  # 退出时停止插件的截止时间, 需小于 on_exit_timeout 的强制退出时间
+RELOAD_DEBOUNCE = 1.0  # 插件文件停止变化多久后自动重载
+
+
+class PluginState(Enum):
+    STOPPED = 0
+    STOPPING = 1
+    STARTING = 2
+    RUNNING = 3
+
+
+@dataclass
+class PluginLoadResult:
+    plugin_dir: str
+    plugin_info: dict[str, Any]
+    main_class: BasePlugin
+    logger: logging.Logger
+    timer: Counter
+    loaded: bool = True
+
+
+@dataclass
+class PluginInfo:
+    id: str
+    info: dict[str, Any]
+    main_class: BasePlugin
+    state: PluginState
+    line: int
+    logger: logging.Logger
+    plugin_dir: str = ""
+    loaded: bool = True
+    resources: ResourceUsage = field(default_factory=ResourceUsage)
+
+
+def format_bytes(size: int | None) -> str:
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class WEKConfig(ModuleConfigPlus):
+    def __init__(self):
+        super().__init__()
+        self.font_size: IntParam | int = IntParam(11, "字体大小")
+        self.auto_startup_wait_time: FloatParam | float = FloatParam(1.0, "自动启动等待时间")
+        self.startup_idle_cpu: FloatParam | float = FloatParam(60.0, "分阶段启动: 系统空闲的CPU阈值 (%)")
+        self.startup_idle_disk: FloatParam | float = FloatParam(20.0, "分阶段启动: 系统空闲的磁盘读写阈值 (MB/s)")
+        self.startup_stage_max_delay: FloatParam | float = FloatParam(60.0, "分阶段启动: 每个阶段最长等待时间 (秒)")
+        self.plugin_deadline: FloatParam | float = FloatParam(10.0, "插件启动/停止超时时间 (秒)")
+        self.lazy_load_plugins: BoolParam | bool = BoolParam(False, "延迟导入插件 (启动或配置时才加载)")
+        self.auto_reload_plugins: BoolParam | bool = BoolParam(False, "插件文件变化时自动重载插件")
+        self.wheelhouse_dir: StringParam | str = StringParam("", "离线依赖目录 (wheelhouse, 留空则在线安装)")
+        self.resource_sample_interval: FloatParam | float = FloatParam(5.0, "插件资源采样间隔 (秒, 0为关闭)")
+        self.trace_plugin_memory: BoolParam | bool = BoolParam(False, "统计插件内存分配 (tracemalloc, 有额外开销)")
+        self.split_plugin_config: BoolParam | bool = BoolParam(False, "每个插件的配置保存为单独的文件 (config.d)")
+        self.log_max_file_mb: FloatParam | float = FloatParam(10.0, "单个日志文件大小上限 (MB, 超过后切换并压缩)")
+        self.log_retention_days: FloatParam | float = FloatParam(30.0, "压缩日志保留天数 (0为不限制)")
+        self.log_retention_mb: FloatParam | float = FloatParam(200.0, "压缩日志总大小上限 (MB, 0为不限制)")
+        self.set_reg_startup: ButtonParam = ButtonParam(desc="设置注册表开机启动")
+        self.delete_reg_startup: ButtonParam = ButtonParam(desc="取消注册表开机启动")
+        self.set_task_startup: ButtonParam = ButtonParam(desc="设置任务计划开机启动 (更快)")
+        self.delete_task_startup: ButtonParam = ButtonParam(desc="取消任务计划开机启动")
+        self.open_log_dir: ButtonParam = ButtonParam(desc="打开日志目录")
+        self.dump_plugin_resources: ButtonParam = ButtonParam(desc="导出插件资源占用")
+        self.dump_trace: ButtonParam = ButtonParam(desc="导出性能追踪 (Chrome trace 与耗时分布)")
+
+
+class PluginHostListener:
+    """宿主事件通知, 可能在任意线程中调用; 默认实现只记录日志 (无界面模式)"""
+
+    def on_plugin_registered(self, plugin_info: PluginInfo) -> int:
+        """返回插件在界面列表中的行号"""
+        return -1
+
+    def on_plugin_loaded(self, plugin_info: PluginInfo):
+        pass
+
+    def on_plugin_state_changed(self, plugin_info: PluginInfo):
+        pass
+
+    def on_resources_updated(self):
+        pass
+
+    def on_auto_start_finished(self):
+        pass
+
+    def on_requirements_installing(self, requirements: list[str]) -> Callable[[], None]:
+        """开始安装依赖, 返回安装结束时调用的函数"""
+        return lambda: None
+
+    def show_error(self, title: str, msg: str):
+        logger.error(f"{title}: {msg}")
+
+
+class PluginHost:
+    def __init__(self, listener: PluginHostListener | None = None, config: WEKConfig | None = None):
+        self.listener = listener or PluginHostListener()
+        self.first_run = True
+        self.has_exited = False
+
+        # 加载工具配置 (界面需要在传入前设置好按钮的处理函数)
+        self.config = config or WEKConfig()
+        self.config.load()
+        self.plugins_config = {}
+        self.auto_launch_plugins: list[str] = []
+        self.isolated_plugins: list[str] = []
+
+        self.req_lock = Lock()
+        self.req_resolver = RequirementResolver()
+        self.failed_requirements: set[str] = set()
+        self.load_lock = RLock()
+        self.state_lock = Lock()  # 插件状态的检查与修改 (界面与控制接口可能同时操作同一插件)
+        self.plugin_index = PluginIndex()
+        self.plugins: dict[str, PluginInfo] = {}
+        self.plugin_file_owners: dict[str, str | None] = {}
+        self.resource_sampler = ResourceSampler(self.thread_owner, self.file_owner, self.modules_owner)
+        self.lifecycle = LifecycleExecutor()
+        self.plugin_watcher = DirectoryWatcher(self.on_plugin_files_changed, debounce=RELOAD_DEBOUNCE)
+        self.config_store = ConfigStore()
+        self.read_config()
+        get_metrics().add_source("plugins", self.plugin_metrics)
+
+    def load_all_plugins_async(self):
+        Thread(target=self.load_all_plugins, daemon=True).start()
+
+    def toggle_auto_launch(self, id_: str):
+        if id_ in self.auto_launch_plugins:
+            self.auto_launch_plugins.remove(id_)
+        else:
+            self.auto_launch_plugins.append(id_)
+
+    def toggle_isolated(self, id_: str):
+        """切换插件是否在独立进程中运行, 下次启动程序时生效"""
+        if id_ in self.isolated_plugins:
+            self.isolated_plugins.remove(id_)
+        else:
+            self.isolated_plugins.append(id_)
+        self.save_config()
+
+    def load_all_plugins(self):
+        with startup_span("加载插件"):
+            logger.info("加载插件中...")
+            timer = Counter(create_start=True)
+            with startup_span("读取插件索引"):
+                self.plugin_index.load()
+                dir_names = self.plugin_index.list_dirs("plugins")
+            timer.start("requirements")
+            with startup_span("依赖检查"):
+                self.resolve_all_requirements(dir_names)
+            logger.debug(f"依赖检查用时: {timer.endT('requirements')}")
+            with ThreadPoolExecutor(max_workers=PLUGIN_LOAD_WORKERS, thread_name_prefix="PluginLoader") as executor:
+                futures = [executor.submit(self.prepare_plugin, join("plugins", dir_name)) for dir_name in dir_names]
+                # 按目录顺序注册, 保证插件列表顺序稳定
+                results: list[PluginLoadResult] = []
+                for dir_name, future in zip(dir_names, futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"加载插件失败: [{dir_name}] {e.__class__.__name__}: {e}")
+                        continue
+                    if result is None:
+                        logger.error(f"加载插件失败: [{dir_name}]")
+                        continue
+                    self.register_plugin(result)
+                    results.append(result)
+            logger.info(f"加载插件完成, 用时: {timer.endT()}")
+            self.save_plugin_index()
+            for result in results:
+                logger.debug(f"插件加载耗时 [{basename(result.plugin_dir)}] "
+                             f"{result.timer.format_results(*PLUGIN_LOAD_PHASES)}")
+        Thread(target=self.auto_start_plugins, daemon=True).start()
+        Thread(target=self.resource_sample_thread, daemon=True, name="PluginResourceSampler").start()
+        self.update_plugin_watcher()
+
+    def auto_start_plugins(self):
+        """按 startup_stage 分阶段启动, 阶段0立即启动, 之后的阶段错开开机时的负载高峰"""
+        stages = group_by_stage([plugin_id for plugin_id in self.auto_launch_plugins if plugin_id in self.plugins],
+                                lambda plugin_id: get_startup_stage(self.plugins[plugin_id].info))
+        sampler = SystemLoadSampler()
+        waited = False
+        for stage, plugin_ids in stages:
+            timer = Counter(create_start=True)
+            wait_info = ""
+            with startup_span(f"启动阶段 {stage}"):
+                if stage > 0 and not waited:
+                    with startup_span("自动启动等待"):
+                        sleep(self.config.auto_startup_wait_time)
+                    waited = True
+                if stage >= IDLE_GATED_STAGE:
+                    with startup_span("等待系统空闲"):
+                        result = wait_for_idle(sampler, self.config.startup_idle_cpu, self.config.startup_idle_disk,
+                                               self.config.startup_stage_max_delay)
+                    wait_info = f", 等待空闲 {result.waited:.1f}s" + ("" if result.idle else " (已达最长等待时间)") + \
+                                ("" if result.load is None else f" [{result.load}]")
+                jobs = [self.start_plugin(plugin_id) for plugin_id in plugin_ids]
+                self.lifecycle.wait_all([job for job in jobs if job is not None])
+            logger.info(f"启动阶段 {stage}: {', '.join(plugin_ids)}{wait_info}, 用时 {timer.endT()}")
+        finish_startup_profile()  # 自动启动完成即视为启动结束
+        self.listener.on_auto_start_finished()
+
+    def load_plugin(self, plugin_dir: str):
+        result = self.prepare_plugin(plugin_dir)
+        if result is None:
+            return False
+        self.register_plugin(result)
+        return True
+
+    def prepare_plugin(self, plugin_dir: str) -> PluginLoadResult | None:
+        """读取清单、检查依赖、导入模块并实例化插件 (可在工作线程中并发执行)"""
+        with startup_span(f"准备插件 {basename(plugin_dir)}"):
+            timer = Counter()
+            timer.start("manifest")
+            entry = self.plugin_index.get_entry(plugin_dir)
+            if entry is None:
+                return None
+            plugin_info = entry.manifest
+            timer.end("manifest")
+            plugin_logger = get_plugin_logger(plugin_info["id"], plugin_info["name"])
+            if self.config.lazy_load_plugins and plugin_info.get("lazy", True):
+                logger.info(f"延迟加载插件: [{basename(plugin_dir)}]")
+                placeholder = self.create_lazy_plugin(entry)
+                return PluginLoadResult(plugin_dir, plugin_info, placeholder, plugin_logger, timer, loaded=False)
+            main_class = self.import_plugin(plugin_dir, entry, timer)
+            if main_class is None:
+                return None
+            return PluginLoadResult(plugin_dir, plugin_info, main_class, plugin_logger, timer)
+
+    def import_plugin(self, plugin_dir: str, entry: PluginIndexEntry, timer: Counter) -> BasePlugin | None:
+        plugin_info = entry.manifest
+        timer.start("requirements")
+        if not self.plugin_index.is_requirements_ok(entry, executable):  # 缓存的检查结果仍有效时跳过
+            with self.req_lock:  # 依赖安装会弹出对话框, 逐个进行
+                missing = self.req_resolver.missing(plugin_info["requirements"])
+                if missing and (self.failed_requirements.issuperset(missing)
+                                or not self.install_requirements(missing)):
+                    return None
+            self.plugin_index.set_requirements_ok(entry, True, executable)
+        timer.end_start("requirements", "import")
+        if plugin_info["id"] in self.isolated_plugins:
+            logger.info(f"在独立进程中加载插件: [{basename(plugin_dir)}]")
+            timer.end_start("import", "construct")
+            main_class = PluginWorkerProxy(plugin_dir, entry.module_path, plugin_info["main_class"], plugin_info["id"],
+                                           logging.getLogger(f"WinEnchantKitLogger_{plugin_info['id']}"),
+                                           self.plugins_config.get(plugin_info["id"], {}))
+            timer.end("construct")
+            self.update_plugin_schema(entry, main_class)
+            return main_class
+        logger.info(f"加载插件: [{basename(plugin_dir)}]")
+        if plugin_dir not in path:
+            path.append(plugin_dir)
+        module = import_module(entry.module_path)
+        timer.end_start("import", "construct")
+        main_class: BasePlugin = getattr(module, plugin_info["main_class"])()
+        timer.end("construct")
+        self.update_plugin_schema(entry, main_class)
+        return main_class
+
+    def register_plugin(self, result: PluginLoadResult):
+        plugin_info = result.plugin_info
+        info = PluginInfo(plugin_info["id"], plugin_info, result.main_class, PluginState.STOPPED, -1, result.logger,
+                          result.plugin_dir, result.loaded)
+        info.line = self.listener.on_plugin_registered(info)
+        self.plugins[plugin_info["id"]] = info
+        if plugin_info["id"] in self.plugins_config:
+            result.main_class.config.load_values(self.plugins_config[plugin_info["id"]], f"plugins.{plugin_info['id']}")
+
+    def create_lazy_plugin(self, entry: PluginIndexEntry) -> LazyPlugin:
+        """根据清单声明或索引中缓存的配置结构创建占位插件, 使列表与配置窗口无需导入模块"""
+        plugin_id = entry.manifest["id"]
+        schema = entry.manifest.get("config_schema", entry.schema)
+        if schema is None:
+            return LazyPlugin()
+        params = load_schema(schema)
+        for name, param in params.items():
+            if isinstance(param, ButtonParam):
+                param.handler = lambda n=name: self.invoke_plugin_button(plugin_id, n)
+        return LazyPlugin(params)
+
+    def ensure_plugin_loaded(self, id_: str) -> BasePlugin:
+        """确保插件已被真正导入并实例化, 返回插件对象"""
+        plugin_info = self.plugins[id_]
+        with self.load_lock:
+            if plugin_info.loaded:
+                return plugin_info.main_class
+            timer = Counter()
+            entry = self.plugin_index.get_entry(plugin_info.plugin_dir)
+            if entry is None:
+                raise RuntimeError(f"插件 [{plugin_info.info['name']}] 的清单已不存在")
+            main_class = self.import_plugin(plugin_info.plugin_dir, entry, timer)
+            if main_class is None:
+                raise RuntimeError(f"插件 [{plugin_info.info['name']}] 依赖安装失败")
+            placeholder = type_cast(LazyPlugin, plugin_info.main_class)
+            main_class.config.load_values(placeholder.user_values(self.plugins_config.get(id_, {})), f"plugins.{id_}")
+            plugin_info.main_class = main_class
+            plugin_info.loaded = True
+            self.listener.on_plugin_loaded(plugin_info)
+            self.save_plugin_index()
+            logger.info(f"插件 [{plugin_info.info['name']}] 已导入 {timer.format_results(*PLUGIN_LOAD_PHASES)}")
+        return main_class
+
+    def reload_plugin(self, id_: str, callback: Callable[[LifecycleResult], None] | None = None) \
+            -> LifecycleJob | None:
+        """停止插件, 卸载其模块后重新导入, 恢复配置, 原先在运行时重新启动"""
+        plugin_info = self.plugins[id_]
+        last_state = self.claim_state(plugin_info, (PluginState.RUNNING, PluginState.STOPPED), PluginState.STOPPING)
+        if last_state is None:
+            logger.warning(f"插件 [{plugin_info.info['name']}] 正在启动或停止, 无法重载")
+            return None
+        was_running = last_state == PluginState.RUNNING
+        logger.info(f"重载插件: [{plugin_info.info['name']}]")
+
+        def reload():
+            timer = Counter(create_start=True)
+            old_class = plugin_info.main_class
+            if old_class.enable:
+                old_class.stop()
+                old_class.enable = False
+            if isinstance(old_class, PluginWorkerProxy):
+                old_class.close()
+            with self.load_lock:
+                self.unload_plugin_modules(plugin_info.plugin_dir)
+                entry = self.plugin_index.get_entry(plugin_info.plugin_dir)
+                if entry is None:
+                    raise RuntimeError(f"插件 [{plugin_info.info['name']}] 的清单已不存在")
+                main_class = self.import_plugin(plugin_info.plugin_dir, entry, Counter())
+                if main_class is None:
+                    raise RuntimeError(f"插件 [{plugin_info.info['name']}] 依赖安装失败")
+                main_class.config.load_values({**self.plugins_config.get(id_, {}), **old_class.config},
+                                              f"plugins.{id_}")
+                plugin_info.main_class = main_class
+                plugin_info.info = entry.manifest
+                plugin_info.loaded = True
+                self.plugin_file_owners.clear()
+            self.save_plugin_index()
+            if was_running:
+                self.set_plugin_state(plugin_info, PluginState.STARTING)
+                main_class.start()
+                main_class.enable = True
+            logger.info(f"插件 [{plugin_info.info['name']}] 已重载, 用时: {timer.endT()}")
+
+        def on_result(result: LifecycleResult):
+            if result.late:
+                return
+            running = plugin_info.main_class.enable
+            self.set_plugin_state(plugin_info, PluginState.RUNNING if running else PluginState.STOPPED)
+            if not result.ok:
+                logger.error(f"重载插件 [{plugin_info.info['name']}] 失败: {result.error}")
+            if callback is not None:
+                callback(result)
+
+        return self.lifecycle.submit(id_, "reload", reload, on_result, self.config.plugin_deadline * 2)
+
+    @staticmethod
+    def unload_plugin_modules(plugin_dir: str):
+        """从 sys.modules 中移除插件包及插件目录下的所有模块"""
+        package = f"plugins.{basename(plugin_dir)}"
+        plugin_dir = normcase(abspath(plugin_dir)) + os.sep
+        for name, module in list(sys.modules.items()):
+            fp = getattr(module, "__file__", None)
+            if name == package or name.startswith(package + ".") or \
+                    (fp and normcase(abspath(fp)).startswith(plugin_dir)):
+                del sys.modules[name]
+        invalidate_caches()
+
+    def update_plugin_watcher(self):
+        if not self.config.auto_reload_plugins:
+            self.plugin_watcher.stop()
+            return
+        for plugin_info in list(self.plugins.values()):
+            self.plugin_watcher.watch(plugin_info.id, plugin_info.plugin_dir)
+        self.plugin_watcher.start()
+
+    def on_plugin_files_changed(self, id_: str):
+        plugin_info = self.plugins.get(id_)
+        if plugin_info is None or not plugin_info.loaded:  # 未导入的插件下次导入时自然是新代码
+            return
+        logger.info(f"检测到插件 [{plugin_info.info['name']}] 文件变化, 自动重载")
+        self.reload_plugin(id_)
+
+    def invoke_plugin_button(self, id_: str, name: str):
+        main_class = self.ensure_plugin_loaded(id_)
+        type_cast(ButtonParam, main_class.config.params[name]).handler()
+
+    def update_plugin_schema(self, entry: PluginIndexEntry, main_class: BasePlugin):
+        try:
+            schema = json.loads(json.dumps(dump_schema(main_class.config.params), ensure_ascii=False))
+        except (TypeError, ValueError):
+            return
+        self.plugin_index.set_schema(entry, schema, schema_fingerprint(schema))
+
+    def save_plugin_index(self):
+        try:
+            self.plugin_index.save()
+        except OSError:
+            logger.warning("无法保存插件索引")
+
+    def resolve_all_requirements(self, dir_names: list[str]):
+        """在进程内检查所有插件的依赖, 把缺少的依赖合并为一次pip安装"""
+        pending: list[PluginIndexEntry] = []
+        missing: dict[str, None] = {}  # 保持顺序的去重
+        for dir_name in dir_names:
+            try:
+                entry = self.plugin_index.get_entry(join("plugins", dir_name))
+            except (OSError, ValueError, KeyError):
+                continue  # 清单错误由加载流程报告
+            if entry is None or self.plugin_index.is_requirements_ok(entry, executable):
+                continue
+            plugin_missing = self.req_resolver.missing(entry.manifest.get("requirements", {}))
+            if plugin_missing:
+                pending.append(entry)
+                missing.update(dict.fromkeys(plugin_missing))
+            else:
+                self.plugin_index.set_requirements_ok(entry, True, executable)
+        if not missing:
+            return
+        with self.req_lock:
+            self.install_requirements(list(missing))
+        for entry in pending:
+            if not self.req_resolver.missing(entry.manifest.get("requirements", {})):
+                self.plugin_index.set_requirements_ok(entry, True, executable)
+
+    def install_requirements(self, requirements: list[str]) -> bool:
+        finish = self.listener.on_requirements_installing(requirements)
+        try:
+            result = self.req_resolver.install(requirements, self.config.wheelhouse_dir)
+        finally:
+            finish()
+        if not result:
+            self.failed_requirements.update(requirements)
+            self.listener.show_error("错误", f"安装依赖 {', '.join(requirements)} 失败，请手动安装依赖后再次尝试")
+        return result
+
+    def file_owner(self, fp: str) -> str | None:
+        """根据源文件路径找到所属插件ID"""
+        if fp in self.plugin_file_owners:
+            return self.plugin_file_owners[fp]
+        norm_fp = normcase(abspath(fp))
+        owner = None
+        for plugin_info in list(self.plugins.values()):
+            if plugin_info.plugin_dir and norm_fp.startswith(normcase(abspath(plugin_info.plugin_dir)) + os.sep):
+                owner = plugin_info.id
+                break
+        self.plugin_file_owners[fp] = owner
+        return owner
+
+    def thread_owner(self, thread: Thread) -> str | None:
+        """根据线程函数 (及其绑定对象) 所在的模块文件找到线程所属插件ID"""
+        return self.modules_owner(thread_target_modules(thread))
+
+    def modules_owner(self, modules: Iterable[str]) -> str | None:
+        """根据模块所在的文件找到所属插件ID, 依次尝试每个模块"""
+        for module_name in modules:
+            fp = getattr(sys.modules.get(module_name), "__file__", None)
+            if fp and (owner := self.file_owner(fp)):
+                return owner
+        return None
+
+    def resource_sample_thread(self):
+        self.resource_sampler.enable_memory_trace(self.config.trace_plugin_memory)
+        while not self.has_exited:
+            interval = self.config.resource_sample_interval
+            if interval <= 0:
+                sleep(1)
+                continue
+            self.sample_plugin_resources()
+            sleep(interval)
+
+    def sample_plugin_resources(self):
+        self.resource_sampler.processes = {
+            plugin_info.id: plugin_info.main_class.process.pid for plugin_info in list(self.plugins.values())
+            if isinstance(plugin_info.main_class, PluginWorkerProxy) and plugin_info.main_class.process
+        }
+        try:
+            usages = self.resource_sampler.sample()
+        except Exception as e:
+            logger.warning(f"插件资源采样失败: {e.__class__.__name__}: {e}")
+            return
+        for plugin_info in list(self.plugins.values()):
+            plugin_info.resources = usages.get(plugin_info.id, ResourceUsage())
+        self.listener.on_resources_updated()
+
+    def plugin_metrics(self) -> Iterator[SourceItem]:
+        """性能面板中的插件CPU占用, 取最近一次资源采样的结果"""
+        for plugin_info in list(self.plugins.values()):
+            yield GAUGE, PLUGIN_CPU, plugin_info.info["name"], plugin_info.resources.cpu_percent
+
+    def dump_plugin_resources(self) -> str:
+        """立即采样一次, 并把每个插件的资源占用写入日志目录, 返回导出的文件路径"""
+        self.sample_plugin_resources()
+        lines = [f"插件资源占用 {datetime.now():%Y-%m-%d %H:%M:%S}", ""]
+        for plugin_info in self.plugins.values():
+            usage = plugin_info.resources
+            wakeups = "-" if usage.wakeups_per_min is None else f"{usage.wakeups_per_min:.0f}"
+            lines.append(f"[{plugin_info.id}] {plugin_info.info['name']} ({plugin_info.state.name})")
+            lines.append(f"    CPU: {usage.cpu_percent:.1f}% (累计 {usage.cpu_time:.2f}s) | 线程: {usage.threads} | "
+                         f"唤醒/分: {wakeups} | 内存: {format_bytes(usage.alloc_bytes)}")
+            if usage.thread_names:
+                lines.append(f"    线程列表: {', '.join(usage.thread_names)}")
+        fp = expandvars(f"%APPDATA%/WinEnchantKit/logs/resources_{datetime.now():%y%m%d_%H%M%S}.txt")
+        with open(fp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        logger.info(f"插件资源占用已导出: {fp}")
+        return fp
+
+    @staticmethod
+    def dump_trace() -> str:
+        """把性能追踪结果写入日志目录, 返回摘要文件路径"""
+        trace_fp, summary_fp = get_tracer().export()
+        logger.info(f"性能追踪已导出: {summary_fp}")
+        return summary_fp
+
+    def update_plugin_config(self, id_: str, config_dict: dict[str, Any]):
+        plugin_info = self.plugins[id_]
+        self.ensure_plugin_loaded(id_)
+        config = plugin_info.main_class.config
+        if config:
+            values, _ = config.schema.coerce(config_dict)  # 按转换后的值比较, 无效项由插件加载时记录
+            changed = diff_config(config, values)
+            if not changed:  # 没有变化时不通知插件, 避免无谓的重启
+                return
+            logger.debug(f"插件 [{plugin_info.info['name']}] 配置变化: {', '.join(changed)}")
+            plugin_info.main_class.update_config(config.copy(), config_dict)
+        self.save_config()
+
+    def start_plugin(self, id_: str, callback: Callable[[LifecycleResult], None] | None = None) \
+            -> LifecycleJob | None:
+        """在后台线程中启动插件, 插件已处于启动状态时返回None"""
+        plugin_info = self.plugins[id_]
+        if self.claim_state(plugin_info, (PluginState.STOPPED,), PluginState.STARTING) is None:
+            logger.warning(f"插件 [{plugin_info.info['name']}] 已处于启动状态")
+            return None
+        logger.info(f"启动插件: [{plugin_info.info['name']}]")
+
+        def start():
+            with startup_span(f"启动插件 {id_}"):
+                main_class = self.ensure_plugin_loaded(id_)
+                main_class.start()
+
+        def on_result(result: LifecycleResult):
+            if result.ok:
+                plugin_info.main_class.enable = True
+                self.set_plugin_state(plugin_info, PluginState.RUNNING)
+                logger.info(f"插件启动成功: [{plugin_info.info['name']}] ({result.elapsed * 1000:.0f} ms)")
+            elif not result.late:
+                self.set_plugin_state(plugin_info, PluginState.STOPPED)
+                logger.error(f"启动插件 [{plugin_info.info['name']}] 失败: {result.error}")
+            if callback is not None and not result.late:
+                callback(result)
+
+        return self.lifecycle.submit(id_, "start", start, on_result, self.config.plugin_deadline)
+
+    def stop_plugin(self, id_: str, callback: Callable[[LifecycleResult], None] | None = None,
+                    deadline: float | None = None) -> LifecycleJob | None:
+        """在后台线程中停止插件, 插件未在运行时返回None"""
+        plugin_info = self.plugins[id_]
+        if self.claim_state(plugin_info, (PluginState.RUNNING,), PluginState.STOPPING) is None:
+            logger.warning(f"插件 [{plugin_info.info['name']}] 已处于停止状态")
+            return None
+        logger.info(f"停止插件: [{plugin_info.info['name']}]")
+
+        def on_result(result: LifecycleResult):
+            if result.ok:
+                plugin_info.main_class.enable = False
+                self.set_plugin_state(plugin_info, PluginState.STOPPED)
+                logger.info(f"插件 [{plugin_info.info['name']}] 已停止 ({result.elapsed * 1000:.0f} ms)")
+            elif result.timed_out:  # 停止仍在进行, 不再阻止用户操作
+                self.set_plugin_state(plugin_info, PluginState.STOPPED)
+                logger.error(f"停止插件 [{plugin_info.info['name']}] 超时")
+            elif not result.late:
+                self.set_plugin_state(plugin_info, PluginState.RUNNING)
+                logger.error(f"停止插件 [{plugin_info.info['name']}] 失败: {result.error}")
+            if callback is not None and not result.late:
+                callback(result)
+
+        return self.lifecycle.submit(id_, "stop", plugin_info.main_class.stop, on_result,
+                                     self.config.plugin_deadline if deadline is None else deadline)
+
+    def set_plugin_state(self, plugin_info: PluginInfo, state: PluginState):
+        with self.state_lock:
+            plugin_info.state = state
+        self.listener.on_plugin_state_changed(plugin_info)
+
+    def claim_state(self, plugin_info: PluginInfo, allowed: tuple[PluginState, ...],
+                    state: PluginState) -> PluginState | None:
+        """当前状态在 allowed 中时改为 state 并返回原状态, 否则返回None; 检查与修改在同一把锁内完成"""
+        with self.state_lock:
+            last_state = plugin_info.state
+            if last_state not in allowed:
+                return None
+            plugin_info.state = state
+        self.listener.on_plugin_state_changed(plugin_info)
+        return last_state
+
+    def update_self_config(self, config: dict[str, Any]):
+        self.config.load_values(config, "WEK_config")
+        self.resource_sampler.enable_memory_trace(self.config.trace_plugin_memory)
+        self.config_store.set_split_plugins(self.config.split_plugin_config)
+        configure_log_rotation(self.config.log_max_file_mb, self.config.log_retention_days,
+                               self.config.log_retention_mb)
+        self.update_plugin_watcher()
+
+    def shutdown(self):
+        """保存配置并停止所有插件"""
+        if self.has_exited:
+            return
+        self.save_config(flush=True)
+        self.plugin_watcher.stop()
+        # 并行停止所有插件, 用时取决于最慢的插件
+        jobs = [self.stop_plugin(plugin_info.id, deadline=EXIT_STOP_DEADLINE) for plugin_info in self.plugins.values()
+                if plugin_info.state == PluginState.RUNNING]
+        self.lifecycle.wait_all([job for job in jobs if job is not None])
+        proxies = [info for info in self.plugins.values() if isinstance(info.main_class, PluginWorkerProxy)]
+        self.lifecycle.wait_all([
+            self.lifecycle.submit(info.id, "close", info.main_class.close, deadline=EXIT_STOP_DEADLINE)
+            for info in proxies
+        ])
+        self.has_exited = True
+
+    def save_config(self, flush: bool = False):
+        """提交当前配置, 只有变化的部分会在稍后写入; flush为True时立即写入"""
+        main_data = {
+            "first_run": self.first_run,
+            "WEK_config": self.config.copy(),
+            'auto_launch': list(self.auto_launch_plugins),
+            'isolated': list(self.isolated_plugins),
+        }
+        plugins_data = {}
+        for plugin_id, plugin_info in self.plugins.items():
+            if plugin_info.loaded:
+                values = plugin_info.main_class.config
+            else:  # 未导入的插件保留原有配置项, 且不把缓存结构中可能过时的默认值写入配置
+                placeholder = type_cast(LazyPlugin, plugin_info.main_class)
+                values = placeholder.user_values(self.plugins_config.get(plugin_id, {}))
+            prepare = {}
+            for key, value in values.items():
+                if type(value) in [str, int, float, bool, tuple, list, dict]:
+                    prepare[key] = value
+                if isinstance(value, Enum):
+                    prepare[key] = value.value
+            plugins_data[plugin_id] = prepare
+        self.config_store.update(main_data, plugins_data)
+        if flush:
+            self.config_store.flush()
+
+    def read_config(self):
+        try:
+            data = self.config_store.read()
+        except (OSError, ValueError):
+            logger.error("无法读取配置文件")
+            return
+        if data is None:
+            self.save_config()  # 创建空配置
+            return
+        self.first_run = data.get("first_run", self.first_run)
+        if data.get("WEK_config"):
+            self.update_self_config(data["WEK_config"])
+        self.auto_launch_plugins = data.get('auto_launch', [])
+        self.isolated_plugins = data.get('isolated', [])
+        # 加载插件配置
+        self.plugins_config = data.get('plugins', {})
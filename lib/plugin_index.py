@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass, asdict, field
+from os.path import join, basename
+from threading import Lock
+from typing import Any
+
+from lib.config_store import atomic_write
+from lib.env import APP_DATA_DIR
+
+INDEX_FILE = join(APP_DATA_DIR, "plugin_index.json")
+INDEX_VERSION = 2
+
+
+def hash_content(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+@dataclass
+class PluginIndexEntry:
+    dir_name: str
+    dir_mtime: int
+    manifest_mtime: int
+    manifest_hash: str
+    manifest: dict[str, Any]
+    module_path: str
+    module_mtime: int
+    schema_fingerprint: str | None = None
+    schema: dict[str, Any] | None = None
+    requirements_ok: bool | None = None
+    requirements_key: str = field(default="")
+
+
+class PluginIndex:
+    """
+    插件索引缓存
+    记录每个插件的清单、模块路径、配置结构指纹以及依赖检查结果,
+    以目录/清单/主模块的修改时间快速校验, 时间变化时再用清单内容哈希确认
+    """
+
+    def __init__(self, fp: str = INDEX_FILE):
+        self.fp = fp
+        self.lock = Lock()
+        self.entries: dict[str, PluginIndexEntry] = {}
+        self.root_mtime: int = -1
+        self.dir_names: list[str] = []
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.fp, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            self.root_mtime = data["root_mtime"]
+            self.dir_names = data["dir_names"]
+            self.entries = {name: PluginIndexEntry(**entry) for name, entry in data["entries"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.entries = {}
+            self.root_mtime = -1
+            self.dir_names = []
+
+    def save(self):
+        """在锁中写入, 并发保存时后写入的总是较新的内容; 写入失败时保持 dirty, 下次保存时重试"""
+        with self.lock:
+            if not self.dirty:
+                return
+            data = {
+                "version": INDEX_VERSION,
+                "root_mtime": self.root_mtime,
+                "dir_names": self.dir_names,
+                "entries": {name: asdict(entry) for name, entry in self.entries.items()},
+            }
+            os.makedirs(os.path.dirname(self.fp), exist_ok=True)
+            atomic_write(self.fp, json.dumps(data, ensure_ascii=False))
+            self.dirty = False
+
+    def list_dirs(self, root: str) -> list[str]:
+        """列出插件目录, 根目录未变化时直接使用缓存的列表"""
+        mtime = os.stat(root).st_mtime_ns
+        with self.lock:
+            if mtime == self.root_mtime:
+                return list(self.dir_names)
+        dir_names = sorted(os.listdir(root), key=str.lower)
+        with self.lock:
+            self.root_mtime = mtime
+            self.dir_names = dir_names
+            for name in set(self.entries) - set(dir_names):
+                self.entries.pop(name)
+            self.dirty = True
+        return list(dir_names)
+
+    def get_entry(self, plugin_dir: str) -> PluginIndexEntry | None:
+        """获取插件的索引项, 如果插件文件发生变化则重新读取清单, 清单不存在时返回None"""
+        dir_name = basename(plugin_dir)
+        manifest_fp = join(plugin_dir, "plugin.json")
+        try:
+            dir_mtime = os.stat(plugin_dir).st_mtime_ns
+            manifest_mtime = os.stat(manifest_fp).st_mtime_ns
+        except OSError:
+            return None
+        with self.lock:
+            entry = self.entries.get(dir_name)
+        module_mtime = self.module_mtime(plugin_dir, entry.manifest) if entry else -1
+        if entry and entry.dir_mtime == dir_mtime and entry.manifest_mtime == manifest_mtime \
+                and entry.module_mtime == module_mtime:
+            return entry
+
+        with open(manifest_fp, "rb") as f:
+            content = f.read()
+        manifest_hash = hash_content(content)
+        with self.lock:
+            if entry and entry.manifest_hash == manifest_hash:  # 仅修改时间变化, 内容不变
+                entry.dir_mtime = dir_mtime
+                entry.manifest_mtime = manifest_mtime
+                if entry.module_mtime != module_mtime:  # 主模块变化, 缓存的配置结构可能已过时
+                    entry.module_mtime = module_mtime
+                    entry.schema = entry.schema_fingerprint = None
+                self.dirty = True
+                return entry
+        manifest: dict[str, Any] = json.loads(content.decode("utf-8"))
+        module_path = f"plugins.{dir_name}.{manifest['main_file'].split('.')[0]}"
+        entry = PluginIndexEntry(dir_name, dir_mtime, manifest_mtime, manifest_hash, manifest, module_path,
+                                 self.module_mtime(plugin_dir, manifest))
+        with self.lock:
+            self.entries[dir_name] = entry
+            self.dirty = True
+        return entry
+
+    @staticmethod
+    def module_mtime(plugin_dir: str, manifest: dict[str, Any]) -> int:
+        try:
+            return os.stat(join(plugin_dir, manifest["main_file"])).st_mtime_ns
+        except (OSError, KeyError):
+            return -1
+
+    def is_requirements_ok(self, entry: PluginIndexEntry, key: str) -> bool:
+        """依赖检查结果只在检查条件 (如python环境) 相同时有效"""
+        return bool(entry.requirements_ok) and entry.requirements_key == key
+
+    def set_requirements_ok(self, entry: PluginIndexEntry, ok: bool, key: str):
+        with self.lock:
+            entry.requirements_ok = ok
+            entry.requirements_key = key
+            self.dirty = True
+
+    def set_schema(self, entry: PluginIndexEntry, schema: dict[str, Any], fingerprint: str):
+        with self.lock:
+            if entry.schema_fingerprint == fingerprint:
+                return
+            entry.schema = schema
+            entry.schema_fingerprint = fingerprint
+            self.dirty = True
@@ -0,0 +1,363 @@
+"""
+插件独立进程运行支持
+主进程中的 PluginWorkerProxy 代替插件对象, 把 start/stop/update_config/按钮调用 通过管道转发给子进程,
+子进程 (python -m lib.plugin_worker) 导入并运行真正的插件, 并把日志转发回主进程
+"""
+import logging
+import os
+import secrets
+import subprocess
+import sys
+import traceback
+from collections import deque
+from importlib import import_module
+from itertools import count
+from multiprocessing.connection import Client, Connection, Listener
+from threading import Event, Lock, Thread
+from time import perf_counter
+from typing import Any, cast as type_cast
+
+from base import *
+from lib.log_rotation import WORKER_ENV
+
+CALL_TIMEOUT = 15.0
+HELLO_TIMEOUT = 30.0
+RESTART_BACKOFF_MAX = 60.0
+STABLE_RUN_TIME = 60.0  # 运行超过该时间后崩溃, 重启延时从头计算
+STDERR_TAIL_LINES = 20  # 启动失败时附在错误信息中的标准错误输出行数
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+class PluginWorkerProxy(BasePlugin):
+    """在子进程中运行插件的代理对象"""
+
+    def __init__(self, plugin_dir: str, module_path: str, class_name: str, plugin_id: str,
+                 plugin_logger: logging.Logger, config_values: dict[str, Any] | None = None):
+        self.plugin_dir = plugin_dir
+        self.module_path = module_path
+        self.class_name = class_name
+        self.plugin_id = plugin_id
+        self.logger = plugin_logger
+
+        self.config = ModuleConfig({})
+        self.process: subprocess.Popen | None = None
+        self.conn: Connection | None = None
+        self.send_lock = Lock()
+        self.call_ids = count()
+        self.pending: dict[int, tuple[Event, list[Any]]] = {}
+        self.running = False  # 期望的运行状态, 崩溃重启时依据此值决定是否重新启动插件
+        self.closing = Event()
+        self.restart_attempts = 0
+        self.spawn_time = 0.0
+        self.stderr_tail: deque[str] = deque(maxlen=STDERR_TAIL_LINES)
+
+        self.spawn(config_values or {})
+
+    # ---- 进程管理 ----
+
+    def spawn(self, config_values: dict[str, Any]):
+        authkey = secrets.token_bytes(16)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "lib.plugin_worker", self.plugin_dir, self.module_path, self.class_name,
+             self.plugin_id],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=os.getcwd(),
+            env={**os.environ, WORKER_ENV: "1", "PYTHONIOENCODING": "utf-8"},
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+        # 连接管道前 (导入失败、解释器无法启动) 与进程崩溃时的输出只会出现在标准错误中
+        stderr_thread = Thread(target=self.stderr_thread_func, args=(self.process,), daemon=True,
+                               name=f"PluginWorkerStderr-{self.plugin_id}")
+        stderr_thread.start()
+        self.process.stdin.write(authkey.hex().encode("ascii") + b"\n")
+        self.process.stdin.close()
+        address = self.process.stdout.readline().decode("utf-8").strip()
+        if not address:
+            self.process.wait()
+            stderr_thread.join(timeout=1)
+            tail = "\n".join(self.stderr_tail)
+            raise WorkerError(f"插件进程启动失败 (退出码 {self.process.returncode})" + (f":\n{tail}" if tail else ""))
+        self.conn = Client(address, authkey=authkey)
+        self.conn.send(("init", config_values))
+        if not self.conn.poll(HELLO_TIMEOUT):
+            self.kill()
+            raise WorkerError("插件进程加载超时")
+        msg = self.conn.recv()
+        if msg[0] == "error":
+            self.kill()
+            raise WorkerError(f"插件进程加载失败:\n{msg[1]}")
+        _, schema, values = msg
+        self.apply_schema(schema, values)
+        self.spawn_time = perf_counter()
+        Thread(target=self.reader_thread_func, args=(self.conn,), daemon=True,
+               name=f"PluginWorkerReader-{self.plugin_id}").start()
+        self.logger.info(f"插件进程已启动 (PID: {self.process.pid})")
+
+    def apply_schema(self, schema: dict[str, Any], values: dict[str, Any]):
+        params = load_schema(schema)
+        for name, param in params.items():
+            if isinstance(param, ButtonParam):
+                param.handler = lambda n=name: self.call_async("button", n)
+        config = ModuleConfig(params)
+        config.load_values(values)
+        config.load_values(self.config)  # 重启时保留主进程中的最新配置
+        self.config = config
+
+    def kill(self):
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def close(self):
+        """关闭子进程, 不再自动重启"""
+        self.closing.set()
+        self.running = False
+        try:
+            self.call("exit", timeout=3)
+        except (WorkerError, TimeoutError):
+            pass
+        if self.process:
+            try:
+                self.process.wait(timeout=3)
+            except subprocess.TimeoutExpired:
+                self.kill()
+
+    def stderr_thread_func(self, process: subprocess.Popen):
+        self.stderr_tail.clear()
+        for line in process.stderr:
+            text = line.decode("utf-8", "replace").rstrip()
+            if text:
+                self.stderr_tail.append(text)
+                self.logger.error(f"[stderr] {text}")
+
+    def reader_thread_func(self, conn: Connection):
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            if msg[0] == "log":
+                record = logging.makeLogRecord(msg[1])
+                logging.getLogger(record.name).handle(record)
+            elif msg[0] == "result":
+                _, call_id, ok, value = msg
+                if pending := self.pending.pop(call_id, None):
+                    event, result = pending
+                    result.extend((ok, value))
+                    event.set()
+        for call_id in list(self.pending):
+            if pending := self.pending.pop(call_id, None):
+                event, result = pending
+                result.extend((False, "插件进程已退出"))
+                event.set()
+        if conn is not self.conn or self.closing.is_set():
+            return
+        try:
+            exit_code = self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            exit_code = None
+        self.logger.error(f"插件进程意外退出 (退出码 {exit_code})")
+        self.restart_thread_func()
+
+    def restart_thread_func(self):
+        if perf_counter() - self.spawn_time > STABLE_RUN_TIME:
+            self.restart_attempts = 0
+        while not self.closing.is_set():
+            delay = min(2 ** self.restart_attempts, RESTART_BACKOFF_MAX)
+            self.restart_attempts += 1
+            self.logger.info(f"{delay}s 后重启插件进程 (第{self.restart_attempts}次)")
+            if self.closing.wait(delay):
+                return
+            try:
+                self.spawn(dict(self.config))
+                if self.running:
+                    self.call("start")
+                return
+            except (WorkerError, TimeoutError, OSError) as e:
+                self.logger.error(f"重启插件进程失败: {e}")
+
+    # ---- 调用转发 ----
+
+    def send(self, msg: tuple):
+        with self.send_lock:
+            try:
+                self.conn.send(msg)
+            except (OSError, ValueError):
+                raise WorkerError("插件进程未运行")
+
+    def call(self, method: str, *args, timeout: float = CALL_TIMEOUT) -> Any:
+        call_id = next(self.call_ids)
+        event, result = Event(), []
+        self.pending[call_id] = (event, result)
+        try:
+            self.send(("call", call_id, method, args))
+            if not event.wait(timeout):
+                raise TimeoutError(f"插件进程调用 {method} 超时 ({timeout}s)")
+        finally:
+            self.pending.pop(call_id, None)
+        ok, value = result
+        if not ok:
+            raise WorkerError(value)
+        return value
+
+    def call_async(self, method: str, *args):
+        try:
+            self.send(("call", next(self.call_ids), method, args))
+        except WorkerError as e:
+            self.logger.error(f"调用 {method} 失败: {e}")
+
+    def start(self):
+        self.running = True
+        try:
+            self.call("start")
+        except (WorkerError, TimeoutError) as e:
+            self.running = False
+            if isinstance(e, TimeoutError):
+                self.kill()  # 卡死的进程直接结束
+            raise
+
+    def stop(self):
+        self.running = False
+        try:
+            self.call("stop")
+        except TimeoutError:
+            self.logger.warning("插件进程停止超时, 强制结束进程")
+            self.kill()
+
+    def update_config(self, old_config: dict[str, Any], new_config: dict[str, Any]):
+        self.config.load_values(new_config)
+        self.call("update_config", old_config, new_config)
+
+
+# ---- 子进程 ----
+
+class PipeLogHandler(logging.Handler):
+    def __init__(self, send):
+        super().__init__()
+        self.send = send
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            data = dict(record.__dict__)
+            data["msg"] = record.getMessage()
+            data["args"] = None
+            if record.exc_info:
+                data["msg"] += "\n" + "".join(traceback.format_exception(*record.exc_info))
+            data["exc_info"] = data["exc_text"] = None
+            self.send(("log", data))
+        except Exception:
+            self.handleError(record)
+
+
+class PipeStream:
+    """把子进程的 print 输出按行转发为日志"""
+
+    def __init__(self, log: logging.Logger, level: int):
+        self.log = log
+        self.level = level
+        self.buffer = ""
+
+    def write(self, text: str):
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            if line:
+                self.log.log(self.level, line)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def worker_main(plugin_dir: str, module_path: str, class_name: str, plugin_id: str):
+    authkey = bytes.fromhex(sys.stdin.readline().strip())
+    listener = Listener(authkey=authkey)
+    sys.stdout.write(str(listener.address) + "\n")
+    sys.stdout.flush()
+    conn = listener.accept()
+    listener.close()
+    send_lock = Lock()
+
+    def send(msg: tuple):
+        with send_lock:
+            conn.send(msg)
+
+    plugin_logger = logging.getLogger(f"WinEnchantKitLogger_{plugin_id}")
+    for log in (plugin_logger, logging.getLogger("WinEnchantKitLogger")):
+        log.handlers.clear()
+        log.addHandler(PipeLogHandler(send))
+        log.setLevel(logging.DEBUG)
+        log.propagate = False
+    sys.stdout = PipeStream(plugin_logger, logging.INFO)
+    sys.stderr = PipeStream(plugin_logger, logging.ERROR)
+
+    _, config_values = conn.recv()
+    try:
+        sys.path.append(plugin_dir)
+        module = import_module(module_path)
+        plugin: BasePlugin = getattr(module, class_name)()
+        plugin.config.load_values(config_values)
+        send(("hello", dump_schema(plugin.config.params), dict(plugin.config)))
+    except Exception:
+        send(("error", traceback.format_exc()))
+        return
+
+    wx = sys.modules.get("wx")
+    app = None
+    if wx is not None:  # 插件使用了wx (对话框、CallAfter等), 在主线程运行消息循环
+        app = wx.App(False)
+        app.SetExitOnFrameDelete(False)
+
+    def handle_call(method: str, args: tuple) -> Any:
+        if method == "start":
+            plugin.start()
+            plugin.enable = True
+        elif method == "stop":
+            plugin.stop()
+            plugin.enable = False
+        elif method == "update_config":
+            plugin.update_config(*args)
+        elif method == "button":
+            handler = type_cast(ButtonParam, plugin.config.params[args[0]]).handler
+            if app is not None:
+                wx.CallAfter(handler)
+            else:
+                handler()
+        elif method == "exit":
+            if plugin.enable:
+                plugin.stop()
+                plugin.enable = False
+        else:
+            raise ValueError(f"未知调用: {method}")
+
+    def command_loop():
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):  # 主进程已退出
+                break
+            _, call_id, method, args = msg
+            try:
+                send(("result", call_id, True, handle_call(method, args)))
+            except Exception as e:
+                plugin_logger.error(f"执行 {method} 出错: {e.__class__.__name__}: {e}")
+                send(("result", call_id, False, f"{e.__class__.__name__}: {e}"))
+            if method == "exit":
+                break
+        if app is not None:
+            wx.CallAfter(app.ExitMainLoop)
+
+    if app is not None:
+        Thread(target=command_loop, daemon=True).start()
+        app.MainLoop()
+    else:
+        command_loop()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    worker_main(*sys.argv[1:5])
@@ -0,0 +1,132 @@
+"""
+插件依赖解析
+通过 importlib.metadata 在进程内检查已安装的包, 只有确实缺少依赖时才调用一次 pip 批量安装
+"""
+import importlib
+import logging
+import os
+import re
+from importlib import metadata
+from subprocess import Popen
+from sys import executable
+from threading import Lock
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+SPEC_PATTERN = re.compile(r"\s*(===|==|!=|~=|>=|<=|>|<)\s*([^\s,;]+)")
+
+
+def normalize_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def version_tuple(version: str) -> tuple[int, ...]:
+    parts = []
+    for part in version.split("."):
+        match = re.match(r"\d+", part)
+        if match is None:
+            break
+        parts.append(int(match.group()))
+    return tuple(parts)
+
+
+def _simple_match(version: str, spec: str) -> bool:
+    """packaging不可用时的简易版本比较, 只比较数字部分"""
+    current = version_tuple(version)
+    for op, target in SPEC_PATTERN.findall(spec):
+        if target.endswith(".*"):
+            prefix = version_tuple(target[:-2])
+            ok = current[:len(prefix)] == prefix
+            if (op == "==") != ok:
+                return False
+            continue
+        wanted = version_tuple(target)
+        length = max(len(current), len(wanted))
+        a, b = current + (0,) * (length - len(current)), wanted + (0,) * (length - len(wanted))
+        if op == "~=":
+            ok = a >= b and a[:max(len(wanted) - 1, 1)] == b[:max(len(wanted) - 1, 1)]
+        else:
+            ok = {"===": a == b, "==": a == b, "!=": a != b, ">=": a >= b, "<=": a <= b, ">": a > b, "<": a < b}[op]
+        if not ok:
+            return False
+    return True
+
+
+def version_matches(version: str, spec: str) -> bool:
+    if not spec.strip():
+        return True
+    try:
+        from packaging.specifiers import SpecifierSet, InvalidSpecifier
+        from packaging.version import InvalidVersion
+    except ImportError:
+        return _simple_match(version, spec)
+    try:
+        return SpecifierSet(spec).contains(version, prereleases=True)
+    except (InvalidSpecifier, InvalidVersion):
+        return _simple_match(version, spec)
+
+
+def get_pip_python() -> str | None:
+    """获取可运行pip的解释器, pythonw使用同目录下的python, 非python解释器 (如打包程序) 返回None"""
+    exec_dir, exec_name = os.path.split(executable)
+    if exec_name.lower() == "pythonw.exe":
+        exec_name = "python.exe"
+    elif not exec_name.lower().startswith("python"):
+        return None
+    fp = os.path.join(exec_dir, exec_name)
+    return fp if os.path.isfile(fp) else None
+
+
+class RequirementResolver:
+    """检查插件清单中的 requirements (包名 -> 版本约束), 缓存已查询过的包版本"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.versions: dict[str, str | None] = {}
+
+    def refresh(self):
+        with self.lock:
+            self.versions.clear()
+        importlib.invalidate_caches()  # 让新安装的包可以被找到
+
+    def get_version(self, name: str) -> str | None:
+        key = normalize_name(name)
+        with self.lock:
+            if key in self.versions:
+                return self.versions[key]
+        try:
+            version = metadata.version(key)
+        except metadata.PackageNotFoundError:
+            version = None
+        with self.lock:
+            self.versions[key] = version
+        return version
+
+    def missing(self, requirements: dict[str, str]) -> list[str]:
+        """返回未满足的依赖 (pip需求字符串)"""
+        result = []
+        for name, spec in requirements.items():
+            version = self.get_version(name)
+            if version is None or not version_matches(version, spec or ""):
+                result.append(name + (spec or ""))
+        return result
+
+    def install(self, requirements: list[str], wheelhouse: str = "") -> bool:
+        """在一次pip调用中安装所有缺少的依赖, wheelhouse不为空时从本地目录离线安装"""
+        if not requirements:
+            return True
+        python = get_pip_python()
+        if python is None:
+            logger.error(f"当前环境无法使用pip, 请手动安装依赖: {', '.join(requirements)}")
+            return False
+        args = [python, "-m", "pip", "install", "--disable-pip-version-check"]
+        if wheelhouse:
+            args += ["--no-index", "--find-links", wheelhouse]
+        logger.info(f"安装依赖: {', '.join(requirements)}")
+        proc = Popen(args + requirements)
+        proc.wait()
+        self.refresh()
+        if proc.returncode != 0:
+            logger.error(f"安装依赖失败 (退出码 {proc.returncode})")
+            return False
+        return True
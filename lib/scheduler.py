@@ -0,0 +1,166 @@
+"""
+共享定时调度器
+插件注册周期/单次任务, 所有任务在同一个线程中按到期时间 (小顶堆) 执行,
+在容差范围内到期的任务会合并到同一次唤醒中执行, 以减少空闲时的线程与唤醒次数
+时钟可注入, 配合 run_pending 可以在测试中确定性地驱动调度
+"""
+import heapq
+import logging
+from itertools import count
+from threading import Condition, Event, Lock, Thread, get_ident
+from time import monotonic, thread_time
+from typing import Callable, Any
+
+from lib.metrics import get_metrics
+from lib.perf import callable_modules, get_shared_usage
+
+DEFAULT_TOLERANCE = 0.25  # 秒
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+
+class Job:
+    def __init__(self, scheduler: 'Scheduler', callback: Callable[[], Any], due: float,
+                 interval: float | None, tolerance: float, name: str):
+        self.scheduler = scheduler
+        self.callback = callback
+        self.due = due
+        self.interval = interval  # None为单次任务, 可在回调中修改以改变下一次的间隔
+        self.tolerance = tolerance
+        self.name = name
+        self.modules = callable_modules(callback)  # 用于把回调的CPU时间计入所属插件
+        self.cancelled = False
+        self.runs = 0
+        self.idle = Event()
+        self.idle.set()
+
+    def cancel(self, wait: bool = True):
+        """取消任务, wait为True时等待正在执行的回调结束 (在回调中取消自身不会等待)"""
+        self.scheduler.cancel(self)
+        if wait and get_ident() != self.scheduler.thread_id:
+            self.idle.wait()
+
+    def __repr__(self):
+        return f"Job({self.name!r}, due={self.due:.3f}, interval={self.interval})"
+
+
+class Scheduler:
+    def __init__(self, clock: Callable[[], float] = monotonic, tolerance: float = DEFAULT_TOLERANCE):
+        self.clock = clock
+        self.tolerance = tolerance
+        self.cond = Condition()
+        self.heap: list[tuple[float, int, Job]] = []
+        self.seq = count()
+        self.thread: Thread | None = None
+        self.thread_id: int | None = None
+        self.running = False
+        self.wakeups = 0
+
+    def call_later(self, delay: float, callback: Callable[[], Any], name: str = "",
+                   tolerance: float | None = None) -> Job:
+        return self.add_job(callback, delay, None, tolerance, name)
+
+    def call_every(self, interval: float, callback: Callable[[], Any], first_delay: float | None = None,
+                   name: str = "", tolerance: float | None = None) -> Job:
+        return self.add_job(callback, interval if first_delay is None else first_delay, interval, tolerance, name)
+
+    def add_job(self, callback: Callable[[], Any], delay: float, interval: float | None,
+                tolerance: float | None, name: str) -> Job:
+        job = Job(self, callback, self.clock() + delay, interval, self.tolerance if tolerance is None else tolerance,
+                  name or getattr(callback, "__qualname__", repr(callback)))
+        with self.cond:
+            heapq.heappush(self.heap, (job.due, next(self.seq), job))
+            self.cond.notify()
+        return job
+
+    def cancel(self, job: Job):
+        with self.cond:
+            job.cancelled = True  # 堆中的项在到期时丢弃
+            self.cond.notify()
+
+    def next_due(self) -> float | None:
+        with self.cond:
+            while self.heap and self.heap[0][2].cancelled:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def run_pending(self) -> int:
+        """执行所有已到期或在容差范围内即将到期的任务, 返回执行的任务数"""
+        now = self.clock()
+        jobs = []
+        with self.cond:
+            while self.heap:
+                due, _, job = self.heap[0]
+                if job.cancelled:
+                    heapq.heappop(self.heap)
+                    continue
+                if due > now + job.tolerance:
+                    break
+                heapq.heappop(self.heap)
+                job.idle.clear()
+                jobs.append(job)
+        if jobs:
+            self.wakeups += 1
+        shared_usage = get_shared_usage()
+        for job in jobs:
+            start = thread_time()
+            try:
+                if not job.cancelled:
+                    job.runs += 1
+                    job.callback()
+            except Exception as e:
+                logger.error(f"定时任务 {job.name} 出错: {e.__class__.__name__}: {e}")
+            finally:
+                shared_usage.add(job.modules, thread_time() - start)
+                with self.cond:
+                    if job.interval is not None and not job.cancelled:
+                        # 按计划时间推进, 落后太多时从当前时间重新计算, 避免连续补跑
+                        job.due = max(job.due + job.interval, self.clock())
+                        heapq.heappush(self.heap, (job.due, next(self.seq), job))
+                    job.idle.set()
+        return len(jobs)
+
+    def start(self):
+        with self.cond:
+            if self.running:
+                return
+            self.running = True
+        self.thread = Thread(target=self.run, daemon=True, name="Scheduler")
+        self.thread.start()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread is not None and self.thread.ident != get_ident():
+            self.thread.join()
+        self.thread = None
+
+    def run(self):
+        self.thread_id = get_ident()
+        while True:
+            with self.cond:
+                if not self.running:
+                    break
+                due = self.next_due()
+                timeout = None if due is None else due - self.clock()
+                if timeout is None or timeout > 0:
+                    self.cond.wait(timeout)
+                    continue  # 被唤醒或超时后重新计算 (可能有新任务或任务被取消)
+            self.run_pending()
+        self.thread_id = None
+
+
+_scheduler: Scheduler | None = None
+_scheduler_lock = Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """获取进程共享的调度器, 首次获取时启动调度线程"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+            _scheduler.start()
+            get_metrics().gauge("调度器任务", lambda: len(_scheduler.heap))
+        return _scheduler
@@ -0,0 +1,150 @@
+"""
+启动性能分析 (-profile-startup)
+记录启动各阶段与每个模块的导入用时 (嵌套), 插件自动启动完成后
+在日志目录写出 Chrome trace (startup_*.json) 与文本摘要 (startup_*.txt)
+未启用时 startup_span 返回空上下文, 几乎没有开销
+"""
+import importlib.abc
+import json
+import logging
+import sys
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from os.path import expandvars
+from typing import Any, ContextManager
+
+from lib.perf import Counter
+
+IMPORT_SUMMARY_LIMIT = 30
+TREE_MIN_DURATION = 0.001  # 文本摘要的树中省略短于该时间的导入
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader: Any, counter: Counter):
+        self.loader = loader
+        self.counter = counter
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self.counter.span(module.__name__, "import"):
+            try:
+                self.loader.exec_module(module)
+            finally:  # 还原加载器, 模块之后的行为与未启用分析时一致
+                if getattr(module, "__loader__", None) is self:
+                    module.__loader__ = self.loader
+                if getattr(module, "__spec__", None) is not None and module.__spec__.loader is self:
+                    module.__spec__.loader = self.loader
+
+    def __getattr__(self, item):
+        return getattr(self.loader, item)
+
+
+class ImportTimer(importlib.abc.MetaPathFinder):
+    """包装其他查找器返回的加载器, 为每个模块的执行记录一个 import 时间段"""
+
+    def __init__(self, counter: Counter):
+        self.counter = counter
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self.counter)
+                return spec
+        return None
+
+    def install(self):
+        sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.counter = Counter()
+        self.import_timer = ImportTimer(self.counter)
+        self.finished = False
+        self.lock = threading.Lock()
+
+    def span(self, name: str) -> ContextManager[None]:
+        return self.counter.span(name)
+
+    def finish(self) -> tuple[str, str] | None:
+        """停止记录并写出结果, 返回 (trace路径, 摘要路径)"""
+        with self.lock:
+            if self.finished:
+                return None
+            self.finished = True
+        self.import_timer.uninstall()
+        name = f"startup_{datetime.now():%y%m%d_%H%M%S}"
+        trace_fp = expandvars(f"%APPDATA%/WinEnchantKit/logs/{name}.json")
+        summary_fp = expandvars(f"%APPDATA%/WinEnchantKit/logs/{name}.txt")
+        try:
+            with open(trace_fp, "w", encoding="utf-8") as f:
+                json.dump(self.counter.to_chrome_trace(), f, ensure_ascii=False)
+            with open(summary_fp, "w", encoding="utf-8") as f:
+                f.write(self.format_summary())
+        except OSError as e:
+            logger.error(f"无法写出启动分析结果: {e.__class__.__name__}: {e}")
+            return None
+        logger.info(f"启动分析结果已写出: {summary_fp}")
+        return trace_fp, summary_fp
+
+    def format_summary(self) -> str:
+        tree = self.counter.span_tree()
+        total = max((span.end for span in self.counter.spans), default=self.counter.origin) - self.counter.origin
+        lines = [f"启动分析 {datetime.now():%Y-%m-%d %H:%M:%S}", f"总用时: {total * 1000:.1f} ms", "", "== 阶段 =="]
+        thread = None
+        for span, self_time in tree:
+            if span.category == "import" and span.duration < TREE_MIN_DURATION:
+                continue
+            if (span.thread_id, span.thread_name) != thread:
+                thread = (span.thread_id, span.thread_name)
+                lines.append(f"-- 线程 {span.thread_name} --")
+            prefix = "  " * span.depth + ("import " if span.category == "import" else "")
+            lines.append(f"{(span.start - self.counter.origin) * 1000:9.1f} ms  {span.duration * 1000:9.1f} ms  "
+                         f"(自身 {self_time * 1000:7.1f} ms)  {prefix}{span.name}")
+        imports = sorted(((span, self_time) for span, self_time in tree if span.category == "import"),
+                         key=lambda item: item[1], reverse=True)
+        lines += ["", f"== 导入自身用时前 {IMPORT_SUMMARY_LIMIT} (共 {len(imports)} 个模块, "
+                      f"合计 {sum(self_time for _, self_time in imports) * 1000:.1f} ms) =="]
+        for span, self_time in imports[:IMPORT_SUMMARY_LIMIT]:
+            lines.append(f"{self_time * 1000:9.1f} ms  (累计 {span.duration * 1000:9.1f} ms)  {span.name}")
+        return "\n".join(lines) + "\n"
+
+
+_profiler: StartupProfiler | None = None
+
+
+def enable_startup_profile() -> StartupProfiler:
+    global _profiler
+    if _profiler is None:
+        _profiler = StartupProfiler()
+        _profiler.import_timer.install()
+    return _profiler
+
+
+def get_startup_profiler() -> StartupProfiler | None:
+    return _profiler
+
+
+def startup_span(name: str) -> ContextManager[None]:
+    """启动分析的阶段, 未启用或分析已结束时不记录"""
+    if _profiler is None or _profiler.finished:
+        return nullcontext()
+    return _profiler.span(name)
+
+
+def finish_startup_profile():
+    if _profiler is not None:
+        _profiler.finish()
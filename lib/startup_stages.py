@@ -0,0 +1,85 @@
+"""
+分阶段自动启动
+插件在 plugin.json 中用 startup_stage 声明启动阶段 (默认1):
+0 为加载完成后立即启动 (如需要捕获开机自启窗口的插件), 1 在 auto_startup_wait_time 后启动,
+2 及之后的阶段依次等待系统空闲 (CPU与磁盘负载低于阈值) 或达到最长等待时间后再启动
+"""
+import logging
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Any, Callable
+
+DEFAULT_STARTUP_STAGE = 1
+IDLE_GATED_STAGE = 2  # 从该阶段开始等待系统空闲
+LOAD_SAMPLE_INTERVAL = 1.0  # 秒
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+
+@dataclass
+class SystemLoad:
+    cpu_percent: float
+    disk_mb_per_sec: float
+
+    def __str__(self):
+        return f"CPU {self.cpu_percent:.0f}%, 磁盘 {self.disk_mb_per_sec:.1f} MB/s"
+
+
+@dataclass
+class IdleWaitResult:
+    waited: float
+    idle: bool  # False 表示达到最长等待时间
+    load: SystemLoad | None = None
+
+
+class SystemLoadSampler:
+    """通过 psutil 采样整机负载, psutil 不可用时总是视为空闲"""
+
+    def __init__(self):
+        try:
+            import psutil
+        except ImportError:
+            psutil = None
+        self.psutil = psutil
+
+    def disk_bytes(self) -> int:
+        counters = self.psutil.disk_io_counters()
+        return 0 if counters is None else counters.read_bytes + counters.write_bytes
+
+    def sample(self, interval: float) -> SystemLoad | None:
+        """阻塞 interval 秒, 返回这段时间内的平均负载"""
+        if self.psutil is None:
+            return None
+        start, disk_start = perf_counter(), self.disk_bytes()
+        cpu = self.psutil.cpu_percent(interval=interval)
+        elapsed = max(perf_counter() - start, 1e-3)
+        return SystemLoad(cpu, (self.disk_bytes() - disk_start) / elapsed / 1024 / 1024)
+
+
+def get_startup_stage(manifest: dict[str, Any]) -> int:
+    stage = manifest.get("startup_stage", DEFAULT_STARTUP_STAGE)
+    try:
+        return max(int(stage), 0)
+    except (TypeError, ValueError):
+        logger.warning(f"插件 [{manifest.get('id')}] 的 startup_stage 无效: {stage!r}")
+        return DEFAULT_STARTUP_STAGE
+
+
+def group_by_stage(plugin_ids: list[str], stage_of: Callable[[str], int]) -> list[tuple[int, list[str]]]:
+    """按阶段分组, 阶段内保持原有顺序"""
+    stages: dict[int, list[str]] = {}
+    for plugin_id in plugin_ids:
+        stages.setdefault(stage_of(plugin_id), []).append(plugin_id)
+    return sorted(stages.items())
+
+
+def wait_for_idle(sampler: SystemLoadSampler, cpu_threshold: float, disk_threshold: float,
+                  max_delay: float) -> IdleWaitResult:
+    """等待CPU (%) 与磁盘 (MB/s) 负载同时低于阈值, 最多等待 max_delay 秒"""
+    start = perf_counter()
+    load = None
+    while (remaining := max_delay - (perf_counter() - start)) > 0:
+        load = sampler.sample(min(LOAD_SAMPLE_INTERVAL, remaining))
+        if load is None or (load.cpu_percent < cpu_threshold and load.disk_mb_per_sec < disk_threshold):
+            return IdleWaitResult(perf_counter() - start, True, load)
+    return IdleWaitResult(perf_counter() - start, False, load)
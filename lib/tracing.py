@@ -0,0 +1,195 @@
+"""
+热点路径追踪
+以 span (上下文管理器) 或 trace (装饰器) 标记代码段, 每个名称累计一个固定分桶的耗时直方图 (p50/p95/p99),
+最近的时间段保存在有界队列中, 可导出为 Chrome trace 与文本摘要; 嵌套层级按线程分别计算
+每次记录只有一次计时、一次分桶查找和一次无竞争的加锁, 可以在正式环境中一直开启
+"""
+import json
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from functools import wraps
+from os.path import expandvars, join
+from threading import current_thread
+from time import perf_counter
+from typing import Callable, TypeVar
+
+from lib.perf import Counter, Span, chrome_trace
+
+MAX_SPANS = 20000  # 保留用于导出 Chrome trace 的最近时间段数量
+BUCKET_MIN = 1e-6  # 秒, 第一个分桶的上界
+BUCKET_FACTOR = 2 ** 0.25  # 相邻分桶上界之比, 百分位误差不超过约19%
+BUCKET_COUNT = 108  # 覆盖 1 微秒 ~ 约 110 秒
+BUCKET_BOUNDS = [BUCKET_MIN * BUCKET_FACTOR ** i for i in range(BUCKET_COUNT)]
+
+_F = TypeVar("_F", bound=Callable)
+
+
+class LatencyHistogram:
+    """固定分桶的耗时直方图, 百分位取所在分桶的上界 (不超过最大值)"""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (BUCKET_COUNT + 1)  # 最后一个分桶存放超出上界的记录
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect_right(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = self.count * p / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKET_BOUNDS[index], self.max) if index < BUCKET_COUNT else self.max
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def copy(self) -> "LatencyHistogram":
+        histogram = LatencyHistogram()
+        histogram.counts = self.counts.copy()
+        histogram.count, histogram.total, histogram.max = self.count, self.total, self.max
+        return histogram
+
+    def delta(self, previous: "LatencyHistogram | None") -> "LatencyHistogram":
+        """两次快照之间新增的记录, 最大值沿用累计的最大值"""
+        if previous is None:
+            return self.copy()
+        histogram = LatencyHistogram()
+        histogram.counts = [now - last for now, last in zip(self.counts, previous.counts)]
+        histogram.count, histogram.total, histogram.max = (self.count - previous.count,
+                                                           self.total - previous.total, self.max)
+        return histogram
+
+
+class TraceSpan:
+    """Tracer.span 返回的上下文管理器, 比 contextmanager 生成器开销更小"""
+    __slots__ = ("tracer", "name", "category", "start", "depth")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        local = self.tracer.span_stacks.__dict__
+        self.depth = local.get("depth", 0)
+        local["depth"] = self.depth + 1
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        end = perf_counter()
+        self.tracer.span_stacks.__dict__["depth"] = self.depth
+        self.tracer.add(self.name, self.category, self.start, end, self.depth)
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer(Counter):
+    def __init__(self, max_spans: int = MAX_SPANS):
+        super().__init__()
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.enabled = True
+
+    def span(self, name: str, category: str = "trace") -> TraceSpan | NullSpan:
+        return TraceSpan(self, name, category) if self.enabled else NULL_SPAN
+
+    def trace(self, name: str | None = None, category: str = "trace") -> Callable[[_F], _F]:
+        """装饰器, 名称默认为函数的 模块.限定名"""
+
+        def decorator(func: _F) -> _F:
+            span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with TraceSpan(self, span_name, category):
+                    return func(*args, **kwargs)
+
+            return wrapper  # type: ignore[return-value]
+
+        return decorator
+
+    def add(self, name: str, category: str, start: float, end: float, depth: int):
+        thread = current_thread()
+        span = Span(name, category, start, end, depth, thread.ident, thread.name)
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(end - start)
+            self.spans.append(span)
+
+    def snapshot_histograms(self) -> dict[str, LatencyHistogram]:
+        with self.lock:
+            return {name: histogram.copy() for name, histogram in self.histograms.items()}
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.spans.clear()
+
+    def format_summary(self) -> str:
+        histograms = sorted(self.snapshot_histograms().items(), key=lambda item: item[1].total, reverse=True)
+        lines = [f"性能追踪 {datetime.now():%Y-%m-%d %H:%M:%S}", "",
+                 f"{'次数':>8} {'合计(ms)':>10} {'平均':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'最大':>8}  名称"]
+        for name, h in histograms:
+            lines.append(f"{h.count:>8} {h.total * 1000:>10.1f} {h.mean * 1000:>8.3f} "
+                         f"{h.percentile(50) * 1000:>8.3f} {h.percentile(95) * 1000:>8.3f} "
+                         f"{h.percentile(99) * 1000:>8.3f} {h.max * 1000:>8.3f}  {name}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: str | None = None) -> tuple[str, str]:
+        """写出 Chrome trace 与文本摘要 (默认写入日志目录), 返回 (trace路径, 摘要路径)"""
+        directory = directory or expandvars("%APPDATA%/WinEnchantKit/logs")
+        name = f"trace_{datetime.now():%y%m%d_%H%M%S}"
+        trace_fp, summary_fp = join(directory, f"{name}.json"), join(directory, f"{name}.txt")
+        with open(trace_fp, "w", encoding="utf-8") as f:
+            json.dump(chrome_trace(self.snapshot_spans(), self.origin), f, ensure_ascii=False)
+        with open(summary_fp, "w", encoding="utf-8") as f:
+            f.write(self.format_summary())
+        return trace_fp, summary_fp
+
+
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def span(name: str, category: str = "trace") -> TraceSpan | NullSpan:
+    return get_tracer().span(name, category)
+
+
+def trace(name: str | None = None, category: str = "trace") -> Callable[[_F], _F]:
+    return get_tracer().trace(name, category)
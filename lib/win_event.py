@@ -0,0 +1,215 @@
+"""
+WinEvent 分发
+所有插件共享一个事件源 (一个钩子线程), 插件按 事件类型/idObject/窗口类名/进程名 订阅,
+事件只会分发给匹配的订阅者; 窗口类名与进程名只在有订阅者需要时才查询, 且每个事件最多查询一次
+本模块不依赖win32, 可以在其他平台上配合 FakeEventSource 测试分发性能
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from threading import Lock
+from time import thread_time
+from typing import Callable, Iterable, Protocol
+
+from lib.perf import callable_modules, get_shared_usage
+
+logger = logging.getLogger("WinEnchantKitLogger")
+
+OBJID_WINDOW = 0
+
+
+@dataclass
+class WinEvent:
+    event: int
+    hwnd: int
+    id_object: int = OBJID_WINDOW
+    id_child: int = 0
+    thread_id: int = 0
+    time: int = 0
+
+
+class EventSource(Protocol):
+    def start(self, event_min: int, event_max: int, dispatch: Callable[[WinEvent], None],
+              on_error: Callable[[], None]) -> bool:
+        """启动失败返回False; 启动后意外停止时调用 on_error"""
+
+    def update(self, event_min: int, event_max: int) -> bool:
+        """修改监听范围, 不停止事件源, 修改期间不丢失事件; 事件源已停止时返回False"""
+
+    def stop(self): ...
+
+
+@dataclass(eq=False)
+class Subscription:
+    callback: Callable[[WinEvent], None]
+    events: frozenset[int]
+    id_object: int | None = OBJID_WINDOW
+    class_name: str | re.Pattern | None = None  # 字符串为完全匹配
+    process_name: str | re.Pattern | None = None  # 字符串为不区分大小写的完全匹配
+    name: str = ""  # 显示在性能面板中
+    calls: int = field(default=0)
+    modules: tuple[str, ...] = ()  # 回调所属的模块, 用于把回调的CPU时间计入所属插件
+
+    def __post_init__(self):
+        self.modules = callable_modules(self.callback)
+
+    @staticmethod
+    def match_text(rule: str | re.Pattern, text: str | None, ignore_case: bool = False) -> bool:
+        if text is None:
+            return False
+        if isinstance(rule, re.Pattern):
+            return rule.search(text) is not None
+        return rule.lower() == text.lower() if ignore_case else rule == text
+
+
+class WinEventDispatcher:
+    """
+    事件分发器, 有订阅者时启动事件源, 监听范围覆盖所有订阅的事件类型 (范围变化时原地修改, 不重启事件源),
+    没有订阅者时停止事件源
+    class_name_of / process_name_of: 窗口句柄 -> 类名/进程名, 查询失败返回None
+    """
+
+    def __init__(self, source: EventSource,
+                 class_name_of: Callable[[int], str | None] = lambda _: None,
+                 process_name_of: Callable[[int], str | None] = lambda _: None):
+        self.source = source
+        self.class_name_of = class_name_of
+        self.process_name_of = process_name_of
+        self.lock = Lock()
+        self.source_lock = Lock()  # 同一时间只有一个线程操作事件源
+        self.by_event: dict[int, tuple[Subscription, ...]] = {}  # 分发时只读, 修改时整体替换
+        self.subscriptions: list[Subscription] = []
+        self.wanted_range: tuple[int, int] | None = None  # 订阅需要的监听范围
+        self.event_range: tuple[int, int] | None = None  # 事件源实际的监听范围
+        self.received = 0
+        self.dispatched = 0
+
+    def subscribe(self, callback: Callable[[WinEvent], None], events: int | Iterable[int],
+                  id_object: int | None = OBJID_WINDOW, class_name: str | re.Pattern | None = None,
+                  process_name: str | re.Pattern | None = None, name: str = "") -> Subscription:
+        events = frozenset([events] if isinstance(events, int) else events)
+        subscription = Subscription(callback, events, id_object, class_name, process_name, name)
+        with self.lock:
+            self.subscriptions.append(subscription)
+            self.rebuild()
+        self.sync_source()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            if subscription not in self.subscriptions:
+                return
+            self.subscriptions.remove(subscription)
+            self.rebuild()
+        self.sync_source()
+
+    def rebuild(self):
+        """在 self.lock 中调用, 重建分发表并计算需要的监听范围"""
+        by_event: dict[int, list[Subscription]] = {}
+        for subscription in self.subscriptions:
+            for event in subscription.events:
+                by_event.setdefault(event, []).append(subscription)
+        self.by_event = {event: tuple(subs) for event, subs in by_event.items()}
+        self.wanted_range = (min(by_event), max(by_event)) if by_event else None
+
+    def sync_source(self):
+        """
+        在 self.lock 外操作事件源 (启动/停止会等待钩子线程, 不能阻塞订阅与回调);
+        事件源正被其他线程操作时直接返回, 由该线程完成后按最新的订阅再同步一次
+        """
+        while self.source_lock.acquire(blocking=False):
+            try:
+                with self.lock:
+                    wanted, current = self.wanted_range, self.event_range
+                if wanted != current:
+                    applied = self.apply_range(wanted, current)
+                    with self.lock:
+                        self.event_range = applied
+            finally:
+                self.source_lock.release()
+            with self.lock:
+                if self.wanted_range == wanted:
+                    return
+
+    def apply_range(self, wanted: tuple[int, int] | None, current: tuple[int, int] | None) -> tuple[int, int] | None:
+        """返回事件源实际的监听范围, 启动失败时为None, 下次订阅变化时重试"""
+        if wanted is None:
+            self.source.stop()
+            return None
+        if current is not None:
+            if self.source.update(*wanted):
+                return wanted
+            self.source.stop()  # 事件源已意外停止, 重新启动
+        return wanted if self.source.start(*wanted, self.dispatch, self.source_failed) else None
+
+    def source_failed(self):
+        """事件源意外停止, 下次订阅变化时重新启动"""
+        with self.lock:
+            self.event_range = None
+
+    def dispatch(self, event: WinEvent):
+        self.received += 1
+        subscriptions = self.by_event.get(event.event)
+        if not subscriptions:
+            return
+        class_name = process_name = None
+        class_name_done = process_name_done = False
+        for subscription in subscriptions:
+            if subscription.id_object is not None and subscription.id_object != event.id_object:
+                continue
+            if subscription.class_name is not None:
+                if not class_name_done:
+                    class_name, class_name_done = self.class_name_of(event.hwnd), True
+                if not Subscription.match_text(subscription.class_name, class_name):
+                    continue
+            if subscription.process_name is not None:
+                if not process_name_done:
+                    process_name, process_name_done = self.process_name_of(event.hwnd), True
+                if not Subscription.match_text(subscription.process_name, process_name, ignore_case=True):
+                    continue
+            subscription.calls += 1
+            self.dispatched += 1
+            start = thread_time()
+            try:
+                subscription.callback(event)
+            except Exception as e:
+                logger.error(f"WinEvent回调出错: {e.__class__.__name__}: {e}")
+            get_shared_usage().add(subscription.modules, thread_time() - start)
+
+
+class FakeEventSource:
+    """用于测试/基准测试的事件源, 由调用方通过 emit 或 replay 同步推送事件"""
+
+    def __init__(self):
+        self.dispatch: Callable[[WinEvent], None] | None = None
+        self.event_range: tuple[int, int] | None = None
+        self.starts = 0
+
+    def start(self, event_min: int, event_max: int, dispatch: Callable[[WinEvent], None],
+              on_error: Callable[[], None] | None = None) -> bool:
+        self.event_range = (event_min, event_max)
+        self.dispatch = dispatch
+        self.starts += 1
+        return True
+
+    def update(self, event_min: int, event_max: int) -> bool:
+        if self.dispatch is None:
+            return False
+        self.event_range = (event_min, event_max)
+        return True
+
+    def stop(self):
+        self.event_range = None
+        self.dispatch = None
+
+    def emit(self, event: WinEvent):
+        # 与真实钩子一致, 只投递监听范围内的事件
+        if self.dispatch is not None and self.event_range[0] <= event.event <= self.event_range[1]:
+            self.dispatch(event)
+
+    def replay(self, events: Iterable[WinEvent]) -> int:
+        count = 0
+        for event in events:
+            self.emit(event)
+            count += 1
+        return count
@@ -1,15 +1,27 @@
 import ctypes
+import logging
+import re
 from ctypes.wintypes import *
-from threading import Thread
-from typing import Callable
+from threading import Thread, Lock, Event, current_thread, get_native_id
+from time import monotonic
+from typing import Callable, Iterator
 import win32con as con
 import win32gui
+import win32process
 from ctypes import POINTER
 import faulthandler
+from win32.lib import pywintypes
+
+from lib.metrics import COUNTER, EVENTS, SourceItem, get_metrics
+from lib.tracing import get_tracer
+from lib.win_event import WinEvent, WinEventDispatcher, Subscription
 
 
 faulthandler.enable()
 
+PROCESS_NAME_TTL = 10.0  # 秒
+PROCESS_NAME_CACHE_SIZE = 512
+
 HANDLE = ctypes.c_void_p
 LONG = ctypes.c_long
 HWINEVENTHOOK = HANDLE
@@ -30,11 +42,18 @@ CoInitialize.argtypes = [POINTER(ctypes.HRESULT)]
 CoInitialize.restype = ctypes.HRESULT
 CoUninitialize = ctypes.windll.ole32.CoUninitialize
 CoUninitialize.argtypes = []
+PeekMessage = ctypes.windll.user32.PeekMessageW
+PeekMessage.argtypes = [POINTER(MSG), HWND, UINT, UINT, UINT]
+PeekMessage.restype = BOOL
+PM_NOREMOVE = 0
+WM_UPDATE_RANGE = con.WM_APP + 1  # 钩子线程的消息: 按 pending_range 重新注册钩子
+HOOK_READY_TIMEOUT = 5.0  # 秒
 
+logger = logging.getLogger("WinEnchantKitLogger")
 
 
-def register_hook(type_: int, proc: WINEVENTPROC):
-    return SetWinEventHook(type_, type_,
+def register_hook(type_: int, proc: WINEVENTPROC, type_max: int | None = None):
+    return SetWinEventHook(type_, type_ if type_max is None else type_max,
                            None, proc,
                            0, 0,
                            con.WINEVENT_OUTOFCONTEXT | con.WINEVENT_SKIPOWNPROCESS)
@@ -44,45 +63,197 @@ def unregister_hook(hhook: int):
     ctypes.windll.user32.UnhookWinEvent(hhook)
 
 
-class WindowWatcher:
-    def __init__(self, event_type: int, proc: Callable[[int], None]):
-        self.hhook = None
-        self.event_type = event_type
-        self.proc = proc
-        self.thread:  Thread | None = None
-        self.proc_type = WINEVENTPROC
+class WinEventHookSource:
+    """
+    在单独的线程中注册一个覆盖 [event_min, event_max] 的钩子并运行消息循环
+    修改范围时由钩子线程先注册新钩子再注销旧钩子, 只分发当前钩子的事件, 因此不会丢失或重复
+    """
 
-    def start(self):
-        self.thread = Thread(target=self.run, daemon=True)
-        self.thread.start()
+    def __init__(self):
+        self.thread: Thread | None = None
+        self.thread_id = 0
+        self.ready = Event()
+        self.dispatch: Callable[[WinEvent], None] | None = None
+        self.on_error: Callable[[], None] | None = None
+        self.hhook = None
+        self.pending_range: tuple[int, int] | None = None
+        self.proc = WINEVENTPROC(self.proc_warp)  # 需保持引用, 防止回调被回收
 
     def proc_warp(self,
                   h_win_event_hook: HWINEVENTHOOK,
                   event: DWORD, hwnd: int,
                   id_object: LONG, id_child: LONG,
                   dw_event_thread: DWORD, dw_ms_event_time: DWORD):
-        self.proc(hwnd)
+        if h_win_event_hook != self.hhook:  # 修改范围期间旧钩子的事件
+            return
+        self.dispatch(WinEvent(event, hwnd or 0, id_object, id_child, dw_event_thread, dw_ms_event_time))
 
-    def run(self):
-        CoInitialize(None)
-        t = WINEVENTPROC(self.proc_warp)
-        self.hhook = register_hook(self.event_type, t)
-        if self.hhook == 0:
-            raise ctypes.WinError(0, "Register SerWinEventHook failed")
+    def start(self, event_min: int, event_max: int, dispatch: Callable[[WinEvent], None],
+              on_error: Callable[[], None] | None = None) -> bool:
+        """等待钩子注册完成后返回 (之后才能向钩子线程投递消息), 注册失败或超时返回False"""
+        self.dispatch = dispatch
+        self.on_error = on_error
+        self.hhook = None
+        self.ready.clear()
+        thread = self.thread = Thread(target=self.run, args=(event_min, event_max), daemon=True, name="WinEventHook")
+        thread.start()
+        if self.ready.wait(HOOK_READY_TIMEOUT) and self.hhook:
+            return True
+        if not self.ready.is_set():
+            logger.error("等待WinEvent钩子线程超时")
+        if self.thread is thread:
+            self.thread = None  # 钩子线程之后发现自己已被放弃时会自行退出
+        return False
+
+    def update(self, event_min: int, event_max: int) -> bool:
+        if self.thread is None:
+            return False
+        self.pending_range = (event_min, event_max)
+        try:
+            win32gui.PostThreadMessage(self.thread_id, WM_UPDATE_RANGE, 0, 0)
+        except pywintypes.error:  # 钩子线程已退出
+            return False
+        return True
+
+    def run(self, event_min: int, event_max: int):
         msg = MSG()
-        ret = ctypes.c_bool(True)
-        while ret != 0:
-            ret = GetMessage(ctypes.byref(msg), None, 0, 0)
-            if ret == -1:
-                raise ctypes.WinError()
-            TranslateMessage(ctypes.byref(msg))
-            DispatchMessage(ctypes.byref(msg))
-        unregister_hook(self.hhook)
-        CoUninitialize()
+        PeekMessage(ctypes.byref(msg), None, 0, 0, PM_NOREMOVE)  # 创建消息队列
+        self.thread_id = get_native_id()
+        CoInitialize(None)
+        hhook = self.hhook = register_hook(event_min, self.proc, event_max)
+        self.ready.set()
+        try:
+            if hhook == 0:
+                logger.error(f"注册WinEvent钩子失败: {ctypes.WinError()}")
+                return
+            while self.thread is current_thread() and (ret := GetMessage(ctypes.byref(msg), None, 0, 0)) != 0:
+                if ret == -1:
+                    logger.error(f"WinEvent消息循环出错: {ctypes.WinError()}")
+                    break
+                if msg.message == WM_UPDATE_RANGE and self.pending_range is not None:
+                    new_hook = register_hook(self.pending_range[0], self.proc, self.pending_range[1])
+                    if new_hook == 0:
+                        logger.error(f"修改WinEvent钩子范围失败: {ctypes.WinError()}")
+                        continue
+                    hhook, old_hook = new_hook, hhook
+                    self.hhook = new_hook
+                    unregister_hook(old_hook)
+                    continue
+                TranslateMessage(ctypes.byref(msg))
+                DispatchMessage(ctypes.byref(msg))
+        finally:
+            if hhook:
+                unregister_hook(hhook)
+            CoUninitialize()
+            if self.thread is current_thread():  # 不是由 stop 结束的, 重置状态并通知分发器
+                self.thread = None
+                self.hhook = None
+                if self.on_error is not None:
+                    self.on_error()
 
-    def stop(self, timeout: float | None = None):
+    def stop(self, timeout: float | None = 3):
+        """在钩子线程中 (如回调中取消最后一个订阅) 调用时只通知退出, 不等待"""
         if self.thread is None:
-            raise RuntimeError("Thread has not started")
-        win32gui.PostThreadMessage(self.thread.native_id, con.WM_QUIT, 0, 0)
-        self.thread.join(timeout=timeout)
-        self.thread = None
+            return
+        thread, self.thread = self.thread, None
+        win32gui.PostThreadMessage(self.thread_id, con.WM_QUIT, 0, 0)
+        if thread is not current_thread():
+            thread.join(timeout=timeout)
+
+
+def get_class_name(hwnd: int) -> str | None:
+    try:
+        return win32gui.GetClassName(hwnd)
+    except pywintypes.error:
+        return None
+
+
+def get_process_name(hwnd: int) -> str | None:
+    try:
+        import psutil
+        return psutil.Process(win32process.GetWindowThreadProcessId(hwnd)[1]).name()
+    except (pywintypes.error, ImportError, OSError, ValueError):
+        return None
+
+
+class ProcessNameCache:
+    """
+    窗口句柄 -> 进程名, 一个窗口创建时会连续产生多个事件, 短时间内不重复查询进程
+    只在钩子线程中调用, 无需加锁; 句柄可能被新窗口复用, 因此缓存项在 ttl 秒后失效
+    """
+
+    def __init__(self, lookup: Callable[[int], str | None], ttl: float = PROCESS_NAME_TTL,
+                 size: int = PROCESS_NAME_CACHE_SIZE):
+        self.lookup = lookup
+        self.ttl = ttl
+        self.size = size
+        self.entries: dict[int, tuple[float, str | None]] = {}
+        self.stats = get_metrics().cache("进程名缓存")
+
+    def __call__(self, hwnd: int) -> str | None:
+        now = monotonic()
+        entry = self.entries.get(hwnd)
+        if entry is not None and now - entry[0] < self.ttl:
+            self.stats.hit()
+            return entry[1]
+        self.stats.miss()
+        name = self.lookup(hwnd)
+        if len(self.entries) >= self.size:
+            self.entries.clear()
+        self.entries[hwnd] = (now, name)
+        return name
+
+
+def dispatcher_metrics(dispatcher: WinEventDispatcher) -> Iterator[SourceItem]:
+    yield COUNTER, EVENTS, "WinEvent 接收", dispatcher.received
+    yield COUNTER, EVENTS, "WinEvent 分发", dispatcher.dispatched
+    for subscription in list(dispatcher.subscriptions):
+        yield COUNTER, EVENTS, subscription.name or repr(subscription.callback), subscription.calls
+
+
+_dispatcher: WinEventDispatcher | None = None
+_dispatcher_lock = Lock()
+
+
+def get_dispatcher() -> WinEventDispatcher:
+    """获取进程共享的WinEvent分发器"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = WinEventDispatcher(WinEventHookSource(), get_class_name,
+                                             ProcessNameCache(get_process_name))
+            get_metrics().add_source("win_event", lambda: dispatcher_metrics(_dispatcher))
+        return _dispatcher
+
+
+class WindowWatcher:
+    """兼容旧接口: 监听单个事件类型, 通过共享分发器订阅"""
+
+    def __init__(self, event_type: int, proc: Callable[[int], None], id_object: int | None = None,
+                 class_name: str | re.Pattern | None = None, process_name: str | re.Pattern | None = None):
+        self.event_type = event_type
+        self.proc = proc
+        self.filters = {"id_object": id_object, "class_name": class_name, "process_name": process_name}
+        self.subscription: Subscription | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.subscription is not None
+
+    @property
+    def name(self) -> str:
+        return f"WindowWatcher:{getattr(self.proc, '__qualname__', 'proc')}"
+
+    def start(self):
+        if self.subscription is None:
+            self.subscription = get_dispatcher().subscribe(self.callback, self.event_type, **self.filters,
+                                                           name=f"{self.name} ({self.event_type:#x})")
+
+    def callback(self, event: WinEvent):
+        with get_tracer().span(self.name, "win_event"):
+            self.proc(event.hwnd)
+
+    def stop(self, timeout: float | None = None):
+        if self.subscription is not None:
+            get_dispatcher().unsubscribe(self.subscription)
+            self.subscription = None
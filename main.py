@@ -9,29 +9,61 @@ faulthandler.is_enabled()
 
 os.chdir(os.path.dirname(__file__))  # 进入当前目录
 sys.path.append(os.path.dirname(__file__))  # 添加模块导入路径
+if "-profile-startup" in sys.argv:  # 记录启动各阶段与模块导入用时
+    from lib.startup_profile import enable_startup_profile
+
+    enable_startup_profile()
+from lib.startup_profile import startup_span
+
 if sys.orig_argv[0].endswith("pythonw.exe"):  # 当使用pythonw.exe启动时
-    os.makedirs(expandvars("%APPDATA%/WinEnchantKit/national_logs"), exist_ok=True)
-    output_file = open(
-        expandvars(f"%APPDATA%/WinEnchantKit/national_logs/log_{datetime.now().strftime('%Y-%m-%d')}.log"),
-        "a+", encoding="utf-8"
-    )
-    output_file.write(f"\n\nWinEnchantKit Starting... ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})\n")
-    sys.stdout = output_file
-    sys.stderr = output_file
+    with startup_span("重定向标准输出"):
+        from lib.log_rotation import RotatingLogFile
 
-    import lib.log as log
+        output_file = RotatingLogFile(expandvars("%APPDATA%/WinEnchantKit/national_logs"))
+        output_file.write(f"\n\nWinEnchantKit Starting... ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})\n")
+        sys.stdout = output_file
+        sys.stderr = output_file
 
-    log.USE_COLOR = False
-    log.NO_TIME_FMT = log.TIME_FMT
-    t = typing.cast(log.ColoredFormatter, log.console_handler.formatter)
-    t.update_formatter(use_time=True)
-    log.logger.info("")
-    log.logger.info("")
-    log.logger.info(f"WinEnchantKit 启动... ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+    with startup_span("初始化日志"):
+        import lib.log as log
 
+        log.USE_COLOR = False
+        log.NO_TIME_FMT = log.TIME_FMT
+        t = typing.cast(log.ColoredFormatter, log.console_handler.formatter)
+        t.update_formatter(use_time=True)
+        log.logger.info("")
+        log.logger.info("")
+        log.logger.info(f"WinEnchantKit 启动... ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
 
-from gui.wek_app import WinEnchantKitApp
 
 if __name__ == "__main__":
-    app = WinEnchantKitApp()
-    app.MainLoop()
+    from lib.control_api import ControlClient
+
+    with startup_span("检查已运行的实例"):
+        client = ControlClient.connect()
+    if client is not None:  # 已有实例在运行, 手动启动时让它显示窗口, 不再启动第二个实例
+        with client:
+            if "-startup" in sys.argv or "--headless" in sys.argv:
+                sys.exit(0)
+            activated = client.call("activate")
+        if not activated:  # 已运行的实例为无界面模式, 无法显示窗口
+            msg = "WinEnchantKit 已在无界面模式下运行, 请先退出该实例再启动界面"
+            print(msg, file=sys.stderr)
+            if sys.platform == "win32":
+                import ctypes
+
+                ctypes.windll.user32.MessageBoxW(None, msg, "WinEnchantKit", 0x30)  # MB_ICONWARNING
+            sys.exit(1)
+        sys.exit(0)
+
+    if "--headless" in sys.argv:  # 不导入wx, 只运行插件
+        from lib.headless import run_headless
+
+        run_headless()
+    else:
+        with startup_span("导入界面模块"):
+            from gui.wek_app import WinEnchantKitApp
+
+        with startup_span("创建WinEnchantKitApp"):
+            app = WinEnchantKitApp()
+        app.MainLoop()
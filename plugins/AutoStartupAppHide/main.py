@@ -1,7 +1,6 @@
 import json
 import logging
 import re
-from copy import deepcopy
 from dataclasses import dataclass
 from threading import Thread, Event
 
@@ -14,10 +13,14 @@ from win32 import win32gui
 from win32process import GetWindowThreadProcessId
 
 from base import *
+from lib.log_limit import RateLimitedLogger
+from lib.tracing import trace
+from lib.win_event import OBJID_WINDOW
 from lib.window_watcher import WindowWatcher
 
 name = "自启应用隐藏"
-logger = logging.getLogger("WinEnchantKitLogger_auto_startup_app_hide")
+# 登录时窗口事件密集, 调试输出按调用位置限流并汇总重复的消息
+logger = RateLimitedLogger(logging.getLogger("WinEnchantKitLogger_auto_startup_app_hide"))
 
 WIN_STYLE_MAP = {name for name in dir(con) if name.startswith("WS_")}
 WIN_EX_STYLE_MAP = {name for name in dir(con) if name.startswith("WS_EX_")}
@@ -69,7 +72,7 @@ class PluginConfig(ModuleConfigPlus):
                                                                        HideWay.CLOSE: "0 - 关闭窗口",
                                                                        HideWay.MINIMIZE: "1 - 最小化窗口",
                                                                        HideWay.HIDE: "2 - 隐藏窗口"
-                                                                   }, "隐藏方式")
+                                                                   }, "隐藏方式").set_hot()
 
         self.windows: TableParam | list[HideInfo] = TableParam \
                 (
@@ -143,14 +146,14 @@ class PluginConfig(ModuleConfigPlus):
         ])
         self.import_rules: ButtonParam = ButtonParam(desc="导入规则")
         self.export_rules: ButtonParam = ButtonParam(desc="导出规则")
-        self.debug_output: BoolParam | bool = BoolParam(False, "调试输出")
-        self.debug_exist_output: BoolParam | bool = BoolParam(False, "调试输出现有窗口信息")
+        self.debug_output: BoolParam | bool = BoolParam(False, "调试输出").set_hot()
+        self.debug_exist_output: BoolParam | bool = BoolParam(False, "调试输出现有窗口信息").set_hot()
 
         self.add_hook("windows", self.wnd_data_hook)
         self.saved_windows = None
 
     def wnd_data_hook(self, data: list[tuple]):
-        self.saved_windows = deepcopy(data)
+        self.saved_windows = data  # 配置快照中的值不会被原地修改, 无需复制
         windows = []
         for x in data:
             info = HideInfo(*x)
@@ -172,8 +175,11 @@ class Plugin(BasePlugin):
         self.config.export_rules.handler = self.export_rules
         self.config.load()
         self.stop_flag = Event()
-        self.create_watcher = WindowWatcher(con.EVENT_OBJECT_CREATE, self.parse_create_window)  # 监测创建窗口
-        self.show_watcher = WindowWatcher(con.EVENT_OBJECT_SHOW, self.parse_show_window)  # 监测显示窗口
+        # 两个监视器共享同一个钩子线程, 只接收窗口本身 (而非子对象) 的事件
+        self.create_watcher = WindowWatcher(con.EVENT_OBJECT_CREATE, self.parse_create_window,
+                                            id_object=OBJID_WINDOW)  # 监测创建窗口
+        self.show_watcher = WindowWatcher(con.EVENT_OBJECT_SHOW, self.parse_show_window,
+                                          id_object=OBJID_WINDOW)  # 监测显示窗口
         self.watcher_thread = Thread(target=self.watcher_thread_func, daemon=True)
         self.check_thread = Thread(target=self.check_thread_func, daemon=True)
 
@@ -184,8 +190,7 @@ class Plugin(BasePlugin):
             return
         with open(dialog.GetPath(), "r", encoding="utf-8") as f:
             data = json.load(f)
-        self.config["windows"].extend(data)
-        self.config.params["windows"].update_handler(self.config["windows"])
+        self.config.params["windows"].update_handler(self.config["windows"] + data)
 
     def export_rules(self):
         rules = self.config["windows"]
@@ -237,15 +242,15 @@ class Plugin(BasePlugin):
     def parse_show_window(self, hwnd: int):
         self.parse_create_window(hwnd, in_show_handler=True)
 
-    def update_config(self, old_config: dict[str, Any], new_config: dict[str, Any]):
-        if self.enable:
+    def on_config_changed(self, changed: dict[str, Any]):
+        # 隐藏方式与调试输出在处理窗口时读取, 其余配置项需要重启监测
+        if self.enable and self.config.needs_restart(changed):
             self.stop()
-            super().update_config(old_config, new_config)
-            self.config.saved_windows = None
+            # 规则变化时钩子已重新生成规则; 否则在启动时从原始规则重新生成, 重置剩余次数
+            self.config.saved_windows = None if "windows" in changed else self.config["windows"]
             self.start()
-        else:
-            super().update_config(old_config, new_config)
 
+    @trace("AutoStartupAppHide.parse_create_window", "rule_match")
     def parse_create_window(self, hwnd: int, is_static_check: bool = False, in_show_handler: bool = False):
         try:
             if win32gui.GetParent(hwnd) != 0:
@@ -257,12 +262,13 @@ class Plugin(BasePlugin):
         except pywintypes.error:
             return
 
+        # 消息以函数传入, 关闭调试输出或被限流时不构造字符串
         debug_func = logger.debug if self.config.debug_output else lambda _: None
 
         if not is_static_check or self.config.debug_exist_output:
             self.window_cnt += 1
             key_word = "静态检测" if is_static_check else ('窗口显示' if in_show_handler else '窗口创建')
-            debug_func(f"{key_word}: {hwnd} -> {title}|{cls_name}|{proc_name}")
+            debug_func(lambda: f"{key_word}: {hwnd} -> {title}|{cls_name}|{proc_name}")
         for info in self.config.windows:
             assert isinstance(info, HideInfo)
             if not (info.title or info.cls_name or info.proc_name):
@@ -282,7 +288,7 @@ class Plugin(BasePlugin):
 
             window_styles = extract_window_style(hwnd)
             flag = False
-            debug_func(f"要求样式: {info.style} -> 窗口样式: {window_styles}")
+            debug_func(lambda info=info, styles=window_styles: f"要求样式: {info.style} -> 窗口样式: {styles}")
             for style in info.style:
                 if style not in window_styles:
                     flag = True
@@ -291,18 +297,18 @@ class Plugin(BasePlugin):
                 continue
 
             if info.window_cnt == 0:
-                debug_func(f"剩余次数不足")
+                debug_func(lambda: f"剩余次数不足")
                 continue
             info.window_cnt -= 1
-            debug_func(f"窗口规则剩余使用次数： {info.window_cnt}")
+            debug_func(lambda cnt=info.window_cnt: f"窗口规则剩余使用次数： {cnt}")
             if info.do_last_action and info.window_cnt != 0:
                 continue
             hide_way = int(info.hide_way) if info.hide_way is not None else self.config.hide_way
-            debug_func(f"执行隐藏: {info}")
+            debug_func(lambda info=info: f"执行隐藏: {info}")
             if info.action_dealy == 0:
                 self.do_action_window(hwnd, hide_way)
             else:
-                debug_func(f"执行窗口修改 [{hwnd}], 延时{info.action_dealy}s")
+                debug_func(lambda delay=info.action_dealy: f"执行窗口修改 [{hwnd}], 延时{delay}s")
                 wx.CallAfter(wx.CallLater, int(info.action_dealy * 1000), self.do_action_window, hwnd, hide_way)
         return
 
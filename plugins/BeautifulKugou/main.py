@@ -1,6 +1,5 @@
 import logging
 from os.path import expandvars
-from threading import Event, Thread
 from typing import cast as type_cast
 from xml.etree import ElementTree
 
@@ -15,8 +14,13 @@ from base import *
 from dwm import *
 from lib.kugou_finder import get_main_kugou_window, add_style, ProcType
 from lib.kugou_finder import get_window_ex_style_strings
+from lib.scheduler import get_scheduler, Job
 
 name = "酷狗美化"
+HIDE_BACKGROUND_DELAY = 5.0  # 等待酷狗创建背景窗口
+INTERVAL_KEYS = {"inv_non_launched", "inv_launched"}
+CORNER_KEYS = {"enable_round_corner", "corner_type"}
+COMPOSITION_KEYS = {"enable_set_composition", "accent_state", "accent_color", "accent_alpha"}
 logger = logging.getLogger("WinEnchantKitLogger_beautiful_kugou")
 
 
@@ -38,8 +42,6 @@ def right_corner_border_style(hwnd: int, enable_round_corner: bool, corner_type:
 
 def hide_background_window(main_kugou: int):
     """隐藏酷狗的背景窗口, 如果把酷狗窗口放在白色背景下，会发现边角有一层白色窗口"""
-    from time import sleep
-    sleep(5)
     windows = []
 
     def cbk(hwnd: int, _):
@@ -71,16 +73,27 @@ def hide_background_window(main_kugou: int):
     win32gui.ShowWindow(target, win32con.SW_MINIMIZE)
 
 
+def set_composition(hwnd: int, color: tuple[int, int, int, int], accent_state: int) -> str | None:
+    color_hex = "".join(map(lambda x: hex(x)[2:].zfill(2), color[-2::-1]))
+    if len(color_hex) != 6:
+        return "颜色格式错误" + color_hex
+    accent = ACCENT_POLICY(AccentState=accent_state,
+                           GradientColor=(color[3] << 24) | (int(color_hex, 16) & 0xFFFFFF))
+    attrib = WINDOWCOMPOSITIONATTRIBDATA(
+        Attrib=WINDOWCOMPOSITIONATTRIB.WCA_ACCENT_POLICY,
+        pvData=ctypes.byref(accent),
+        cbData=ctypes.sizeof(accent),
+    )
+    SetWindowCompositionAttribute(hwnd, ctypes.byref(attrib))
+    return None
+
+
 def blur_behind(hwnd: int, color: tuple[int, int, int, int],
-                cfg: dict[str, Any]) -> str | None:
+                cfg: Mapping[str, Any]) -> str | None:
     set_back_type = cfg["set_back_type"]
     enable_blur_behind = cfg["enable_blur_behind"]
 
     back_type = cfg["back_type"]
-    accent_state = cfg["accent_state"]
-    color_hex = "".join(map(lambda x: hex(x)[2:].zfill(2), color[-2::-1]))
-    if len(color_hex) != 6:
-        return "颜色格式错误" + color_hex
 
     if set_back_type:
         # 亚克力背景
@@ -101,14 +114,9 @@ def blur_behind(hwnd: int, color: tuple[int, int, int, int],
     DwmEnableBlurBehindWindow(hwnd, ctypes.byref(bb))
 
     if cfg["enable_set_composition"]:
-        accent = ACCENT_POLICY(AccentState=accent_state,
-                               GradientColor=(color[3] << 24) | (int(color_hex, 16) & 0xFFFFFF))
-        attrib = WINDOWCOMPOSITIONATTRIBDATA(
-            Attrib=WINDOWCOMPOSITIONATTRIB.WCA_ACCENT_POLICY,
-            pvData=ctypes.byref(accent),
-            cbData=ctypes.sizeof(accent),
-        )
-        SetWindowCompositionAttribute(hwnd, ctypes.byref(attrib))
+        msg = set_composition(hwnd, color, cfg["accent_state"])
+        if msg is not None:
+            return msg
 
     # 拓展标题栏效果至客户区
     margins = MARGINS(-1, -1, -1, -1) if enable_blur_behind else MARGINS(0, 0, 0, 0)
@@ -126,10 +134,10 @@ class Plugin(BasePlugin):
                                              ProcType.KUGOU: "酷狗音乐",
                                              ProcType.QQ_MUSIC: "QQ音乐",
                                          }, "窗口类型"),
-            "inv_non_launched": FloatParam(2.0, "检查窗口的间隔时间"),
-            "inv_launched": FloatParam(10.0, "酷狗启动后的检查间隔时间"),
+            "inv_non_launched": FloatParam(2.0, "检查窗口的间隔时间").set_hot(),
+            "inv_launched": FloatParam(10.0, "酷狗启动后的检查间隔时间").set_hot(),
 
-            "enable_set_composition": BoolParam(True, "设置窗口效果 (Win 10 16299+)"),
+            "enable_set_composition": BoolParam(True, "设置窗口效果 (Win 10 16299+)").set_hot(),
             "accent_state": ChoiceParamPlus(ACCENT_STATE.ACCENT_ENABLE_ACRYLICBLURBEHIND,
                                             {
                                                 ACCENT_STATE.ACCENT_DISABLED: "禁用",
@@ -138,37 +146,38 @@ class Plugin(BasePlugin):
                                                 ACCENT_STATE.ACCENT_ENABLE_TRANSPARENTGRADIENT: "透明 (带颜色)",
                                                 ACCENT_STATE.ACCENT_ENABLE_HOSTBACKDROP: "透明 (不带颜色)",
                                                 ACCENT_STATE.ACCENT_ENABLE_GRADIENT: "仅无透明度颜色",
-                                            }, "模糊效果"),
-            "accent_color": ColorParam((0, 128, 255), "模糊背景颜色"),
-            "accent_alpha": IntParam(40, "模糊背景透明度"),
+                                            }, "模糊效果").set_hot(),
+            "accent_color": ColorParam((0, 128, 255), "模糊背景颜色").set_hot(),
+            "accent_alpha": IntParam(40, "模糊背景透明度").set_hot(),
 
-            "enable_round_corner": BoolParam(True, "启用窗口圆角 (Win 11 22000+)"),
+            "enable_round_corner": BoolParam(True, "启用窗口圆角 (Win 11 22000+)").set_hot(),
             "corner_type": ChoiceParamPlus(DWM_WINDOW_CORNER_PREFERENCE.DWMWCP_ROUND,
                                            {
                                                DWM_WINDOW_CORNER_PREFERENCE.DWMWCP_DEFAULT: "默认",
                                                DWM_WINDOW_CORNER_PREFERENCE.DWMWCP_ROUND: "圆角",
                                                DWM_WINDOW_CORNER_PREFERENCE.DWMWCP_ROUNDSMALL: "小圆角",
                                                DWM_WINDOW_CORNER_PREFERENCE.DWMWCP_DONOTROUND: "直角",
-                                           }, "圆角类型"),
+                                           }, "圆角类型").set_hot(),
 
-            "enable_blur_behind": BoolParam(False, "启用窗口背景模糊 (颜色加深)"),
+            "enable_blur_behind": BoolParam(False, "启用窗口背景模糊 (颜色加深)").set_hot(),
 
-            "set_back_type": BoolParam(False, "设置背景材质 (Win 11 22621+) (无效)"),
+            "set_back_type": BoolParam(False, "设置背景材质 (Win 11 22621+) (无效)").set_hot(),
             "back_type": ChoiceParamPlus(DWM_SYSTEMBACKDROP_TYPE.DWMSBT_TRANSIENTWINDOW,
                                          {
                                              DWM_SYSTEMBACKDROP_TYPE.DWMSBT_NONE: "无",
                                              DWM_SYSTEMBACKDROP_TYPE.DWMSBT_MAINWINDOW: "Mica (桌面壁纸模糊)",
                                              DWM_SYSTEMBACKDROP_TYPE.DWMSBT_TRANSIENTWINDOW: "Acrylic (窗口模糊)",
                                              DWM_SYSTEMBACKDROP_TYPE.DWMSBT_TABBEDWINDOW: "Mica Alt (桌面壁纸模糊 (更深))"
-                                         }, "背景材质"),
+                                         }, "背景材质").set_hot(),
             "kugou_skin_set_empty": ButtonParam(desc="设置酷狗皮肤背景为空 (需关闭酷狗)"),
             "kugou_skin_alpha_zero": ButtonParam(desc="设置酷狗皮肤透明度为0 (需关闭酷狗)"),
         }
     )
     enable = False
-    run_flag = False
-    thread: Thread | None = None
-    run_event = Event()
+    job: Job | None = None
+    kugou_launched = False
+    hwnd_cache: int | None = None
+    hide_job: Job | None = None
 
     def __init__(self):
         super().__init__()
@@ -224,67 +233,91 @@ class Plugin(BasePlugin):
         wx.MessageBox("已设置酷狗音乐皮肤的透明度为0", "成功 - ヾ(≧▽≦*)o", wx.OK | wx.ICON_INFORMATION)
 
     def start(self):
-        self.run_flag = True
-        self.run_event.clear()
-        self.thread = Thread(target=self.thread_func, daemon=True)
-        self.thread.start()
+        self.kugou_launched = False
+        self.hwnd_cache = None
+        job = get_scheduler().call_every(self.config["inv_non_launched"], self.check_window, first_delay=0,
+                                         name="BeautifulKugou.check_window")
+        self.job = job
+        job.interval = self.check_interval()  # 首次检查可能在赋值前就已在调度线程中执行完
+        logger.info(f"窗口检查任务已启动")
         self.enable = True
 
-    def thread_func(self):
-        kugou_launched = False
-        logger.info(f"插件线程已启动")
-        first_flag = True
-        hwnd_cache = None
-        while True:
-            wait_time = self.config["inv_launched"] if kugou_launched else self.config["inv_non_launched"]
+    def check_window(self):
+        if self.kugou_launched:
             try:
-                if first_flag:
-                    first_flag = False
-                else:
-                    self.run_event.wait(timeout=wait_time)
-            except TimeoutError:
-                pass
-            if not self.run_flag:
-                break
-            if kugou_launched:
-                try:
-                    GetClassName(hwnd_cache)
-                    continue
-                except pywintypes.error:
-                    logger.info(f"窗口已关闭")
-                    kugou_launched = False
-
-            kugou_hwnd = get_main_kugou_window(self.config["proc_type"])
-            if kugou_hwnd is None:
-                kugou_launched = False
-                continue
-            if kugou_launched:
-                continue
-            hwnd_cache = kugou_hwnd
+                GetClassName(self.hwnd_cache)
+                return
+            except pywintypes.error:
+                logger.info(f"窗口已关闭")
+                self.kugou_launched = False
+
+        kugou_hwnd = get_main_kugou_window(self.config["proc_type"])
+        if kugou_hwnd is not None:
+            self.hwnd_cache = kugou_hwnd
             logger.info(f"酷狗窗口已找到: {kugou_hwnd}, 修改窗口")
             self.update_window(kugou_hwnd)
-            kugou_launched = True
-        logger.info(f"插件线程已退出")
+            self.kugou_launched = True
+        job = self.job  # 首次检查时 start 可能还未保存任务
+        if job is not None:
+            job.interval = self.check_interval()
 
-    def update_config(self, _, new_config: dict[str, Any]):
-        self.config.load_values(new_config)
-        if self.enable:
+    def check_interval(self) -> float:
+        return self.config["inv_launched"] if self.kugou_launched else self.config["inv_non_launched"]
+
+    def on_config_changed(self, changed: dict[str, Any]):
+        if not self.enable:
+            return
+        if self.config.needs_restart(changed):
             self.stop()
             self.start()
+            return
+        if changed.keys() & INTERVAL_KEYS and self.job is not None:
+            self.job.interval = self.check_interval()
+        hwnd = self.hwnd_cache
+        cfg = self.config.snapshot()
+        if not self.kugou_launched or hwnd is None:
+            return
+        # 只重新应用变化的窗口效果, 不重启窗口检查任务
+        effect_keys = changed.keys() - INTERVAL_KEYS
+        try:
+            if effect_keys & CORNER_KEYS:
+                right_corner_border_style(hwnd, cfg["enable_round_corner"], cfg["corner_type"])
+            effect_keys -= CORNER_KEYS
+            if not effect_keys:
+                return
+            if effect_keys <= COMPOSITION_KEYS:
+                msg = set_composition(hwnd, self.window_color(cfg), cfg["accent_state"]) \
+                    if cfg["enable_set_composition"] else None
+            else:
+                msg = blur_behind(hwnd, self.window_color(cfg), cfg)
+        except pywintypes.error:
+            return  # 窗口已关闭, 由窗口检查任务处理
+        if msg is not None:
+            wx.MessageBox(msg, "错误")
 
     def stop(self):
-        assert isinstance(self.thread, Thread)
-        self.run_flag = False
-        self.run_event.set()
-        self.thread.join()
+        assert isinstance(self.job, Job)
+        self.job.cancel()  # 等待正在执行的窗口检查结束, 之后不会再创建隐藏背景窗口的任务
+        self.job = None
+        if self.hide_job is not None:
+            self.hide_job.cancel()
+            self.hide_job = None
+        logger.info(f"窗口检查任务已停止")
         self.enable = False
 
-    def update_window(self, hwnd: int):
+    @staticmethod
+    def window_color(cfg: ConfigSnapshot) -> tuple[int, int, int, int]:
         # noinspection PyTypeChecker
-        color: tuple[int, int, int, int] = tuple(self.config["accent_color"]) + (self.config["accent_alpha"],)
-        right_corner_border_style(hwnd, self.config["enable_round_corner"], self.config["corner_type"])
-        msg = blur_behind(hwnd, color, self.config)
-        if msg is not None:
-            wx.MessageBox(msg, "错误")
-        if self.config["proc_type"] == ProcType.KUGOU:
-            hide_background_window(hwnd)
+        return tuple(cfg["accent_color"]) + (cfg["accent_alpha"],)
+
+    def update_window(self, hwnd: int):
+        cfg = self.config.snapshot()  # 在检查线程中使用, 避免读到更新到一半的配置
+        right_corner_border_style(hwnd, cfg["enable_round_corner"], cfg["corner_type"])
+        msg = blur_behind(hwnd, self.window_color(cfg), cfg)
+        if msg is not None:  # 消息框会阻塞, 不能在调度线程中弹出
+            wx.CallAfter(wx.MessageBox, msg, "错误")
+        if cfg["proc_type"] == ProcType.KUGOU:
+            if self.hide_job is not None:
+                self.hide_job.cancel()
+            self.hide_job = get_scheduler().call_later(HIDE_BACKGROUND_DELAY, lambda: hide_background_window(hwnd),
+                                                       name="BeautifulKugou.hide_background_window")
@@ -30,6 +30,8 @@ from winsdk.windows.storage.streams import RandomAccessStreamReference
 
 from backend import *
 from base import *
+from lib.metrics import get_metrics
+from lib.tracing import trace
 from plugins.HDKugouCover.music_reporter import MusicReporter
 
 name = "高清酷狗封面"
@@ -106,6 +108,8 @@ class Plugin(BasePlugin):
         self.last_song = None
         self.stop_flag = Event()
         self.cover_cache: dict[str, tuple[str, str, str]] = {}
+        self.cover_cache_metric = get_metrics().cache("封面URL缓存")
+        get_metrics().gauge("封面操作队列", self.action_queue.qsize)
 
         self.sessions_changed_token = None
         self.source_changed_token = None
@@ -431,11 +435,14 @@ class Plugin(BasePlugin):
             updater.thumbnail = thumbnail
         updater.update()
 
+    @trace("HDKugouCover.load_cover", "cover")
     def load_cover(self, info: SessionMediaProperties, size: int = 480):
         song_id = f"{info.title} - {info.artist} - {info.album_artist} - {size}"
         if song_id in self.cover_cache:
+            self.cover_cache_metric.hit()
             song_hash, cover_url, cover_url_full = self.cover_cache[song_id]
         else:
+            self.cover_cache_metric.miss()
             try:
                 music_name = info.title
                 if "(" in music_name:
@@ -2,7 +2,7 @@ import atexit
 import logging
 from collections import namedtuple
 from threading import Thread
-from time import sleep, perf_counter
+from time import perf_counter
 
 import psutil
 import pynvml
@@ -12,6 +12,7 @@ from win32process import GetWindowThreadProcessId
 from win10toast import ToastNotifier
 
 from base import *
+from lib.scheduler import get_scheduler, Job
 
 name = "MC录屏提示"
 logger = logging.getLogger("WinEnchantKitLogger_mc_record_alert")
@@ -50,17 +51,20 @@ def is_minecraft_window(hwnd: int) -> bool:
 class Plugin(BasePlugin):
     config = ModuleConfig(
         {
-            "alert_time": IntParam(60, "提醒启动OBS录屏的时间，单位为秒: "),
-            "check_inv": IntParam(10, "检查窗口的间隔时间，单位为秒: "),
-            "alert_always": BoolParam(False, "提醒过后是否继续提醒"),
-            "usage_thr": IntParam(2, "OBS录屏GPU占用阈值(包含)，单位为百分比: "),
-            "obs_name": StringParam("obs64.exe", "OBS进程名 (不建议改动): "),
-            "use_toast": BoolParam(True, "使用Toast提醒, 避免对MC的游玩干扰"),
+            "alert_time": IntParam(60, "提醒启动OBS录屏的时间，单位为秒: ").set_hot(),
+            "check_inv": IntParam(10, "检查窗口的间隔时间，单位为秒: ").set_hot(),
+            "alert_always": BoolParam(False, "提醒过后是否继续提醒").set_hot(),
+            "usage_thr": IntParam(2, "OBS录屏GPU占用阈值(包含)，单位为百分比: ").set_hot(),
+            "obs_name": StringParam("obs64.exe", "OBS进程名 (不建议改动): ").set_hot(),
+            "use_toast": BoolParam(True, "使用Toast提醒, 避免对MC的游玩干扰").set_hot(),
         }
     )
-    thread = None
-    running_flag = False
+    job: Job | None = None
     enable = True
+    minecraft_running = False
+    obs_non_launch_timer = 0.0
+    alerted = False
+
     def __init__(self):
         self.notifier = ToastNotifier()
 
@@ -71,80 +75,70 @@ class Plugin(BasePlugin):
         self.notifier.on_destroy = on_destroy
 
     def start(self):
-        self.running_flag = True
-        self.thread = Thread(target=self.thread_func, daemon=True)
-        self.thread.start()
-
-    def update_config(self, old_config: dict[str, Any], new_config: dict[str, Any]):
-        self.config.load_values(new_config)
-        if self.enable:
-            self.stop()
-            self.start()
+        self.minecraft_running = False
+        self.obs_non_launch_timer = 0
+        self.alerted = False
+        self.job = get_scheduler().call_every(self.config["check_inv"], self.check_window,
+                                              name="MinecraftRecordAlert.check_window")
+        logger.info("检查任务已启动")
+
+    def on_config_changed(self, changed: dict[str, Any]):
+        # 其余配置项在每次检查时读取, 只需更新检查间隔
+        if self.job is not None and "check_inv" in changed:
+            self.job.interval = self.config["check_inv"]
 
     def stop(self):
-        self.running_flag = False
-        self.thread.join()
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+        logger.info("检查任务已停止")
         self.enable = False
 
-    def check_obs_recorded(self) -> bool:
+    @staticmethod
+    def check_obs_recorded(cfg: ConfigSnapshot) -> bool:
         """检查OBS是否正在录屏"""
         for proc in psutil.process_iter(["name"]):
-            if proc.name() == self.config["obs_name"]:
+            if proc.name() == cfg["obs_name"]:
                 usage = get_proc_gpu_perf(proc.pid)
                 if usage is None:
                     return False
-                if usage.encUtil >= self.config["usage_thr"]:
+                if usage.encUtil >= cfg["usage_thr"]:
                     return True
                 break
         return False
 
-    def thread_func(self):
-        minecraft_running = False
-        obs_non_launch_timer = 0
-        alerted = False
-        try:
-            logger.info("线程已启动")
-            while self.running_flag:
-                for _ in range(int(self.config["check_inv"] / 0.5)):
-                    sleep(0.5)
-                    if not self.running_flag:
-                        break
-                if not self.running_flag:
-                    break
-
-                hwnd = GetForegroundWindow()
-                if hwnd == 0:
-                    continue
-                if is_minecraft_window(hwnd):  # 正在游玩MC
-                    if not minecraft_running:  # MC刚刚启动
-                        logger.info("正在游玩MC")
-                        minecraft_running = True
-                        obs_non_launch_timer = perf_counter()
-                        alerted = False
-                    else:  # MC已经启动
-                        if alerted:
-                            continue
-                        logger.info(f"MC已游玩 {round(perf_counter() - obs_non_launch_timer, 2)} 秒")
-                        if perf_counter() - obs_non_launch_timer > self.config["alert_time"]:
-                            if not self.check_obs_recorded():
-                                logger.info("检测到OBS仍未启动，弹出警告窗口...")
-                                if self.config["use_toast"]:
-                                    self.notifier.show_toast("警告", "检测到OBS未启动，请启动OBS", duration=5, threaded=True)
-                                else:
-                                    MessageBox(hwnd, "检测到OBS未启动，请启动OBS", "警告", MB_OK | MB_ICONWARNING)
-                                sleep(2)
-                                obs_non_launch_timer = perf_counter()
-                                if not self.config["alert_always"]:
-                                    alerted = True
-                            else:
-                                logger.info("检测到OBS已启动，不弹出警告窗口")
-                                alerted = True
-
-                elif minecraft_running:  # 没有在游玩MC
-                    logger.info("没有在游玩MC")
-                    minecraft_running = False
-                    obs_non_launch_timer = 0
-                    alerted = False
-        except KeyboardInterrupt:
-            pass
-        logger.info("线程已退出")
+    def check_window(self):
+        cfg = self.config.snapshot()  # 本次检查中使用同一份配置
+        hwnd = GetForegroundWindow()
+        if hwnd == 0:
+            return
+        if is_minecraft_window(hwnd):  # 正在游玩MC
+            if not self.minecraft_running:  # MC刚刚启动
+                logger.info("正在游玩MC")
+                self.minecraft_running = True
+                self.obs_non_launch_timer = perf_counter()
+                self.alerted = False
+            else:  # MC已经启动
+                if self.alerted:
+                    return
+                logger.info(f"MC已游玩 {round(perf_counter() - self.obs_non_launch_timer, 2)} 秒")
+                if perf_counter() - self.obs_non_launch_timer > cfg["alert_time"]:
+                    if not self.check_obs_recorded(cfg):
+                        logger.info("检测到OBS仍未启动，弹出警告窗口...")
+                        if cfg["use_toast"]:
+                            self.notifier.show_toast("警告", "检测到OBS未启动，请启动OBS", duration=5, threaded=True)
+                        else:  # 消息框会阻塞, 不能在调度线程中弹出
+                            Thread(target=MessageBox, args=(hwnd, "检测到OBS未启动，请启动OBS", "警告",
+                                                            MB_OK | MB_ICONWARNING), daemon=True).start()
+                        self.obs_non_launch_timer = perf_counter()
+                        if not cfg["alert_always"]:
+                            self.alerted = True
+                    else:
+                        logger.info("检测到OBS已启动，不弹出警告窗口")
+                        self.alerted = True
+
+        elif self.minecraft_running:  # 没有在游玩MC
+            logger.info("没有在游玩MC")
+            self.minecraft_running = False
+            self.obs_non_launch_timer = 0
+            self.alerted = False
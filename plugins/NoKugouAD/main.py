@@ -1,6 +1,6 @@
 import ctypes
 import logging
-from threading import Thread, Event
+from threading import Thread, Event, Lock
 from time import sleep
 
 import win32con as con
@@ -9,6 +9,8 @@ from win32gui import GetClassName
 
 from base import *
 from lib.kugou_finder import is_kugou_main_window, get_main_kugou_window, ProcType
+from lib.scheduler import get_scheduler, Job
+from lib.win_event import OBJID_WINDOW
 from lib.window_watcher import WindowWatcher
 
 name = "酷狗无广告"
@@ -32,10 +34,12 @@ class Plugin(BasePlugin):
         })
 
     def __init__(self):
-        self.wnd_watcher = WindowWatcher(con.EVENT_OBJECT_CREATE, self.check_kugou)
+        self.wnd_watcher = WindowWatcher(con.EVENT_OBJECT_CREATE, self.check_kugou,
+                                         id_object=OBJID_WINDOW, class_name="kugou_ui")
         self.ready_windows = []
         self.check_thread = Thread(target=self.check_thread_func, daemon=True)
-        self.kugou_daemon_thread = None
+        self.kugou_daemon_job: Job | None = None
+        self.job_lock = Lock()  # 守护任务的创建/取消与 stop 互斥
         self.kugou_hwnd = None
         self.stop_flag = Event()
 
@@ -51,7 +55,7 @@ class Plugin(BasePlugin):
         self.wnd_watcher.start()
 
     def check_kugou(self, hwnd: int):
-        if not self.enable or self.ready_windows is None or GetClassName(hwnd) != "kugou_ui":
+        if not self.enable or self.ready_windows is None:
             return
         self.ready_windows.append(hwnd)
         if not self.check_thread.is_alive():
@@ -125,29 +129,35 @@ class Plugin(BasePlugin):
             return
         uiautomation.Logger.DeleteLog()
 
-        self.kugou_daemon_thread = Thread(target=self.kugou_daemon_func, daemon=True)
-        self.kugou_daemon_thread.start()
+        with self.job_lock:
+            if self.stop_flag.is_set():
+                return
+            self.kugou_daemon_job = get_scheduler().call_every(self.config["shutdown_check_inv"],
+                                                               self.kugou_daemon_func,
+                                                               name="NoKugouAD.kugou_daemon_func")
 
     def kugou_daemon_func(self):
-        while True:
-            self.stop_flag.wait(timeout=self.config["shutdown_check_inv"])
-            if self.stop_flag.is_set():
+        try:
+            GetClassName(self.kugou_hwnd)
+            return
+        except pywintypes.error:
+            pass
+        with self.job_lock:  # 持有锁重新开始监测, stop 会等待其完成后再停止监听
+            daemon_job, self.kugou_daemon_job = self.kugou_daemon_job, None
+            if daemon_job is None or self.stop_flag.is_set():
                 return
-            try:
-                GetClassName(self.kugou_hwnd)
-                continue
-            except pywintypes.error:
-                break
-        logger.info("酷狗窗口已关闭, 继续开始监测")
-        self.start()
+            daemon_job.cancel()
+            logger.info("酷狗窗口已关闭, 继续开始监测")
+            self.start()
 
     def stop(self):
-        if self.wnd_watcher.thread:
-            if self.wnd_watcher.thread.is_alive():
-                self.wnd_watcher.stop()
         self.stop_flag.set()
-        if self.kugou_daemon_thread and self.kugou_daemon_thread.is_alive():
-            self.kugou_daemon_thread.join()
+        with self.job_lock:
+            daemon_job, self.kugou_daemon_job = self.kugou_daemon_job, None
+        if daemon_job is not None:
+            daemon_job.cancel()
+        if self.wnd_watcher.running:
+            self.wnd_watcher.stop()
         if self.check_thread.is_alive():
             self.check_thread.join()
         self.stop_flag.clear()
@@ -0,0 +1 @@
+"""WinEnchantKit 命令行入口 (python -m wek)"""
@@ -0,0 +1,92 @@
+"""
+python -m wek ctl <命令> [参数...]
+
+    list                          列出插件
+    status [插件ID...]            插件状态与资源占用
+    start <插件ID...>             启动插件 (并行)
+    stop <插件ID...>              停止插件 (并行)
+    reload <插件ID>               重载插件
+    get-config <插件ID>           查看插件配置
+    set-config <插件ID> 键=值...  修改插件配置, 值按JSON解析, 解析失败时作为字符串
+    button <插件ID> <按钮名>      触发插件配置中的按钮
+    batch [文件]                  从文件 (默认标准输入) 读取JSON-RPC请求数组, 一次往返执行
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.control_api import ControlClient, ControlError
+
+
+def parse_value(text: str):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def ctl_main(args: list[str]) -> int:
+    if not args or args[0] in ("-h", "--help"):
+        print(__doc__.strip())
+        return 0
+    client = ControlClient.connect()
+    if client is None:
+        print("WinEnchantKit 未在运行", file=sys.stderr)
+        return 2
+    command, rest = args[0], args[1:]
+    with client:
+        try:
+            if command == "list":
+                result = client.call("list")
+            elif command == "status":
+                result = client.call("status", ids=rest or None)
+            elif command in ("start", "stop"):
+                result = client.call(command, ids=rest)
+            elif command == "reload":
+                result = client.call("reload", plugin_id=rest[0])
+            elif command == "get-config":
+                result = client.call("get_config", plugin_id=rest[0])
+            elif command == "set-config":
+                if not rest[1:] or any("=" not in item for item in rest[1:]):
+                    print(__doc__.strip(), file=sys.stderr)
+                    return 2
+                values = dict(item.split("=", 1) for item in rest[1:])
+                result = client.call("set_config", plugin_id=rest[0],
+                                     values={key: parse_value(value) for key, value in values.items()})
+            elif command == "button":
+                result = client.call("invoke_button", plugin_id=rest[0], name=rest[1])
+            elif command == "batch":
+                try:
+                    if rest:
+                        with open(rest[0], "r", encoding="utf-8") as f:
+                            requests = json.load(f)
+                    else:
+                        requests = json.load(sys.stdin)
+                except (OSError, ValueError) as e:
+                    print(f"无法读取请求: {e}", file=sys.stderr)
+                    return 2
+                result = client.request(requests)
+            else:
+                print(f"未知命令: {command}", file=sys.stderr)
+                return 2
+        except ControlError as e:
+            print(f"错误 ({e.code}): {e.message}", file=sys.stderr)
+            return 1
+        except IndexError:
+            print(__doc__.strip(), file=sys.stderr)
+            return 2
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main() -> int:
+    if len(sys.argv) < 2 or sys.argv[1] != "ctl":
+        print(__doc__.strip())
+        return 2
+    return ctl_main(sys.argv[2:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())